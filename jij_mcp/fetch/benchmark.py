@@ -0,0 +1,121 @@
+"""
+Compares the Markdown conversion engines of Fetcher on saved HTML pages.
+
+For each page and engine, it reports the conversion time, the throughput in MB of HTML
+per second and the size of the Markdown. Pages are HTML files, directories of them, or
+URLs, which are downloaded first (and kept as fixtures with --save-dir). Without pages, the
+IBM Quantum documentation fixtures in fetch/fixtures are used. Run it from the jij_mcp
+directory:
+
+    python -m fetch.benchmark [pages/ https://docs.quantum.ibm.com/api/qiskit ...] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from typing import Optional
+
+from .fetcher import MARKDOWN_ENGINES, Fetcher
+from .types import FetchRequestArgs
+
+# Saved pages in the layout of the IBM Quantum documentation: API reference, migration guide, tutorial
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+async def _download(url: str, save_dir: Optional[str]) -> tuple[str, str]:
+    response = await Fetcher.html(FetchRequestArgs(url=url, max_bytes=64 * 1024 * 1024))
+    if response.isError:
+        raise SystemExit(f"{url}: {response.errorMessage}")
+    html = response.content[0]["text"]
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        name = url.rstrip("/").rsplit("/", 1)[-1] or "index"
+        path = os.path.join(save_dir, f"{name}-{hashlib.sha256(url.encode()).hexdigest()[:8]}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Saved {url} to {path}")
+    return url, html
+
+
+async def load_pages(inputs: list[str], save_dir: Optional[str]) -> list[tuple[str, str]]:
+    """Returns the name and HTML of each page of `inputs` (files, directories and URLs)."""
+    pages = []
+    try:
+        for source in inputs:
+            if source.startswith(("http://", "https://")):
+                pages.append(await _download(source, save_dir))
+            elif os.path.isdir(source):
+                for name in sorted(os.listdir(source)):
+                    if name.endswith((".html", ".htm")):
+                        with open(os.path.join(source, name), encoding="utf-8", errors="replace") as f:
+                            pages.append((name, f.read()))
+            else:
+                with open(source, encoding="utf-8", errors="replace") as f:
+                    pages.append((os.path.basename(source), f.read()))
+    finally:
+        await Fetcher.aclose()
+    return pages
+
+
+def benchmark(pages: list[tuple[str, str]], repeat: int) -> dict[str, dict]:
+    """
+    Converts every page `repeat` times with each engine.
+
+    Returns:
+        dict: For each engine, the total HTML bytes, the best total conversion time in
+        seconds, the throughput in MB per second and the total Markdown characters.
+    """
+    totals = {}
+    html_bytes = sum(len(html.encode("utf-8")) for _, html in pages)
+    for engine, convert in MARKDOWN_ENGINES.items():
+        seconds = 0.0
+        characters = 0
+        for name, html in pages:
+            times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                markdown = convert(html)
+                times.append(time.perf_counter() - started)
+            seconds += min(times)
+            characters += len(markdown)
+            size = len(html.encode("utf-8"))
+            print(
+                f"{engine:12} {min(times) * 1000:9.1f} ms {size / min(times) / 1e6:8.2f} MB/s "
+                f"{len(markdown):9} chars  {name}"
+            )
+        totals[engine] = {
+            "html_bytes": html_bytes,
+            "seconds": seconds,
+            "mb_per_second": html_bytes / seconds / 1e6 if seconds else 0.0,
+            "markdown_characters": characters,
+        }
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[FIXTURES_DIR],
+        help="HTML files, directories of HTML files or URLs. Defaults to the bundled fixtures.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Conversions per page and engine; the fastest is kept."
+    )
+    parser.add_argument("--save-dir", help="Directory the downloaded pages are saved to as fixtures.")
+    args = parser.parse_args()
+
+    pages = asyncio.run(load_pages(args.inputs, args.save_dir))
+    if not pages:
+        raise SystemExit("No HTML pages were found.")
+    totals = benchmark(pages, args.repeat)
+    print()
+    print(f"{len(pages)} pages, {next(iter(totals.values()))['html_bytes'] / 1e6:.2f} MB of HTML")
+    for engine, total in totals.items():
+        print(
+            f"{engine:12} {total['seconds'] * 1000:9.1f} ms {total['mb_per_second']:8.2f} MB/s "
+            f"{total['markdown_characters']:9} chars"
+        )
@@ -0,0 +1,200 @@
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+# Location of the cached responses
+DEFAULT_FETCH_CACHE_DIR = os.environ.get(
+    "JIJ_MCP_FETCH_CACHE_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "jij-mcp",
+        "http",
+    ),
+)
+# Total size of the cached bodies; the least recently used are dropped first (0 disables the cache)
+DEFAULT_FETCH_CACHE_MAX_BYTES = int(
+    float(os.environ.get("JIJ_MCP_FETCH_CACHE_MAX_MB", "256")) * 1024 * 1024
+)
+# Seconds a response is served without contacting the server, for URLs no rule matches
+DEFAULT_FETCH_CACHE_TTL = float(os.environ.get("JIJ_MCP_FETCH_CACHE_TTL", "300"))
+# Seconds per URL pattern (fnmatch syntax), first match wins. The Qiskit documentation
+# changes with releases, so it is served from the cache for a day before revalidating.
+DEFAULT_FETCH_CACHE_TTL_RULES: list[tuple[str, float]] = list(
+    json.loads(
+        os.environ.get(
+            "JIJ_MCP_FETCH_CACHE_TTL_RULES",
+            json.dumps(
+                {
+                    "https://docs.quantum.ibm.com/api/*": 24 * 3600,
+                    "https://learning.quantum.ibm.com/*": 24 * 3600,
+                }
+            ),
+        )
+    ).items()
+)
+
+# Response headers kept with a body; the body is stored decoded, so Content-Encoding is not
+_KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+def cache_key(url: str, headers: Optional[dict[str, str]] = None) -> str:
+    """Returns the cache key of a GET of `url` with custom `headers`, which may change the response."""
+    payload = "\n".join(
+        [url] + sorted(f"{name.lower()}:{value}" for name, value in (headers or {}).items())
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """
+    An on-disk cache of HTTP response bodies with their validators (ETag, Last-Modified).
+
+    A response is fresh for the TTL of the first rule its URL matches. Fresh entries are
+    served without a request; stale ones are revalidated with a conditional GET, and a
+    "304 Not Modified" makes them fresh again. The cache is bounded by the total size of
+    the bodies and drops the least recently used entries first.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_FETCH_CACHE_DIR,
+        max_bytes: int = DEFAULT_FETCH_CACHE_MAX_BYTES,
+        ttl_rules: Optional[list[tuple[str, float]]] = None,
+        default_ttl: float = DEFAULT_FETCH_CACHE_TTL,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_rules = DEFAULT_FETCH_CACHE_TTL_RULES if ttl_rules is None else ttl_rules
+        self.default_ttl = default_ttl
+        # Body size of each entry, least recently used first; read from disk on first use
+        self._sizes: Optional[OrderedDict[str, int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def ttl(self, url: str) -> float:
+        for pattern, seconds in self.ttl_rules:
+            if fnmatch.fnmatchcase(url, pattern):
+                return float(seconds)
+        return self.default_ttl
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{key}.{suffix}")
+
+    def _index(self) -> OrderedDict[str, int]:
+        if self._sizes is None:
+            entries = []
+            try:
+                with os.scandir(self.root) as it:
+                    for entry in it:
+                        if entry.name.endswith(".body"):
+                            stat = entry.stat()
+                            # The modification time of a body is its last use, see `get`
+                            entries.append((stat.st_mtime, entry.name[: -len(".body")], stat.st_size))
+            except OSError:
+                pass
+            self._sizes = OrderedDict((key, size) for _, key, size in sorted(entries))
+        return self._sizes
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the entry of `key`: `url`, `headers`, `stored` (time of the last response
+        from the server), `fresh` and the `body`, or None if it is not cached.
+        """
+        if not self.enabled or key not in self._index():
+            return None
+        try:
+            with open(self._path(key, "json"), encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(self._path(key, "body"), "rb") as f:
+                entry["body"] = f.read()
+            os.utime(self._path(key, "body"))
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        self._index().move_to_end(key)
+        entry["fresh"] = time.time() - entry["stored"] <= self.ttl(entry["url"])
+        return entry
+
+    def put(self, key: str, url: str, headers: dict[str, str], body: bytes) -> bool:
+        """Stores a response; returns False if it is not stored, e.g. as it exceeds `max_bytes`."""
+        if not self.enabled or len(body) > self.max_bytes:
+            return False
+        metadata = {
+            "url": url,
+            "headers": {name: headers[name] for name in _KEPT_HEADERS if name in headers},
+            "stored": time.time(),
+        }
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            # Written to temporary files first, so that a reader never sees a partial entry
+            for suffix, data in (("body", body), ("json", json.dumps(metadata).encode("utf-8"))):
+                tmp_path = self._path(key, suffix) + f".{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._path(key, suffix))
+        except OSError:
+            return False  # The response is still returned, only not cached
+        index = self._index()
+        index[key] = len(body)
+        index.move_to_end(key)
+        self._evict()
+        return True
+
+    def refresh(self, key: str, entry: dict, headers: dict[str, str]) -> None:
+        """Marks a revalidated entry as fresh, with the validators of the "304 Not Modified" response."""
+        metadata = {
+            "url": entry["url"],
+            "headers": {
+                **entry["headers"],
+                **{name: headers[name] for name in ("etag", "last-modified") if name in headers},
+            },
+            "stored": time.time(),
+        }
+        try:
+            tmp_path = self._path(key, "json") + f".{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f)
+            os.replace(tmp_path, self._path(key, "json"))
+        except OSError:
+            pass
+
+    def _remove(self, key: str) -> None:
+        self._index().pop(key, None)
+        for suffix in ("body", "json"):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        index = self._index()
+        total = sum(index.values())
+        while total > self.max_bytes and index:
+            key, size = next(iter(index.items()))
+            self._remove(key)
+            total -= size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.revalidations
+        index = self._index()
+        return {
+            "entries": len(index),
+            "bytes": sum(index.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "hit_rate": (self.hits + self.revalidations) / lookups if lookups else 0.0,
+        }
+
+
+http_cache = HttpCache()
@@ -0,0 +1,129 @@
+"""
+Checks the HTTP cache of Fetcher against a mock server, without network access.
+
+It covers a first fetch that is stored, a fresh hit served without a request, a stale
+entry revalidated with "304 Not Modified", a stale entry replaced by a changed page,
+and "no-store" responses and pages larger than the cache, which are never cached.
+Run it from the jij_mcp directory:
+
+    python -m fetch.check_cache
+"""
+
+import asyncio
+import tempfile
+
+import httpx
+
+from .cache import HttpCache
+from .fetcher import Fetcher
+from .types import FetchRequestArgs
+
+_TTL = 0.2
+_URL = "https://docs.example.com/page"
+_NO_STORE_URL = "https://docs.example.com/no-store"
+_LARGE_URL = "https://docs.example.com/large"
+_CACHE_MAX_BYTES = 1024
+_LARGE_PAGE = "<p>" + "x" * _CACHE_MAX_BYTES + "</p>"
+
+
+class _MockServer:
+    """Serves one page with an ETag, honoring If-None-Match, and counts the requests."""
+
+    def __init__(self) -> None:
+        self.version = 1
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url == _NO_STORE_URL:
+            return httpx.Response(
+                200, headers={"Cache-Control": "no-store"}, text="<p>private</p>"
+            )
+        if request.url == _LARGE_URL:
+            return httpx.Response(200, text=_LARGE_PAGE)
+        etag = f'"v{self.version}"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(
+            200,
+            headers={"ETag": etag, "Content-Type": "text/html"},
+            text=f"<p>version {self.version}</p>",
+        )
+
+
+async def _get(url: str) -> tuple[str, str]:
+    response = await Fetcher.html(FetchRequestArgs(url=url))
+    if response.isError:
+        raise AssertionError(f"{url}: {response.errorMessage}")
+    return response.cacheStatus, response.content[0]["text"]
+
+
+def _expect(step: str, actual: object, expected: object) -> None:
+    if actual != expected:
+        raise AssertionError(f"{step}: expected {expected!r}, got {actual!r}")
+    print(f"ok  {step}")
+
+
+async def check_cache() -> None:
+    """
+    Runs the checks with a mock transport and a cache in a temporary directory.
+
+    Raises:
+        AssertionError: If the cache does not behave as expected.
+    """
+    server = _MockServer()
+    previous_cache = Fetcher.cache
+    await Fetcher.aclose()
+    Fetcher._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(server.handle),
+        headers=Fetcher.DEFAULT_HEADERS,
+        follow_redirects=True,
+    )
+    try:
+        with tempfile.TemporaryDirectory(prefix="jij-mcp-http-") as root:
+            Fetcher.cache = HttpCache(
+                root, max_bytes=_CACHE_MAX_BYTES, ttl_rules=[], default_ttl=_TTL
+            )
+
+            _expect("200 is stored", await _get(_URL), ("miss", "<p>version 1</p>"))
+            _expect("fresh entry is served", await _get(_URL), ("hit", "<p>version 1</p>"))
+            _expect("hit sends no request", len(server.requests), 1)
+
+            await asyncio.sleep(_TTL * 1.5)
+            _expect("stale entry is revalidated", await _get(_URL), ("revalidated", "<p>version 1</p>"))
+            _expect("revalidation is conditional", server.requests[-1].headers.get("if-none-match"), '"v1"')
+            _expect("304 refreshes the entry", await _get(_URL), ("hit", "<p>version 1</p>"))
+            _expect("refreshed hit sends no request", len(server.requests), 2)
+
+            server.version = 2
+            await asyncio.sleep(_TTL * 1.5)
+            _expect("changed page replaces the entry", await _get(_URL), ("miss", "<p>version 2</p>"))
+            _expect("new entry is served", await _get(_URL), ("hit", "<p>version 2</p>"))
+
+            for attempt in ("first", "second"):
+                _expect(
+                    f"no-store is not cached ({attempt} fetch)",
+                    await _get(_NO_STORE_URL),
+                    ("bypass", "<p>private</p>"),
+                )
+            _expect("no-store is fetched every time", len(server.requests), 5)
+            for attempt in ("first", "second"):
+                _expect(
+                    f"page larger than the cache is not cached ({attempt} fetch)",
+                    await _get(_LARGE_URL),
+                    ("bypass", _LARGE_PAGE),
+                )
+            _expect("page larger than the cache is fetched every time", len(server.requests), 7)
+            _expect(
+                "cache counters",
+                {name: Fetcher.cache.stats()[name] for name in ("hits", "misses", "revalidations")},
+                {"hits": 3, "misses": 2, "revalidations": 1},
+            )
+    finally:
+        await Fetcher.aclose()
+        Fetcher.cache = previous_cache
+
+
+if __name__ == "__main__":
+    asyncio.run(check_cache())
+    print("The HTTP cache behaves as expected.")
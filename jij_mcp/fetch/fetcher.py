@@ -1,12 +1,38 @@
 import httpx
 from bs4 import BeautifulSoup
 from markdownify import MarkdownConverter
-from typing import Dict, Optional, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Any
+import asyncio
+import importlib.util
 import json
+import os
 
+from .cache import HttpCache, cache_key, http_cache
+from .lxml_markdown import html_to_markdown
 from .types import FetchRequestArgs, FetchResponse
 
 
+# Connection pool of the shared HTTP client: open connections, idle connections kept
+# alive for reuse, and the seconds an idle connection is kept
+DEFAULT_FETCH_MAX_CONNECTIONS = int(os.environ.get("JIJ_MCP_FETCH_MAX_CONNECTIONS", "20"))
+DEFAULT_FETCH_MAX_KEEPALIVE = int(os.environ.get("JIJ_MCP_FETCH_MAX_KEEPALIVE", "10"))
+DEFAULT_FETCH_KEEPALIVE_EXPIRY = float(os.environ.get("JIJ_MCP_FETCH_KEEPALIVE_EXPIRY", "60"))
+DEFAULT_FETCH_TIMEOUT = float(os.environ.get("JIJ_MCP_FETCH_TIMEOUT", "30"))
+# HTTP/2 needs the h2 package (httpx[http2]); without it, requests use HTTP/1.1
+DEFAULT_FETCH_HTTP2 = os.environ.get("JIJ_MCP_FETCH_HTTP2", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+) and importlib.util.find_spec("h2") is not None
+# Bytes of a response body that are downloaded; the download stops at this size
+DEFAULT_FETCH_MAX_BYTES = int(os.environ.get("JIJ_MCP_FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+# Characters of Markdown returned per call of fetch_as_markdown (0 returns the whole page)
+DEFAULT_FETCH_MAX_LENGTH = int(os.environ.get("JIJ_MCP_FETCH_MAX_LENGTH", "20000"))
+# Markdown conversion engine used when a request does not choose one
+DEFAULT_FETCH_MARKDOWN_ENGINE = os.environ.get("JIJ_MCP_FETCH_MARKDOWN_ENGINE", "markdownify")
+
+
 class NoImagesConverter(MarkdownConverter):
     """
     Create a custom MarkdownConverter that ignores all images during conversion
@@ -17,6 +43,18 @@ class NoImagesConverter(MarkdownConverter):
         return ""
 
 
+def markdownify_to_markdown(html_text: str) -> str:
+    # Use custom NoImagesConverter to ignore images
+    return NoImagesConverter().convert(html_text)
+
+
+# Markdown conversion engines by name; "lxml" converts only the main content of a page
+MARKDOWN_ENGINES: Dict[str, Callable[[str], str]] = {
+    "markdownify": markdownify_to_markdown,
+    "lxml": html_to_markdown,
+}
+
+
 class Fetcher:
     """Handles fetching and processing web content."""
 
@@ -24,39 +62,168 @@ class Fetcher:
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Jij-MCP/0.1 (+https://github.com/Jij-Inc/Jij-MCP-Server)"
     }
 
+    # Process-wide client, so that repeated fetches reuse warm connections
+    _client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def client() -> httpx.AsyncClient:
+        """
+        Returns the shared HTTP client, creating it on first use.
+        Accept-Encoding negotiates gzip, and brotli when the brotli package is installed.
+        """
+        if Fetcher._client is None or Fetcher._client.is_closed:
+            Fetcher._client = httpx.AsyncClient(
+                headers=Fetcher.DEFAULT_HEADERS,
+                follow_redirects=True,
+                timeout=DEFAULT_FETCH_TIMEOUT,
+                http2=DEFAULT_FETCH_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=DEFAULT_FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=DEFAULT_FETCH_MAX_KEEPALIVE,
+                    keepalive_expiry=DEFAULT_FETCH_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return Fetcher._client
+
     @staticmethod
-    async def _fetch(payload: FetchRequestArgs) -> httpx.Response:
-        """Internal fetch method using httpx."""
-        headers = Fetcher.DEFAULT_HEADERS.copy()
-        if payload.headers:
-            headers.update(payload.headers)
+    async def aclose() -> None:
+        """Closes the shared HTTP client and its connections."""
+        client, Fetcher._client = Fetcher._client, None
+        if client is not None:
+            await client.aclose()
 
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
+    @staticmethod
+    @asynccontextmanager
+    async def lifespan(server: Any) -> AsyncIterator[None]:
+        """Server lifespan that opens the shared HTTP client at startup and closes it at shutdown."""
+        Fetcher.client()
+        try:
+            yield
+        finally:
+            await Fetcher.aclose()
+
+    # On-disk cache of fetched pages; replaceable, e.g. by one in a temporary directory
+    cache: HttpCache = http_cache
+
+    @staticmethod
+    def _cached_response(url: str, entry: dict) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers=entry["headers"],
+            content=entry["body"],
+            request=httpx.Request("GET", url),
+        )
+
+    @staticmethod
+    async def _read_capped(response: httpx.Response, max_bytes: int) -> tuple[bytes, bool]:
+        """Reads the body of a streamed response up to `max_bytes`; returns it and whether it was cut."""
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[: max_bytes - size])
+                return b"".join(chunks), True  # The rest of the body is never downloaded
+            chunks.append(chunk)
+            size += len(chunk)
+        return b"".join(chunks), False
+
+    @staticmethod
+    def _trim_partial_character(body: bytes) -> bytes:
+        """Drops a UTF-8 character cut in half at the end of a truncated body."""
+        for cut in range(len(body), max(len(body) - 4, 0), -1):
             try:
-                response = await client.get(
-                    str(payload.url), headers=headers
-                )  # HttpUrlをstrに変換
-                response.raise_for_status()  # Raises HTTPStatusError for 4xx/5xx responses
-                return response
-            except httpx.HTTPStatusError as e:
-                raise ConnectionError(
-                    f"HTTP error: {e.response.status_code} for url: {e.request.url}"
-                ) from e
-            except httpx.RequestError as e:
-                raise ConnectionError(
-                    f"Failed to fetch {payload.url}: {type(e).__name__}"
-                ) from e
-            except Exception as e:
-                # Handle potential URL parsing issues or other unexpected errors
-                raise ConnectionError(
-                    f"An unexpected error occurred for {payload.url}: {e}"
-                ) from e
+                body[:cut].decode("utf-8")
+                return body[:cut]
+            except UnicodeDecodeError:
+                continue
+        return body  # Not UTF-8; decoded with the declared encoding
+
+    @staticmethod
+    def _trim_partial_tag(html: str) -> str:
+        """Drops a tag cut in half at the end of truncated HTML, which would be converted as text."""
+        start = html.rfind("<")
+        return html[:start] if start > html.rfind(">") else html
+
+    @staticmethod
+    async def _fetch(payload: FetchRequestArgs) -> tuple[httpx.Response, str, bool]:
+        """
+        Internal fetch method using httpx.
+        Returns the response, its cache status ("hit", "revalidated", "miss" or "bypass") and
+        whether its body was cut at the byte cap of the request.
+        """
+        url = str(payload.url)  # HttpUrlをstrに変換
+        max_bytes = payload.max_bytes or DEFAULT_FETCH_MAX_BYTES
+        cache = Fetcher.cache
+        key = cache_key(url, payload.headers)
+        entry = cache.get(key)
+        if entry is not None and entry["fresh"]:
+            cache.hits += 1
+            truncated = len(entry["body"]) > max_bytes
+            if truncated:
+                entry["body"] = Fetcher._trim_partial_character(entry["body"][:max_bytes])
+            return Fetcher._cached_response(url, entry), "hit", truncated
+
+        # Custom headers are merged over the client's default headers
+        headers = dict(payload.headers or {})
+        if entry is not None:
+            # Stale: a conditional GET lets the server answer "304 Not Modified" without a body
+            if "etag" in entry["headers"]:
+                headers["If-None-Match"] = entry["headers"]["etag"]
+            if "last-modified" in entry["headers"]:
+                headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+        try:
+            async with Fetcher.client().stream("GET", url, headers=headers) as streamed:
+                if entry is not None and streamed.status_code == 304:
+                    cache.revalidations += 1
+                    cache.refresh(key, entry, streamed.headers)
+                    truncated = len(entry["body"]) > max_bytes
+                    if truncated:
+                        entry["body"] = Fetcher._trim_partial_character(entry["body"][:max_bytes])
+                    return Fetcher._cached_response(url, entry), "revalidated", truncated
+                streamed.raise_for_status()  # Raises HTTPStatusError for 4xx/5xx responses
+                body, truncated = await Fetcher._read_capped(streamed, max_bytes)
+            if truncated:
+                body = Fetcher._trim_partial_character(body)
+            # The body is decoded already, so its encoding and length headers no longer apply
+            response = httpx.Response(
+                streamed.status_code,
+                headers=[
+                    (name, value)
+                    for name, value in streamed.headers.multi_items()
+                    if name not in ("content-encoding", "content-length", "transfer-encoding")
+                ],
+                content=body,
+                request=streamed.request,
+            )
+            if (
+                truncated
+                or not cache.enabled
+                or response.status_code != 200
+                or "no-store" in response.headers.get("cache-control", "")
+                or not cache.put(key, url, response.headers, body)
+            ):
+                return response, "bypass", truncated
+            cache.misses += 1
+            return response, "miss", truncated
+        except httpx.HTTPStatusError as e:
+            raise ConnectionError(
+                f"HTTP error: {e.response.status_code} for url: {e.request.url}"
+            ) from e
+        except httpx.RequestError as e:
+            raise ConnectionError(
+                f"Failed to fetch {payload.url}: {type(e).__name__}"
+            ) from e
+        except Exception as e:
+            # Handle potential URL parsing issues or other unexpected errors
+            raise ConnectionError(
+                f"An unexpected error occurred for {payload.url}: {e}"
+            ) from e
 
     @staticmethod
     async def html(payload: FetchRequestArgs) -> FetchResponse:
         """Fetches content as raw HTML."""
         try:
-            response = await Fetcher._fetch(payload)
+            response, cache_status, truncated = await Fetcher._fetch(payload)
             html_content = await response.aread()  # Read as bytes
             # Try decoding with UTF-8 first, then fallback or use detected encoding
             try:
@@ -69,7 +236,10 @@ class Fetcher:
                 html_text = html_content.decode(detected_encoding, errors="replace")
 
             return FetchResponse(
-                content=[{"type": "text", "text": html_text}], isError=False
+                content=[{"type": "text", "text": html_text}],
+                isError=False,
+                cacheStatus=cache_status,
+                truncated=truncated,
             )
         except Exception as e:
             return FetchResponse(content=[], isError=True, errorMessage=str(e))
@@ -78,7 +248,14 @@ class Fetcher:
     async def json(payload: FetchRequestArgs) -> FetchResponse:
         """Fetches content and parses it as JSON."""
         try:
-            response = await Fetcher._fetch(payload)
+            response, cache_status, truncated = await Fetcher._fetch(payload)
+            if truncated:
+                # Part of a JSON document cannot be parsed
+                return FetchResponse(
+                    content=[],
+                    isError=True,
+                    errorMessage=f"The JSON from {payload.url} is larger than {payload.max_bytes or DEFAULT_FETCH_MAX_BYTES} bytes",
+                )
             # httpx's response.json() handles decoding
             json_content = (
                 response.json()
@@ -86,7 +263,10 @@ class Fetcher:
             # JSONを整形して文字列化
             json_string = json.dumps(json_content, indent=2, ensure_ascii=False)
             return FetchResponse(
-                content=[{"type": "text", "text": json_string}], isError=False
+                content=[{"type": "text", "text": json_string}],
+                isError=False,
+                cacheStatus=cache_status,
+                truncated=truncated,
             )
         except json.JSONDecodeError as e:
             return FetchResponse(
@@ -101,7 +281,7 @@ class Fetcher:
     async def txt(payload: FetchRequestArgs) -> FetchResponse:
         """Fetches content and returns plain text."""
         try:
-            response = await Fetcher._fetch(payload)
+            response, cache_status, truncated = await Fetcher._fetch(payload)
             html_content = (
                 await response.aread()
             )  # Read as bytes for bs4 encoding detection
@@ -116,16 +296,75 @@ class Fetcher:
             # Normalize whitespace
             # normalized_text = ' '.join(text.split())
             return FetchResponse(
-                content=[{"type": "text", "text": text}], isError=False
+                content=[{"type": "text", "text": text}],
+                isError=False,
+                cacheStatus=cache_status,
+                truncated=truncated,
             )
         except Exception as e:
             return FetchResponse(content=[], isError=True, errorMessage=str(e))
 
+    # Markdown fetches in progress by request, shared by identical concurrent requests
+    _markdown_in_flight: Dict[str, "asyncio.Task[FetchResponse]"] = {}
+
+    @staticmethod
+    def _page(response: FetchResponse, start_index: int, max_length: int) -> FetchResponse:
+        """Returns the part of a converted page from `start_index`, of at most `max_length` characters (0 for all)."""
+        if response.isError:
+            return response.model_copy()
+        text = response.content[0]["text"]
+        if start_index > 0 and start_index >= len(text):
+            return FetchResponse(
+                content=[],
+                isError=True,
+                errorMessage=f"start_index {start_index} is past the end of the content ({len(text)} characters)",
+            )
+        end = len(text) if max_length <= 0 else min(len(text), start_index + max_length)
+        if end < len(text):
+            # End the page at a line break if there is one in its second half
+            line_end = text.rfind("\n", start_index + max_length // 2, end)
+            if line_end != -1:
+                end = line_end + 1
+        return response.model_copy(
+            update={
+                "content": [{"type": "text", "text": text[start_index:end]}],
+                "totalLength": len(text),
+                "startIndex": start_index,
+                "nextIndex": end if end < len(text) else None,
+            }
+        )
+
     @staticmethod
     async def markdown(payload: FetchRequestArgs) -> FetchResponse:
-        """Fetches content and converts it to Markdown."""
+        """
+        Fetches content, converts it to Markdown with the engine of the request and returns the
+        page of it selected by `start_index` and `max_length`; `nextIndex` of the response is
+        the start of the next page.
+        Concurrent requests for the same URL with the same headers wait on a single fetch
+        and conversion and share its result.
+        """
+        key = (
+            f"{cache_key(str(payload.url), payload.headers)}:{payload.max_bytes}:"
+            f"{payload.engine or DEFAULT_FETCH_MARKDOWN_ENGINE}"
+        )
+        task = Fetcher._markdown_in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(Fetcher._markdown(payload))
+            Fetcher._markdown_in_flight[key] = task
+            task.add_done_callback(
+                lambda done: Fetcher._markdown_in_flight.pop(key, None)
+                if Fetcher._markdown_in_flight.get(key) is done
+                else None
+            )
+        # Shielded, so that a cancelled caller does not cancel the fetch of the others
+        response = await asyncio.shield(task)
+        max_length = DEFAULT_FETCH_MAX_LENGTH if payload.max_length is None else payload.max_length
+        return Fetcher._page(response, payload.start_index, max_length)
+
+    @staticmethod
+    async def _markdown(payload: FetchRequestArgs) -> FetchResponse:
         try:
-            response = await Fetcher._fetch(payload)
+            response, cache_status, truncated = await Fetcher._fetch(payload)
             html_content = await response.aread()
             # Decode carefully before passing to markdownify
             try:
@@ -133,11 +372,19 @@ class Fetcher:
             except UnicodeDecodeError:
                 detected_encoding = response.encoding or "iso-8859-1"
                 html_text = html_content.decode(detected_encoding, errors="replace")
+            if truncated:
+                html_text = Fetcher._trim_partial_tag(html_text)
 
-            # Use custom NoImagesConverter to ignore images
-            converter = NoImagesConverter()
-            md = converter.convert(html_text)
+            engine = payload.engine or DEFAULT_FETCH_MARKDOWN_ENGINE
+            if engine not in MARKDOWN_ENGINES:
+                raise ValueError(f"Unknown Markdown engine: {engine}")
+            md = MARKDOWN_ENGINES[engine](html_text)
 
-            return FetchResponse(content=[{"type": "text", "text": md}], isError=False)
+            return FetchResponse(
+                content=[{"type": "text", "text": md}],
+                isError=False,
+                cacheStatus=cache_status,
+                truncated=truncated,
+            )
         except Exception as e:
             return FetchResponse(content=[], isError=True, errorMessage=str(e))
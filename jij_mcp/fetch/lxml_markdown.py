@@ -0,0 +1,260 @@
+"""
+HTML to Markdown conversion built directly on lxml.
+
+Unlike `NoImagesConverter` (markdownify on BeautifulSoup), it first extracts the main
+content of the page (`<main>`, `<article>`, `role="main"` or a `#content` container)
+and drops navigation, sidebars and footers, so less HTML is converted and the agent
+receives only the part of the page it asked for. Images are dropped, as with
+`NoImagesConverter`, and text is not escaped.
+"""
+
+import re
+from typing import Union
+
+import lxml.etree
+import lxml.html
+
+
+# Elements whose content is never converted
+_DROPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "img", "picture", "video", "audio",
+    "iframe", "canvas", "button", "input", "select", "textarea", "head",
+}
+# Page chrome dropped from the main content
+_CHROME_TAGS = ("nav", "aside", "footer")
+_CHROME_ROLES = ("navigation", "complementary", "contentinfo", "search")
+# Containers of the main content, in order of preference
+_MAIN_CONTENT_XPATHS = (
+    "//main",
+    "//article",
+    "//*[@role='main']",
+    "//*[@id='content' or @id='main-content' or @id='main']",
+)
+_BLOCK_TAGS = {
+    "address", "article", "blockquote", "body", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "html", "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "ul",
+}
+_HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+# Permalink marks that documentation generators append to headings
+_HEADING_MARKS = " #¶\U0001f517"
+
+_WHITESPACE = re.compile(r"[ \t\r\n\f\v]+")
+_LANGUAGE_CLASS = re.compile(r"(?:language|lang|highlight)-([\w+#-]+)")
+
+
+def _tag(element: lxml.etree._Element) -> str:
+    # Comments and processing instructions have a function as their tag
+    return element.tag.lower() if isinstance(element.tag, str) else ""
+
+
+def _collapse(text: str) -> str:
+    return _WHITESPACE.sub(" ", text)
+
+
+def _clean_inline(text: str) -> str:
+    """Trims the lines of inline Markdown; `<br>` line breaks are kept."""
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def _wrap(text: str, mark: str) -> str:
+    """Wraps inline text in an emphasis mark, keeping the surrounding spaces outside of it."""
+    stripped = text.strip()
+    if not stripped:
+        return text
+    return text[: len(text) - len(text.lstrip())] + mark + stripped + mark + text[len(text.rstrip()) :]
+
+
+def _inline(element: lxml.etree._Element) -> str:
+    """Markdown of the text and inline children of an element."""
+    parts = [_collapse(element.text or "")]
+    for child in element:
+        parts.append(_inline_element(child))
+        parts.append(_collapse(child.tail or ""))
+    return "".join(parts)
+
+
+def _inline_element(element: lxml.etree._Element) -> str:
+    tag = _tag(element)
+    if not tag or tag in _DROPPED_TAGS:
+        return ""
+    if tag == "br":
+        return "\n"
+    if tag in ("code", "kbd", "samp", "tt"):
+        code = _collapse(element.text_content())
+        return _wrap(code, "``" if "`" in code else "`")
+    inner = _inline(element)
+    if tag == "a":
+        text = inner.strip()
+        href = element.get("href", "")
+        if not text or text.strip(_HEADING_MARKS) == "":
+            return ""  # Icon or permalink anchor
+        if not href or href.startswith(("#", "javascript:")):
+            return inner
+        return inner.replace(text, f"[{text}]({href})", 1)
+    if tag in ("strong", "b"):
+        return _wrap(inner, "**")
+    if tag in ("em", "i"):
+        return _wrap(inner, "*")
+    if tag in _BLOCK_TAGS:
+        # A block inside inline content, e.g. a <div> inside a link or a table cell
+        return " " + inner + " "
+    return inner
+
+
+def _blocks(element: lxml.etree._Element, out: list[str]) -> None:
+    """Appends the Markdown blocks of the content of an element to `out`."""
+    inline = [_collapse(element.text or "")]
+
+    def flush() -> None:
+        text = _clean_inline("".join(inline))
+        inline.clear()
+        if text:
+            out.append(text)
+
+    for child in element:
+        if _tag(child) in _BLOCK_TAGS:
+            flush()
+            _block(child, out)
+        else:
+            inline.append(_inline_element(child))
+        inline.append(_collapse(child.tail or ""))
+    flush()
+
+
+def _block(element: lxml.etree._Element, out: list[str]) -> None:
+    tag = _tag(element)
+    if tag in _HEADING_LEVELS:
+        text = _clean_inline(_inline(element)).replace("\n", " ").rstrip(_HEADING_MARKS)
+        if text:
+            out.append("#" * _HEADING_LEVELS[tag] + " " + text)
+    elif tag == "pre":
+        code = element.text_content().strip("\n")
+        classes = " ".join(
+            node.get("class", "") for node in (element, *element.iterchildren("code"))
+        )
+        language = _LANGUAGE_CLASS.search(classes)
+        fence = "````" if "```" in code else "```"
+        out.append(f"{fence}{language.group(1) if language else ''}\n{code}\n{fence}")
+    elif tag in ("ul", "ol"):
+        text = _list(element, ordered=tag == "ol")
+        if text:
+            out.append(text)
+    elif tag == "blockquote":
+        quoted: list[str] = []
+        _blocks(element, quoted)
+        if quoted:
+            out.append(
+                "\n".join(f"> {line}" if line else ">" for line in "\n\n".join(quoted).split("\n"))
+            )
+    elif tag == "table":
+        text = _table(element)
+        if text:
+            out.append(text)
+    elif tag == "hr":
+        out.append("---")
+    elif tag == "dt":
+        text = _clean_inline(_inline(element))
+        if text:
+            out.append(_wrap(text, "**"))
+    else:
+        _blocks(element, out)
+
+
+def _list(element: lxml.etree._Element, ordered: bool) -> str:
+    lines = []
+    try:
+        number = int(element.get("start", "1"))
+    except ValueError:
+        number = 1
+    for item in element:
+        if _tag(item) != "li":
+            continue
+        content: list[str] = []
+        _blocks(item, content)
+        if not content:
+            continue
+        marker = f"{number}. " if ordered else "- "
+        number += 1
+        item_lines = "\n".join(content).split("\n")
+        lines.append(marker + item_lines[0])
+        # Continuation lines and nested lists are indented under the marker
+        lines.extend(" " * len(marker) + line if line else "" for line in item_lines[1:])
+    return "\n".join(lines)
+
+
+def _table(element: lxml.etree._Element) -> str:
+    rows = []
+    for row in element.iter("tr"):
+        cells = []
+        for cell in row:
+            if _tag(cell) not in ("th", "td"):
+                continue
+            content: list[str] = []
+            _blocks(cell, content)
+            cells.append(" ".join(" ".join(content).split("\n")).replace("|", "\\|"))
+        if cells:
+            rows.append(cells)
+    if not rows:
+        return ""
+    width = max(len(cells) for cells in rows)
+    lines = []
+    for index, cells in enumerate(rows):
+        lines.append("| " + " | ".join(cells + [""] * (width - len(cells))) + " |")
+        if index == 0:
+            lines.append("|" + " --- |" * width)
+    return "\n".join(lines)
+
+
+def main_content(root: lxml.etree._Element) -> lxml.etree._Element:
+    """
+    Returns the element holding the main content of a page, with its navigation, sidebars
+    and footers removed: the largest `<main>`, else `<article>`, else `role="main"` or
+    `#content` container, else the whole body.
+    """
+    content = None
+    for xpath in _MAIN_CONTENT_XPATHS:
+        candidates = root.xpath(xpath)
+        if candidates:
+            content = max(candidates, key=lambda candidate: len(candidate.text_content()))
+            break
+    if content is None:
+        content = root.find("body")
+        if content is None:
+            content = root
+    chrome = list(content.iter(*_CHROME_TAGS)) + [
+        node for node in content.iter(lxml.etree.Element) if node.get("role") in _CHROME_ROLES
+    ]
+    for node in chrome:
+        if node is not content and node.getparent() is not None:
+            node.drop_tree()  # Keeps the text that follows the element
+    return content
+
+
+def html_to_markdown(html: Union[str, bytes], extract_main_content: bool = True) -> str:
+    """
+    Converts an HTML page to Markdown.
+
+    Args:
+        html: The page, as text or as bytes (decoded with the charset the page declares).
+        extract_main_content: Whether only the main content of the page is converted.
+
+    Returns:
+        str: The Markdown, or an empty string for an empty page.
+    """
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Text with an XML encoding declaration is only accepted as bytes
+        if not isinstance(html, str):
+            raise
+        root = lxml.html.document_fromstring(html.encode("utf-8"))
+    except lxml.etree.ParserError:
+        return ""  # Document is empty
+    content = main_content(root) if extract_main_content else root
+    out: list[str] = []
+    if _tag(content) in _BLOCK_TAGS and content is not root:
+        _block(content, out)
+    else:
+        _blocks(content, out)
+    return "\n\n".join(out) + "\n" if out else ""
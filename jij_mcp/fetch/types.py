@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional
+from typing import Literal, Optional
 
 
 class FetchRequestArgs(BaseModel):
@@ -9,6 +9,23 @@ class FetchRequestArgs(BaseModel):
     headers: Optional[dict[str, str]] = Field(
         default=None, description="Optional headers to include in the request."
     )
+    max_bytes: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Bytes of the response body to download at most; the download stops there. Defaults to the server's limit.",
+    )
+    start_index: int = Field(
+        default=0, ge=0, description="Character of the converted content to start at."
+    )
+    max_length: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="Characters of the converted content to return at most (0 for all). Defaults to the server's limit.",
+    )
+    engine: Optional[Literal["markdownify", "lxml"]] = Field(
+        default=None,
+        description='Markdown conversion engine: "markdownify" converts the whole page, "lxml" only its main content. Defaults to the server\'s engine.',
+    )
 
 
 # エラーを含む可能性のあるレスポンス型
@@ -16,3 +33,12 @@ class FetchResponse(BaseModel):
     content: list[dict[str, str]]  # MCP標準のcontent形式に合わせる
     isError: bool = False
     errorMessage: Optional[str] = None
+    # HTTPキャッシュの利用状況: "hit"(キャッシュから返却), "revalidated"(304で再検証),
+    # "miss"(サーバーから取得して保存), "bypass"(キャッシュ対象外)
+    cacheStatus: Optional[Literal["hit", "revalidated", "miss", "bypass"]] = None
+    # ダウンロードが max_bytes で打ち切られたか
+    truncated: bool = False
+    # ページ分割: 変換後の全体の文字数, このページの開始位置, 続きの開始位置(最後のページならNone)
+    totalLength: Optional[int] = None
+    startIndex: Optional[int] = None
+    nextIndex: Optional[int] = None
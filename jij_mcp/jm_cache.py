@@ -0,0 +1,119 @@
+"""
+Cache of jm_check execution results, keyed by the canonical form of the code.
+
+Code that differs only in comments, formatting, docstrings or `description=` strings has
+the same canonical form, so a cosmetically edited submission is answered without being
+executed again. Positions in a cached result refer to the code it was computed for; they
+are mapped to the submitted code through the AST, whose nodes correspond one to one.
+"""
+
+import ast
+import hashlib
+import os
+import typing as typ
+
+from py_checker.result_cache import CheckResultCache
+from python_repr import line_context
+
+
+# Seconds a cached jm_check result stays valid, and the maximum number of cached results
+DEFAULT_JM_CACHE_TTL = float(os.environ.get("JIJ_MCP_JM_CACHE_TTL", "3600"))
+DEFAULT_JM_CACHE_MAX_ENTRIES = int(os.environ.get("JIJ_MCP_JM_CACHE_MAX_ENTRIES", "1024"))
+# Whether docstrings and description= strings are left out of the canonical form
+DEFAULT_JM_CACHE_IGNORE_DESCRIPTIONS = os.environ.get(
+    "JIJ_MCP_JM_CACHE_IGNORE_DESCRIPTIONS", "1"
+).lower() not in ("0", "false", "no")
+
+
+class _StripDescriptions(ast.NodeTransformer):
+    """Blanks docstrings and `description=` string arguments, which do not change execution."""
+
+    def _strip_docstring(self, node: ast.AST) -> ast.AST:
+        body = getattr(node, "body", None)
+        if (
+            body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            body[0].value.value = ""
+        self.generic_visit(node)
+        return node
+
+    visit_Module = _strip_docstring
+    visit_FunctionDef = _strip_docstring
+    visit_AsyncFunctionDef = _strip_docstring
+    visit_ClassDef = _strip_docstring
+
+    def visit_keyword(self, node: ast.keyword) -> ast.keyword:
+        if (
+            node.arg == "description"
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        ):
+            node.value.value = ""
+        return node
+
+
+def canonical_tree(
+    tree: ast.Module, ignore_descriptions: bool = DEFAULT_JM_CACHE_IGNORE_DESCRIPTIONS
+) -> tuple[str, list[int]]:
+    """
+    Returns the canonical form of a parsed module, and the line of each of its nodes in
+    walk order, which `remap_result` uses to translate positions. The tree is modified.
+    """
+    if ignore_descriptions:
+        _StripDescriptions().visit(tree)
+    lines = [node.lineno for node in ast.walk(tree) if hasattr(node, "lineno")]
+    return ast.dump(tree, include_attributes=False), lines
+
+
+def cache_key(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def remap_result(
+    result: dict, code: str, cached_lines: list[int], lines: list[int]
+) -> dict:
+    """
+    Translates the line numbers of a cached execution result, computed for code whose
+    nodes were on `cached_lines`, to `code`, whose nodes are on `lines`.
+    """
+    error = result.get("error")
+    if not error or not error.get("line_number"):
+        return result
+    try:
+        line_number = lines[cached_lines.index(error["line_number"])]
+    except ValueError:
+        return result  # Not the line of a node, e.g. a blank line
+    remapped = line_context(code, line_number)
+    remapped.update({k: v for k, v in error.items() if k not in remapped})
+    remapped["error_type"] = error["error_type"]
+    result["error"] = remapped
+    return result
+
+
+def lookup(code: str) -> tuple[str, list[int], typ.Optional[dict]]:
+    """
+    Looks up the execution result of `code`.
+
+    Returns:
+        tuple: The cache key and node lines to `store` a new result with, and the cached
+        result with its positions mapped to `code`, or None.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    canonical, lines = canonical_tree(ast.parse(code))
+    key = cache_key(canonical)
+    entry = jm_check_cache.get(key)
+    if entry is None:
+        return key, lines, None
+    return key, lines, remap_result(entry["result"], code, entry["lines"], lines)
+
+
+def store(key: str, lines: list[int], result: dict) -> None:
+    jm_check_cache.put(key, {"result": result, "lines": lines})
+
+
+jm_check_cache = CheckResultCache(DEFAULT_JM_CACHE_MAX_ENTRIES, DEFAULT_JM_CACHE_TTL)
@@ -1,6 +1,12 @@
 import ast
+import asyncio
 import re
-from python_repr import PythonREPL
+import time
+import typing as typ
+import jm_cache
+from jm_rewrite import rewrite_for_loops
+from jm_rules import check_rules, format_findings
+from jm_runner.pool import WorkerError, jm_worker_pool
 
 
 _jm_for_statement_check = """In JijModeling, you cannot use Python loops directly. Instead, you should use the Element objects.
@@ -20,10 +26,10 @@ for l in range(n_l):
 
 The correct code:
 ```
-l = jm.Element("l", belongs_to=range(0, n_l))
-t = jm.Element("t", belongs_to=range(0, n_t))
-p = jm.Element("p", belongs_to=range(0, n_p))
-q = jm.Element("q", belongs_to=range(0, n_p))
+l = jm.Element("l", belong_to=(0, n_l))
+t = jm.Element("t", belong_to=(0, n_t))
+p = jm.Element("p", belong_to=(0, n_p))
+q = jm.Element("q", belong_to=(0, n_p))
 objective = jm.sum([l, t, p, (q, p != q)], ChangeCost[p, q] * Switch[p, q, l, t])
 ```
 
@@ -42,9 +48,9 @@ for l in range(n_l):
 
 The correct code:
 ```python
-l = jm.Element("l", belongs_to=range(0, n_l))
-t = jm.Element("t", belongs_to=range(0, n_t))
-p = jm.Element("p", belongs_to=range(0, n_p))
+l = jm.Element("l", belong_to=(0, n_l))
+t = jm.Element("t", belong_to=(0, n_t))
+p = jm.Element("p", belong_to=(0, n_p))
 problem += jm.Constraint(
     "SingleProductPerLine",
     jm.sum(p, X[p, l, t]) <= 1,
@@ -54,38 +60,228 @@ problem += jm.Constraint(
 """
 
 
-def jijmodeling_check(code_string: str) -> dict:
+async def jijmodeling_check(
+    code_string: str,
+    timeout_seconds: typ.Optional[float] = None,
+    memory_mb: typ.Optional[int] = None,
+    session_id: typ.Optional[str] = None,
+) -> dict:
     """
     Pythonコード文字列をJijModelingのルールに従ってチェックする関数
+    コードはサーバープロセスではなく、ワーカープロセスで実行される
 
     Args:
         code_string (str): 解析対象のPythonコード文字列
+        timeout_seconds (float, optional): 実行時間の上限（秒）。サーバーの上限を超えられない
+        memory_mb (int, optional): コードが確保できるメモリの上限（MiB）。サーバーの上限を超えられない
+        session_id (str, optional): セッションID。同じセッションでは、前回から変更のない先頭の文は再実行されない
 
     Returns:
-        dict: チェック結果を含む辞書
+        dict: チェック結果を含む辞書。静的ルールの指摘は"findings"に行・列付きで含まれる
+            セッションでは、再利用・実行された文の数が"incremental"に含まれる
+            実行結果がキャッシュから返された場合は"cache_hit"がTrueになる
     """
-    # for文の検出
-    for_loop_detected = detect_for_loop(code_string)
+    # 静的ルールのチェック（コードを実行せず、1回のAST走査ですべてのルールを適用）
+    try:
+        findings = check_rules(code_string)
+        for_loop_detected = any(f["rule"] == "for-loop" for f in findings)
+        parsed = True
+    except SyntaxError:
+        parsed = False
+        # 構文エラーは実行時に報告される。for文は正規表現で検出する
+        findings = []
+        for_loop_detected = detect_for_loop(code_string)
+
     if for_loop_detected:
-        return {
+        check_result = {
             "for_loop_detected": True,
             "message": _jm_for_statement_check,
+            "findings": findings,
         }
+        if parsed:
+            suggested_rewrite = await suggest_loop_rewrite(code_string, timeout_seconds, memory_mb)
+            if suggested_rewrite is not None:
+                check_result["suggested_rewrite"] = suggested_rewrite
+        return check_result
 
-    # PythonREPLを使用してコードを実行し、エラーをキャッチ
-    result = PythonREPL.run(code_string)
+    # エラーの指摘がある場合は、コードを実行せずに返す
+    rule_errors = [f for f in findings if f["severity"] == "error"]
+    if rule_errors:
+        return {
+            "for_loop_detected": False,
+            "message": "JijModeling rule violations found:\n" + format_findings(rule_errors),
+            "findings": findings,
+        }
+
+    # 見た目だけが異なるコード（コメント・空白・説明文）の実行結果はキャッシュから返す
+    cache_key, cache_lines, result = None, [], None
+    if session_id is None and parsed:
+        cache_key, cache_lines, result = jm_cache.lookup(code_string)
+
+    # ワーカープロセスのPythonREPLでコードを実行し、エラーをキャッチ
+    if result is None:
+        try:
+            result = await jm_worker_pool.run(code_string, timeout_seconds, memory_mb, session_id)
+        except WorkerError as e:
+            result = {
+                "status": "error",
+                "error": {
+                    "line_number": None,
+                    "error_line": None,
+                    "context": None,
+                    "error_type": f"WorkerError: {e}",
+                },
+            }
+        else:
+            # 制限で中断された結果は、制限によって変わるのでキャッシュしない
+            if cache_key is not None and "progress" not in result:
+                jm_cache.store(cache_key, cache_lines, result)
+        cache_hit = False
+    else:
+        cache_hit = True
 
     if result["status"] == "error":
-        return {
+        check_result = {
             "for_loop_detected": False,
             "message": _jm_for_statement_check,
             "error": result["error"],
+            "findings": findings,
+            "cache_hit": cache_hit,
         }
+        # タイムアウトやメモリ上限で中断された場合は、どこまで実行されたかを返す
+        if "progress" in result:
+            check_result["progress"] = result["progress"]
+        if "incremental" in result:
+            check_result["incremental"] = result["incremental"]
+        return check_result
 
-    return {
+    check_result = {
         "for_loop_detected": False,
         "message": "No for loop detected and no errors found.",
+        "findings": findings,
+        "cache_hit": cache_hit,
+    }
+    if "incremental" in result:
+        check_result["incremental"] = result["incremental"]
+    return check_result
+
+
+async def suggest_loop_rewrite(
+    code_string: str,
+    timeout_seconds: typ.Optional[float] = None,
+    memory_mb: typ.Optional[int] = None,
+) -> typ.Optional[dict]:
+    """
+    for文をjm.Elementとjm.sum・forallに書き換えたコードを作り、それが実行できるかを確かめる関数
+
+    Args:
+        code_string (str): for文を含むPythonコード文字列
+        timeout_seconds (float, optional): 書き換えたコードの実行時間の上限（秒）
+        memory_mb (int, optional): 書き換えたコードが確保できるメモリの上限（MiB）
+
+    Returns:
+        dict | None: 書き換えたコード"code"、差分"diff"、実行できたか"verified"、
+            書き換えなかったfor文"skipped"と残った静的ルールの指摘"findings"を含む辞書。
+            書き換えられるfor文がない場合はNone
+    """
+    rewrite = rewrite_for_loops(code_string)
+    if not rewrite["rewrites"]:
+        return None
+    try:
+        result = await jm_worker_pool.run(rewrite["code"], timeout_seconds, memory_mb)
+    except WorkerError as e:
+        result = {"status": "error", "error": {"error_type": f"WorkerError: {e}"}}
+    suggested_rewrite = {
+        "code": rewrite["code"],
+        "diff": rewrite["diff"],
+        "verified": result["status"] == "success",
+        "skipped": rewrite["skipped"],
+        "findings": check_rules(rewrite["code"]),
     }
+    if result["status"] != "success":
+        suggested_rewrite["error"] = result["error"]
+    return suggested_rewrite
+
+
+async def jijmodeling_check_batch(
+    code_strings: list[str],
+    timeout_seconds: typ.Optional[float] = None,
+    memory_mb: typ.Optional[int] = None,
+    on_result: typ.Optional[typ.Callable[[int, dict], typ.Awaitable[None]]] = None,
+) -> list[dict]:
+    """
+    複数のコード文字列を並列にチェックする関数
+    各コードは別々のワーカーで実行され、並列数はワーカープールの大きさで制限される
+
+    Args:
+        code_strings (list[str]): 解析対象のPythonコード文字列のリスト
+        timeout_seconds (float, optional): コードごとの実行時間の上限（秒）
+        memory_mb (int, optional): コードごとに確保できるメモリの上限（MiB）
+        on_result (Callable, optional): 各コードのチェックが終わるたびに、終わった順に
+            on_result(index, result)として呼ばれる
+
+    Returns:
+        list[dict]: 入力と同じ順のチェック結果。各結果には"index"と所要時間"elapsed_seconds"が含まれる
+    """
+
+    async def check(index: int, code_string: str) -> tuple[int, dict]:
+        started = time.perf_counter()
+        result = await jijmodeling_check(code_string, timeout_seconds, memory_mb)
+        result["index"] = index
+        result["elapsed_seconds"] = time.perf_counter() - started
+        return index, result
+
+    results: list[typ.Optional[dict]] = [None] * len(code_strings)
+    tasks = [asyncio.ensure_future(check(i, code)) for i, code in enumerate(code_strings)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, result = await finished
+            results[index] = result
+            if on_result is not None:
+                await on_result(index, result)
+    finally:
+        # キャンセルされた場合は、実行中のチェックも止める
+        for task in tasks:
+            task.cancel()
+    return results
+
+
+async def jijmodeling_profile(
+    code_string: str,
+    instance_data: dict[str, typ.Any],
+    timeout_seconds: typ.Optional[float] = None,
+    memory_mb: typ.Optional[int] = None,
+) -> dict:
+    """
+    JijModelingのコードを実行し、定義されたjm.Problemをインスタンスデータで評価して、
+    規模（決定変数・制約・非ゼロ項の数）と各フェーズの時間、ピークメモリを返す関数
+
+    Args:
+        code_string (str): 解析対象のPythonコード文字列
+        instance_data (dict): Placeholderの名前から値への辞書
+        timeout_seconds (float, optional): 実行と評価の時間の上限（秒）。サーバーの上限を超えられない
+        memory_mb (int, optional): 実行と評価で確保できるメモリの上限（MiB）。サーバーの上限を超えられない
+
+    Returns:
+        dict: プロファイル結果を含む辞書。問題ごとの規模は"problems"に含まれる
+    """
+    try:
+        result = await jm_worker_pool.profile(
+            code_string, instance_data, timeout_seconds, memory_mb
+        )
+    except WorkerError as e:
+        result = {
+            "status": "error",
+            "error": {
+                "line_number": None,
+                "error_line": None,
+                "context": None,
+                "error_type": f"WorkerError: {e}",
+            },
+        }
+    # ワーカー内部の情報は返さない
+    result.pop("exception_type", None)
+    return result
 
 
 def detect_for_loop(code_string):
@@ -0,0 +1,419 @@
+"""
+Loading and validation of JijModeling instance data files.
+
+Arrays are never loaded whole: `.npy` files are memory-mapped, `.npz` members and CSV
+files are read as streams, and Parquet files in record batches (with the optional
+`pyarrow` package). Each file is summarized (shape, raggedness, dtype, non-finite and
+non-integer values, in-memory size) chunk by chunk, and the summaries are validated
+against the Placeholders declared by the model code.
+"""
+
+import csv
+import math
+import os
+import typing as typ
+import zipfile
+
+import numpy as np
+
+from jm_size import declared_placeholders, evaluate_polynomial, format_polynomial
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet files are not supported without pyarrow
+    pq = None
+
+
+# Directory the instance data files are read from; paths outside of it are rejected
+DEFAULT_DATA_DIR = os.environ.get("JIJ_MCP_DATA_DIR", os.getcwd())
+# Number of values scanned at once, which bounds the memory used by a scan
+_CHUNK_VALUES = 1 << 20
+_FLOAT_BYTES = np.dtype(np.float64).itemsize
+
+
+class InstanceDataError(ValueError):
+    """Raised when a data file cannot be read."""
+
+
+class _Scan:
+    """Statistics of the values of an array, accumulated chunk by chunk."""
+
+    def __init__(self):
+        self.values = 0
+        self.non_finite = 0
+        self.non_integer = 0
+
+    def add(self, chunk: np.ndarray) -> None:
+        self.values += chunk.size
+        if chunk.dtype.kind == "f":
+            finite = np.isfinite(chunk)
+            self.non_finite += int(chunk.size - np.count_nonzero(finite))
+            values = chunk[finite]
+            self.non_integer += int(np.count_nonzero(values != np.floor(values)))
+        elif chunk.dtype.kind not in "biu":
+            raise InstanceDataError(f"Unsupported dtype: {chunk.dtype}")
+
+
+def _summary(
+    path: str,
+    data_format: str,
+    shape: list[typ.Optional[int]],
+    dtype: str,
+    scan: _Scan,
+    item_bytes: int,
+    row_lengths: typ.Optional[tuple[int, int]] = None,
+) -> dict:
+    summary = {
+        "path": path,
+        "format": data_format,
+        "ndim": len(shape),
+        "shape": shape,
+        "jagged": row_lengths is not None and row_lengths[0] != row_lengths[1],
+        "dtype": dtype,
+        "values": scan.values,
+        "non_finite": scan.non_finite,
+        "non_integer": scan.non_integer,
+        "file_bytes": os.path.getsize(path),
+        # Size of the array once loaded into memory
+        "memory_bytes": scan.values * item_bytes,
+    }
+    if row_lengths is not None:
+        summary["row_lengths"] = {"min": row_lengths[0], "max": row_lengths[1]}
+    return summary
+
+
+def _dtype_name(dtype: np.dtype) -> str:
+    return "integer" if dtype.kind in "biu" else "float" if dtype.kind == "f" else str(dtype)
+
+
+def _scan_array(array: np.ndarray, scan: _Scan) -> None:
+    flat = array.reshape(-1, order="A")
+    for start in range(0, flat.size, _CHUNK_VALUES):
+        scan.add(np.asarray(flat[start : start + _CHUNK_VALUES]))
+
+
+def _read_npy(path: str) -> dict:
+    try:
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError as e:
+        # Object arrays are refused as unpicklable or, when memory-mapped, as "Python objects"
+        refused = "allow_pickle" in str(e) or "Python objects" in str(e)
+        hint = " (object arrays are not supported)" if refused else ""
+        raise InstanceDataError(f"{path}: {e}{hint}") from e
+    scan = _Scan()
+    _scan_array(array, scan)
+    return _summary(path, "npy", list(array.shape), _dtype_name(array.dtype), scan, array.dtype.itemsize)
+
+
+def _read_npz(path: str, member: typ.Optional[str]) -> dict:
+    with zipfile.ZipFile(path) as archive:
+        names = [name[: -len(".npy")] for name in archive.namelist() if name.endswith(".npy")]
+        if member is None:
+            if len(names) != 1:
+                raise InstanceDataError(
+                    f"{path} holds {len(names)} arrays; choose one with '{path}:<name>' ({', '.join(names)})"
+                )
+            member = names[0]
+        if member not in names:
+            raise InstanceDataError(f"{path} has no array '{member}' ({', '.join(names)})")
+        # Compressed members cannot be mapped; they are decompressed as a stream
+        with archive.open(member + ".npy") as f:
+            version = np.lib.format.read_magic(f)
+            read_header = (
+                np.lib.format.read_array_header_1_0
+                if version == (1, 0)
+                else np.lib.format.read_array_header_2_0
+            )
+            shape, _, dtype = read_header(f)
+            if dtype.hasobject:
+                raise InstanceDataError(f"{path}:{member}: object arrays are not supported")
+            scan = _Scan()
+            remaining = math.prod(shape)
+            while remaining:
+                count = min(remaining, _CHUNK_VALUES)
+                buffer = f.read(count * dtype.itemsize)
+                if len(buffer) < count * dtype.itemsize:
+                    raise InstanceDataError(f"{path}:{member}: the array is truncated")
+                scan.add(np.frombuffer(buffer, dtype=dtype))
+                remaining -= count
+    summary = _summary(path, "npz", list(shape), _dtype_name(dtype), scan, dtype.itemsize)
+    summary["member"] = member
+    return summary
+
+
+def _read_csv(path: str) -> dict:
+    scan = _Scan()
+    rows = 0
+    shortest, longest = math.inf, 0
+    integer = True
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            has_header = csv.Sniffer().has_header(sample)
+        except csv.Error:
+            has_header = False
+        reader = csv.reader(f)
+        if has_header:
+            next(reader, None)
+        chunk: list[float] = []
+        for row in reader:
+            # Trailing empty cells are the padding of shorter rows
+            while row and not row[-1].strip():
+                row.pop()
+            if not row:
+                continue
+            try:
+                chunk.extend(float(value) for value in row)
+            except ValueError as e:
+                raise InstanceDataError(f"{path}, row {rows + 1}: {e}") from e
+            integer = integer and all(
+                value.strip().lstrip("+-").isdigit() for value in row
+            )
+            rows += 1
+            shortest, longest = min(shortest, len(row)), max(longest, len(row))
+            if len(chunk) >= _CHUNK_VALUES:
+                scan.add(np.array(chunk))
+                chunk.clear()
+        scan.add(np.array(chunk, dtype=np.float64))
+    if rows == 0:
+        raise InstanceDataError(f"{path} has no data rows")
+    row_lengths = (int(shortest), longest)
+    shape = [rows, longest if shortest == longest else None]
+    if longest == 1:
+        shape = [rows]  # A single column is a vector
+    return _summary(
+        path, "csv", shape, "integer" if integer else "float", scan, _FLOAT_BYTES,
+        row_lengths if shortest != longest else None,
+    )
+
+
+def _read_parquet(path: str) -> dict:
+    if pq is None:
+        raise InstanceDataError("Reading Parquet files requires the pyarrow package")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    parquet_file = pq.ParquetFile(path)
+    schema = parquet_file.schema_arrow
+    scan = _Scan()
+    if len(schema) == 1 and pa.types.is_list(schema[0].type):
+        # A single list column is a jagged array, one row per list
+        shortest, longest = math.inf, 0
+        item_type = schema[0].type.value_type
+        for batch in parquet_file.iter_batches(batch_size=65536):
+            column = batch.column(0)
+            lengths = pc.list_value_length(column).fill_null(0)
+            if len(lengths):
+                shortest = min(shortest, pc.min(lengths).as_py())
+                longest = max(longest, pc.max(lengths).as_py())
+            scan.add(pc.list_flatten(column).to_numpy(zero_copy_only=False))
+        rows = parquet_file.metadata.num_rows
+        return _summary(
+            path, "parquet", [rows, None if shortest != longest else longest],
+            _dtype_name(np.dtype(item_type.to_pandas_dtype())), scan,
+            np.dtype(item_type.to_pandas_dtype()).itemsize,
+            (int(shortest), longest) if rows else None,
+        )
+    item_bytes = 0
+    dtypes = set()
+    for field in schema:
+        if not (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)):
+            raise InstanceDataError(f"{path}: column '{field.name}' is not numeric ({field.type})")
+        dtype = np.dtype(field.type.to_pandas_dtype())
+        dtypes.add(_dtype_name(dtype))
+        item_bytes = max(item_bytes, dtype.itemsize)
+    for batch in parquet_file.iter_batches(batch_size=65536):
+        for column in batch.columns:
+            scan.add(column.to_numpy(zero_copy_only=False))
+    shape = [parquet_file.metadata.num_rows, len(schema)]
+    if len(schema) == 1:
+        shape = shape[:1]
+    return _summary(
+        path, "parquet", shape, "float" if "float" in dtypes else "integer", scan, item_bytes
+    )
+
+
+def _inline_summary(value: typ.Any) -> dict:
+    """Summarizes a value given inline: a number or (nested) lists of numbers."""
+    scan = _Scan()
+    lengths: dict[int, set[int]] = {}
+
+    def walk(item: typ.Any, depth: int) -> int:
+        if isinstance(item, (list, tuple)):
+            lengths.setdefault(depth, set()).add(len(item))
+            depths = {walk(child, depth + 1) for child in item}
+            if len(depths) > 1:
+                raise InstanceDataError("the nesting depth of the value is not uniform")
+            return depths.pop() if depths else depth + 1
+        if isinstance(item, bool) or not isinstance(item, (int, float)):
+            raise InstanceDataError(f"{item!r} is not a number")
+        scan.add(np.array([item]))
+        return depth
+
+    ndim = walk(value, 0)
+    shape = [
+        next(iter(lengths[depth])) if len(lengths.get(depth, ())) == 1 else None
+        for depth in range(ndim)
+    ]
+    summary = {
+        "path": None,
+        "format": "inline",
+        "ndim": ndim,
+        "shape": shape,
+        "jagged": any(axis is None for axis in shape),
+        "dtype": "float" if scan.non_integer or isinstance(value, float) else "integer",
+        "values": scan.values,
+        "non_finite": scan.non_finite,
+        "non_integer": scan.non_integer,
+        "file_bytes": 0,
+        "memory_bytes": scan.values * _FLOAT_BYTES,
+    }
+    if ndim == 0:
+        summary["value"] = value
+    return summary
+
+
+def _resolve_path(path: str, data_dir: str) -> str:
+    root = os.path.realpath(data_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise InstanceDataError(f"{path} is outside of the data directory")
+    if not os.path.isfile(resolved):
+        raise InstanceDataError(f"{path} does not exist")
+    return resolved
+
+
+def summarize_file(path: str, data_dir: str = DEFAULT_DATA_DIR) -> dict:
+    """
+    Summarizes a data file without loading it into memory: `.npy`, `.npz` (`file.npz` if it
+    holds a single array, otherwise `file.npz:name`), `.csv` or `.parquet`.
+
+    Raises:
+        InstanceDataError: If the file is missing, outside of `data_dir` or unreadable.
+    """
+    path, _, member = path.partition(".npz:")
+    if member:
+        path += ".npz"
+    resolved = _resolve_path(path, data_dir)
+    extension = os.path.splitext(resolved)[1].lower()
+    readers = {
+        ".npy": _read_npy,
+        ".npz": lambda resolved: _read_npz(resolved, member or None),
+        ".csv": _read_csv,
+        ".parquet": _read_parquet,
+    }
+    if extension not in readers:
+        raise InstanceDataError(f"{path}: unsupported file type (use .npy, .npz, .csv or .parquet)")
+    try:
+        summary = readers[extension](resolved)
+    except (OSError, zipfile.BadZipFile, UnicodeDecodeError) as e:
+        raise InstanceDataError(f"{path}: {e}") from e
+    summary["path"] = path  # Relative to the data directory, as given
+    return summary
+
+
+def validate_instance_data(
+    code: str,
+    files: dict[str, str],
+    values: typ.Optional[dict[str, typ.Any]] = None,
+    data_dir: str = DEFAULT_DATA_DIR,
+) -> dict:
+    """
+    Validates instance data against the Placeholders declared by the code.
+
+    Args:
+        code: JijModeling code; it is not executed.
+        files: Data file of each Placeholder, by name (see `summarize_file`).
+        values: Data given inline, by Placeholder name, typically scalars such as `{"n": 10}`.
+        data_dir: Directory the file paths are relative to.
+
+    Returns:
+        dict: `valid`, `placeholders` (the data summary and errors of each Placeholder),
+        `errors`, `warnings` and the total `memory_bytes` of the data once loaded.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    placeholders = declared_placeholders(code)
+    values = values or {}
+    errors: list[str] = []
+    warnings: list[str] = []
+
+    summaries: dict[str, dict] = {}
+    for name, path in files.items():
+        try:
+            summaries[name] = summarize_file(path, data_dir)
+        except InstanceDataError as e:
+            errors.append(f"{name}: {e}")
+    for name, value in values.items():
+        try:
+            summaries[name] = _inline_summary(value)
+        except InstanceDataError as e:
+            errors.append(f"{name}: {e}")
+
+    # Dimensions known from the data: scalar values, and the shapes of the arrays
+    sizes: dict[str, typ.Any] = {}
+    for name, summary in summaries.items():
+        if summary["ndim"] == 0 and "value" in summary:
+            sizes[name] = summary["value"]
+        elif summary["ndim"] > 0:
+            sizes[name] = summary["shape"]
+
+    declared = {placeholder["name"] for placeholder in placeholders}
+    for name in summaries:
+        if name not in declared:
+            warnings.append(f"{name}: no Placeholder of this name is declared by the code")
+
+    results = []
+    for placeholder in placeholders:
+        name = placeholder["name"]
+        summary = summaries.get(name)
+        problems: list[str] = []
+        if summary is None:
+            if not any(error.startswith(f"{name}: ") for error in errors):
+                problems.append("no data was given")
+        else:
+            if summary["ndim"] != placeholder["ndim"]:
+                problems.append(
+                    f"the Placeholder has ndim={placeholder['ndim']}, the data has {summary['ndim']} dimensions"
+                )
+            if summary["jagged"] and not placeholder["jagged"]:
+                problems.append("the data is jagged; declare the Placeholder with jagged=True")
+            if summary["non_finite"]:
+                problems.append(f"the data has {summary['non_finite']} NaN or infinite values")
+            if placeholder["dtype"] == "INTEGER" and summary["non_integer"]:
+                problems.append(
+                    f"the Placeholder has dtype INTEGER, the data has {summary['non_integer']} non-integer values"
+                )
+            for axis, expected in enumerate(placeholder["shape"] or []):
+                if expected is None or axis >= summary["ndim"] or summary["shape"][axis] is None:
+                    continue
+                value, missing = evaluate_polynomial(expected, sizes)
+                if value is not None and value != summary["shape"][axis]:
+                    problems.append(
+                        f"axis {axis} has length {summary['shape'][axis]}, but the Placeholder's shape says "
+                        f"{format_polynomial(expected)} = {value}"
+                    )
+                elif missing:
+                    warnings.append(
+                        f"{name}: axis {axis} ({format_polynomial(expected)}) cannot be checked without "
+                        + ", ".join(sorted(missing))
+                    )
+        errors.extend(f"{name}: {problem}" for problem in problems)
+        results.append(
+            {
+                "name": name,
+                "line": placeholder["line"],
+                "data": summary,
+                "errors": problems,
+            }
+        )
+
+    return {
+        "valid": not errors,
+        "placeholders": results,
+        "errors": errors,
+        "warnings": warnings,
+        "memory_bytes": sum(summary["memory_bytes"] for summary in summaries.values()),
+    }
@@ -0,0 +1,373 @@
+"""
+Rewrites Python loops of JijModeling code into Elements with jm.sum and forall.
+
+Supported patterns, at the top level of the code:
+
+    objective = 0                          l = jm.Element("l", belong_to=(0, n_l))
+    for l in range(n_l):                   p = jm.Element("p", belong_to=(0, n_p))
+        for p in range(n_p):         ->    q = jm.Element("q", belong_to=(0, n_p))
+            for q in range(n_p):           objective = jm.sum([l, p, (q, p != q)], C[p, q] * x[p, q, l])
+                if p != q:
+                    objective += C[p, q] * x[p, q, l]
+
+    for l in range(n_l):                   l = jm.Element("l", belong_to=(0, n_l))
+        problem += jm.Constraint(    ->    problem += jm.Constraint("c", x[l] <= 1, forall=[l])
+            f"c_{l}", x[l] <= 1)
+
+and comprehensions summed with jm.sum or sum, `jm.sum([x[p] for p in range(n)])`, which
+become `jm.sum(p, x[p])`. `if` conditions become conditions of the innermost index.
+Loops with other statements, `else` blocks or other iterables are left unchanged.
+"""
+
+import ast
+import copy
+import difflib
+import typing as typ
+
+from jm_rules import DECISION_VARIABLE_TYPES, RuleContext
+
+
+class _Unsupported(Exception):
+    """Raised when a loop does not follow a supported pattern."""
+
+
+class _Index:
+    """An index of a loop nest: an Element with the conditions that filter it."""
+
+    def __init__(self, name: str, lower: ast.expr, upper: ast.expr):
+        self.name = name
+        self.lower = lower
+        self.upper = upper
+        self.conditions: list[ast.expr] = []
+
+
+def _condition(node: ast.expr) -> ast.expr:
+    """Translates a Python condition into a JijModeling one (`and` -> `&`, `a < b < c` split)."""
+    if isinstance(node, ast.BoolOp):
+        operator = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = _condition(node.values[0])
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=operator, right=_condition(value))
+        return result
+    if isinstance(node, ast.Compare) and len(node.ops) > 1:
+        parts = []
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            parts.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        return _condition(ast.BoolOp(op=ast.And(), values=parts))
+    if isinstance(node, ast.Compare) and isinstance(node.ops[0], (ast.In, ast.NotIn, ast.Is, ast.IsNot)):
+        raise _Unsupported(f"the condition `{ast.unparse(node)}` has no JijModeling form")
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        raise _Unsupported(f"the condition `{ast.unparse(node)}` has no JijModeling form")
+    return node
+
+
+def _conditions(conditions: list[ast.expr]) -> ast.expr:
+    result = conditions[0]
+    for condition in conditions[1:]:
+        result = ast.BinOp(left=result, op=ast.BitAnd(), right=condition)
+    return result
+
+
+def _index_list(indices: list[_Index]) -> ast.expr:
+    """The first argument of jm.sum, or the forall of a constraint."""
+    items: list[ast.expr] = []
+    for index in indices:
+        name = ast.Name(id=index.name, ctx=ast.Load())
+        if index.conditions:
+            items.append(ast.Tuple(elts=[name, _conditions(index.conditions)], ctx=ast.Load()))
+        else:
+            items.append(name)
+    if len(items) == 1 and isinstance(items[0], ast.Name):
+        return items[0]
+    return ast.List(elts=items, ctx=ast.Load())
+
+
+class _Rewriter:
+    def __init__(self, tree: ast.Module):
+        self.context = RuleContext.from_imports(tree)
+        imported = [
+            alias.asname or alias.name
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Import)
+            for alias in node.names
+            if alias.name == "jijmodeling"
+        ]
+        self.jm = imported[0] if imported else "jm"
+        self.needs_import = not imported
+        # Element name -> dump of its belong_to bounds
+        self.elements: dict[str, str] = {}
+        self.decision_variables: set[str] = set()
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Assign)
+                and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and isinstance(node.value, ast.Call)
+            ):
+                function = self.context.jm_function(node.value)
+                if function == "Element" and len(node.value.args) > 1:
+                    self.elements[node.targets[0].id] = ast.dump(node.value.args[1])
+                elif function == "Element":
+                    for keyword in node.value.keywords:
+                        if keyword.arg == "belong_to":
+                            self.elements[node.targets[0].id] = ast.dump(keyword.value)
+                elif function in DECISION_VARIABLE_TYPES:
+                    self.decision_variables.add(node.targets[0].id)
+
+    def jm_attribute(self, name: str) -> ast.expr:
+        return ast.Attribute(value=ast.Name(id=self.jm, ctx=ast.Load()), attr=name, ctx=ast.Load())
+
+    def range_index(self, target: ast.expr, iterable: ast.expr) -> _Index:
+        if not isinstance(target, ast.Name):
+            raise _Unsupported("the loop variable is not a single name")
+        if not (
+            isinstance(iterable, ast.Call)
+            and isinstance(iterable.func, ast.Name)
+            and iterable.func.id == "range"
+            and 1 <= len(iterable.args) <= 2
+            and not iterable.keywords
+        ):
+            raise _Unsupported(f"`{ast.unparse(iterable)}` is not range(stop) or range(start, stop)")
+        if len(iterable.args) == 1:
+            return _Index(target.id, ast.Constant(0), iterable.args[0])
+        return _Index(target.id, iterable.args[0], iterable.args[1])
+
+    def declare(self, indices: list[_Index], declarations: list[ast.stmt]) -> None:
+        """Appends the Element declarations an index list needs and are not declared yet."""
+        for index in indices:
+            bounds = ast.Tuple(elts=[index.lower, index.upper], ctx=ast.Load())
+            declared = self.elements.get(index.name)
+            if declared == ast.dump(bounds):
+                continue
+            if declared is not None:
+                raise _Unsupported(f"`{index.name}` is already an Element over another range")
+            self.elements[index.name] = ast.dump(bounds)
+            declarations.append(
+                ast.Assign(
+                    targets=[ast.Name(id=index.name, ctx=ast.Store())],
+                    value=ast.Call(
+                        func=self.jm_attribute("Element"),
+                        args=[ast.Constant(index.name)],
+                        keywords=[ast.keyword(arg="belong_to", value=bounds)],
+                    ),
+                    lineno=0,
+                )
+            )
+
+    def leaves(
+        self, statements: list[ast.stmt], indices: list[_Index]
+    ) -> list[tuple[list[_Index], ast.AugAssign]]:
+        """The accumulations of a loop nest with the indices and conditions around them."""
+        found = []
+        for statement in statements:
+            if isinstance(statement, ast.For):
+                if statement.orelse:
+                    raise _Unsupported("the loop has an else block")
+                index = self.range_index(statement.target, statement.iter)
+                if any(outer.name == index.name for outer in indices):
+                    raise _Unsupported(f"the loop variable `{index.name}` is reused")
+                found.extend(self.leaves(statement.body, indices + [index]))
+            elif isinstance(statement, ast.If):
+                if statement.orelse:
+                    raise _Unsupported("the condition has an else block")
+                if not indices:
+                    raise _Unsupported("the condition is outside of the loops")
+                # Conditions of the innermost index filter the whole combination
+                conditioned = [copy.copy(index) for index in indices]
+                conditioned[-1].conditions = conditioned[-1].conditions + [
+                    _condition(statement.test)
+                ]
+                found.extend(self.leaves(statement.body, conditioned))
+            elif (
+                isinstance(statement, ast.AugAssign)
+                and isinstance(statement.op, ast.Add)
+                and isinstance(statement.target, ast.Name)
+            ):
+                found.append((indices, statement))
+            elif not isinstance(statement, ast.Pass):
+                raise _Unsupported(
+                    f"line {statement.lineno} is not an accumulation (`x += ...`) or a condition"
+                )
+        return found
+
+    def constraint(self, call: ast.Call, indices: list[_Index]) -> ast.Call:
+        call = copy.deepcopy(call)
+        # Names built from the loop variables, such as f"c_{l}", become a single name
+        if call.args and isinstance(call.args[0], ast.JoinedStr):
+            prefix = "".join(
+                value.value for value in call.args[0].values if isinstance(value, ast.Constant)
+            ).strip("_- ")
+            call.args[0] = ast.Constant(prefix or "constraint")
+        forall: list[ast.expr] = []
+        for keyword in call.keywords:
+            if keyword.arg == "forall":
+                existing = keyword.value
+                forall = list(existing.elts) if isinstance(existing, ast.List) else [existing]
+        call.keywords = [k for k in call.keywords if k.arg != "forall"]
+        new_forall = _index_list(indices)
+        items = new_forall.elts if isinstance(new_forall, ast.List) else [new_forall]
+        call.keywords.append(
+            ast.keyword(arg="forall", value=ast.List(elts=items + forall, ctx=ast.Load()))
+        )
+        return call
+
+    def rewrite_loop(
+        self, loop: ast.For, previous: typ.Optional[ast.stmt]
+    ) -> tuple[list[ast.stmt], bool]:
+        """
+        Returns the statements replacing a loop nest, and whether they also replace the
+        statement before it (an initialization `objective = 0`).
+        """
+        leaves = self.leaves([loop], [])
+        if not leaves:
+            raise _Unsupported("the loop accumulates nothing")
+        declarations: list[ast.stmt] = []
+        statements: list[ast.stmt] = []
+        merged_initialization = False
+        for indices, leaf in leaves:
+            self.declare(indices, declarations)
+            is_constraint = (
+                isinstance(leaf.value, ast.Call)
+                and self.context.jm_function(leaf.value) == "Constraint"
+            )
+            if is_constraint:
+                value = self.constraint(leaf.value, indices)
+            else:
+                value = ast.Call(
+                    func=self.jm_attribute("sum"),
+                    args=[_index_list(indices), leaf.value],
+                    keywords=[],
+                )
+            target = ast.Name(id=leaf.target.id, ctx=ast.Store())
+            # `objective = 0` followed by the loop becomes `objective = jm.sum(...)`
+            if (
+                not statements
+                and not is_constraint
+                and isinstance(previous, ast.Assign)
+                and len(previous.targets) == 1
+                and isinstance(previous.targets[0], ast.Name)
+                and previous.targets[0].id == leaf.target.id
+                and isinstance(previous.value, ast.Constant)
+                and previous.value.value == 0
+            ):
+                statements.append(ast.Assign(targets=[target], value=value, lineno=0))
+                merged_initialization = True
+            else:
+                statements.append(ast.AugAssign(target=target, op=ast.Add(), value=value))
+        return declarations + statements, merged_initialization
+
+    def rewrite_comprehensions(self, statement: ast.stmt) -> list[ast.stmt]:
+        """Rewrites the summed comprehensions of a statement, with the Elements they need."""
+        declarations: list[ast.stmt] = []
+        rewriter = self
+
+        class Transformer(ast.NodeTransformer):
+            def visit_Call(self, node: ast.Call) -> ast.AST:
+                self.generic_visit(node)
+                is_jm_sum = rewriter.context.jm_function(node) == "sum"
+                is_python_sum = isinstance(node.func, ast.Name) and node.func.id == "sum"
+                if not (is_jm_sum or is_python_sum) or len(node.args) != 1 or node.keywords:
+                    return node
+                comprehension = node.args[0]
+                if not isinstance(comprehension, (ast.ListComp, ast.GeneratorExp)):
+                    return node
+                if is_python_sum and not any(
+                    isinstance(name, ast.Name) and name.id in rewriter.decision_variables
+                    for name in ast.walk(comprehension.elt)
+                ):
+                    return node  # A sum of plain numbers
+                try:
+                    indices = []
+                    for generator in comprehension.generators:
+                        if generator.is_async:
+                            raise _Unsupported("async comprehension")
+                        index = rewriter.range_index(generator.target, generator.iter)
+                        index.conditions = [_condition(condition) for condition in generator.ifs]
+                        indices.append(index)
+                    new_declarations: list[ast.stmt] = []
+                    rewriter.declare(indices, new_declarations)
+                except _Unsupported:
+                    return node
+                declarations.extend(new_declarations)
+                return ast.Call(
+                    func=rewriter.jm_attribute("sum"),
+                    args=[_index_list(indices), comprehension.elt],
+                    keywords=[],
+                )
+
+        statement = Transformer().visit(statement)
+        return declarations + [statement]
+
+
+def _source(statements: list[ast.stmt]) -> str:
+    module = ast.Module(body=statements, type_ignores=[])
+    return ast.unparse(ast.fix_missing_locations(module))
+
+
+def rewrite_for_loops(code: str) -> dict:
+    """
+    Rewrites the supported loop patterns of the code (see the module docstring). Only the
+    rewritten top-level statements change; the rest of the code keeps its formatting.
+
+    Returns:
+        dict: `code` (the rewritten code), `diff` (a unified diff), `rewrites` (the line and
+        kind of each rewritten statement) and `skipped` (loops left unchanged, with why).
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    tree = ast.parse(code)
+    rewriter = _Rewriter(tree)
+    # (first line, last line, replacement source) of each rewritten top-level statement
+    edits: list[tuple[int, int, str]] = []
+    rewrites = []
+    skipped = []
+    previous: typ.Optional[ast.stmt] = None
+    for statement in tree.body:
+        if isinstance(statement, ast.For):
+            elements = dict(rewriter.elements)
+            try:
+                replacement, merged = rewriter.rewrite_loop(statement, previous)
+            except _Unsupported as e:
+                rewriter.elements = elements
+                skipped.append({"line": statement.lineno, "reason": str(e)})
+                previous = statement
+                continue
+            statements = []
+            for new_statement in replacement:
+                statements.extend(rewriter.rewrite_comprehensions(new_statement))
+            first_line = previous.lineno if merged else statement.lineno
+            if merged:
+                edits.pop()  # The initialization was kept unchanged as the previous edit
+            edits.append((first_line, statement.end_lineno, _source(statements)))
+            rewrites.append({"line": statement.lineno, "kind": "loop"})
+        else:
+            original = ast.dump(statement)
+            statements = rewriter.rewrite_comprehensions(copy.deepcopy(statement))
+            if ast.dump(statements[-1]) != original:
+                edits.append((statement.lineno, statement.end_lineno, _source(statements)))
+                rewrites.append({"line": statement.lineno, "kind": "comprehension"})
+            else:
+                # Kept as is; recorded so that a following loop can merge it
+                edits.append((statement.lineno, statement.end_lineno, None))
+        previous = statement
+
+    lines = code.splitlines(keepends=True)
+    for first_line, last_line, source in reversed(edits):
+        if source is not None:
+            lines[first_line - 1 : last_line] = [source + "\n"]
+    if rewrites and rewriter.needs_import:
+        lines.insert(0, f"import jijmodeling as {rewriter.jm}\n")
+    new_code = "".join(lines)
+
+    diff = "".join(
+        difflib.unified_diff(
+            code.splitlines(keepends=True),
+            new_code.splitlines(keepends=True),
+            fromfile="original",
+            tofile="rewritten",
+        )
+    )
+    return {"code": new_code, "diff": diff, "rewrites": rewrites, "skipped": skipped}
@@ -0,0 +1,252 @@
+"""
+Static JijModeling rules, checked without executing the code.
+
+The tree is visited once; every rule registered for a node type is called on each node of
+that type, in source order. To add a rule, decorate a function with `@rule`:
+
+    @rule("my-rule", ast.Call)
+    def _my_rule(node: ast.Call, context: RuleContext) -> typ.Iterator[dict]:
+        if ...:
+            yield context.finding(node, "error", "What is wrong and how to fix it.")
+"""
+
+import ast
+import typing as typ
+
+
+# Decision variable constructors of JijModeling
+DECISION_VARIABLE_TYPES = (
+    "BinaryVar",
+    "IntegerVar",
+    "ContinuousVar",
+    "SemiIntegerVar",
+    "SemiContinuousVar",
+)
+# Decision variables that need lower_bound and upper_bound
+BOUNDED_VARIABLE_TYPES = (
+    "IntegerVar",
+    "ContinuousVar",
+    "SemiIntegerVar",
+    "SemiContinuousVar",
+)
+
+RuleFunction = typ.Callable[[typ.Any, "RuleContext"], typ.Iterable[dict]]
+
+_RULES: dict[type, list[tuple[str, RuleFunction]]] = {}
+
+
+def rule(rule_id: str, *node_types: type) -> typ.Callable[[RuleFunction], RuleFunction]:
+    """Registers a rule that is called on every node of the given types."""
+
+    def register(function: RuleFunction) -> RuleFunction:
+        for node_type in node_types:
+            _RULES.setdefault(node_type, []).append((rule_id, function))
+        return function
+
+    return register
+
+
+class RuleContext:
+    """
+    What the rules know about the code visited so far: how jijmodeling was imported
+    and which names hold decision variables. It is filled during the same pass.
+    """
+
+    def __init__(self):
+        # Aliases of the jijmodeling module; snippets often use `jm` without importing it
+        self.jm_aliases = {"jm"}
+        # Names imported from jijmodeling, mapped to the original names
+        self.jm_names: dict[str, str] = {}
+        self.decision_variables: set[str] = set()
+        self.rule_id = ""
+
+    @classmethod
+    def from_imports(cls, tree: ast.AST) -> "RuleContext":
+        """A context that knows every jijmodeling import of the tree, wherever it is."""
+        context = cls()
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                _collect_imports(node, context)
+        return context
+
+    def jm_function(self, call: ast.Call) -> typ.Optional[str]:
+        """Returns the jijmodeling name called by `call` (e.g. "sum" for `jm.sum(...)`), if any."""
+        func = call.func
+        if (
+            isinstance(func, ast.Attribute)
+            and isinstance(func.value, ast.Name)
+            and func.value.id in self.jm_aliases
+        ):
+            return func.attr
+        if isinstance(func, ast.Name):
+            return self.jm_names.get(func.id)
+        return None
+
+    def finding(self, node: ast.AST, severity: str, message: str) -> dict:
+        """Builds a finding of the current rule. `line` and `column` are 1-based."""
+        return {
+            "severity": severity,
+            "line": node.lineno,
+            "column": node.col_offset + 1,
+            "message": message,
+            "rule": self.rule_id,
+        }
+
+
+def check_rules(code: str) -> list[dict]:
+    """
+    Runs every registered rule over the code in a single pass.
+
+    Returns:
+        list[dict]: The findings (`severity`, `line`, `column`, `message`, `rule`),
+        sorted by position.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    tree = ast.parse(code)
+    context = RuleContext()
+    findings: list[dict] = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for rule_id, function in _RULES.get(type(node), ()):
+            context.rule_id = rule_id
+            findings.extend(function(node, context))
+        # Children in reverse, so that nodes are visited in source order
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+    return sorted(findings, key=lambda f: (f["line"], f["column"]))
+
+
+def format_findings(findings: list[dict]) -> str:
+    """Formats findings one per line, like the Pyright CLI."""
+    return "\n".join(
+        f"{f['line']}:{f['column']} - {f['severity']}: {f['message']} ({f['rule']})"
+        for f in findings
+    )
+
+
+# Context collection --------------------------------------------------------
+@rule("imports", ast.Import, ast.ImportFrom)
+def _collect_imports(
+    node: typ.Union[ast.Import, ast.ImportFrom], context: RuleContext
+) -> typ.Iterator[dict]:
+    if isinstance(node, ast.Import):
+        for alias in node.names:
+            if alias.name == "jijmodeling":
+                context.jm_aliases.add(alias.asname or alias.name)
+    elif node.module == "jijmodeling":
+        for alias in node.names:
+            context.jm_names[alias.asname or alias.name] = alias.name
+    return iter(())
+
+
+@rule("decision-variables", ast.Assign, ast.AnnAssign)
+def _collect_decision_variables(
+    node: typ.Union[ast.Assign, ast.AnnAssign], context: RuleContext
+) -> typ.Iterator[dict]:
+    if isinstance(node.value, ast.Call) and context.jm_function(node.value) in DECISION_VARIABLE_TYPES:
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        for target in targets:
+            if isinstance(target, ast.Name):
+                context.decision_variables.add(target.id)
+    return iter(())
+
+
+# Rules ---------------------------------------------------------------------
+@rule("for-loop", ast.For, ast.AsyncFor)
+def _for_loop(node: ast.For, context: RuleContext) -> typ.Iterator[dict]:
+    yield context.finding(
+        node,
+        "error",
+        "Python for loops cannot be used to build a JijModeling model. "
+        "Use jm.Element with jm.sum(...) or Constraint(..., forall=[...]) instead.",
+    )
+
+
+@rule("comprehension-in-jm-sum", ast.Call)
+def _comprehension_in_jm_sum(node: ast.Call, context: RuleContext) -> typ.Iterator[dict]:
+    if context.jm_function(node) != "sum":
+        return
+    for argument in list(node.args) + [keyword.value for keyword in node.keywords]:
+        if isinstance(argument, (ast.ListComp, ast.GeneratorExp)):
+            yield context.finding(
+                argument,
+                "error",
+                "jm.sum takes an index and an operand, not a comprehension. "
+                "Write jm.sum(i, x[i]) with i = jm.Element(\"i\", belong_to=(0, n)).",
+            )
+
+
+@rule("unbounded-variable", ast.Call)
+def _unbounded_variable(node: ast.Call, context: RuleContext) -> typ.Iterator[dict]:
+    variable_type = context.jm_function(node)
+    if variable_type not in BOUNDED_VARIABLE_TYPES:
+        return
+    keywords = {keyword.arg for keyword in node.keywords}
+    if None in keywords:
+        return  # **kwargs may provide the bounds
+    missing = [bound for bound in ("lower_bound", "upper_bound") if bound not in keywords]
+    if missing:
+        yield context.finding(
+            node,
+            "error",
+            f"jm.{variable_type} requires {' and '.join(missing)} "
+            f"(e.g. jm.{variable_type}(\"x\", shape=(n,), lower_bound=0, upper_bound=10)).",
+        )
+
+
+@rule("belongs-to-typo", ast.Call)
+def _belongs_to_typo(node: ast.Call, context: RuleContext) -> typ.Iterator[dict]:
+    if context.jm_function(node) != "Element":
+        return
+    for keyword in node.keywords:
+        if keyword.arg == "belongs_to":
+            yield context.finding(
+                keyword,
+                "error",
+                "The keyword of jm.Element is belong_to, not belongs_to.",
+            )
+
+
+@rule("range-in-element", ast.Call)
+def _range_in_element(node: ast.Call, context: RuleContext) -> typ.Iterator[dict]:
+    if context.jm_function(node) != "Element":
+        return
+    belong_to = node.args[1] if len(node.args) > 1 else None
+    for keyword in node.keywords:
+        if keyword.arg in ("belong_to", "belongs_to"):
+            belong_to = keyword.value
+    if (
+        isinstance(belong_to, ast.Call)
+        and isinstance(belong_to.func, ast.Name)
+        and belong_to.func.id == "range"
+    ):
+        yield context.finding(
+            belong_to,
+            "error",
+            "jm.Element does not accept range(...). Use a tuple such as belong_to=(0, n), "
+            "a Placeholder or another Element.",
+        )
+
+
+@rule("python-sum-over-decision-variables", ast.Call)
+def _python_sum_over_decision_variables(
+    node: ast.Call, context: RuleContext
+) -> typ.Iterator[dict]:
+    if not (isinstance(node.func, ast.Name) and node.func.id == "sum"):
+        return
+    if "sum" in context.jm_names or not node.args:
+        return  # `from jijmodeling import sum`
+    used = {
+        name.id
+        for name in ast.walk(node.args[0])
+        if isinstance(name, ast.Name) and name.id in context.decision_variables
+    }
+    if used:
+        yield context.finding(
+            node,
+            "warning",
+            f"Python's sum() over decision variables ({', '.join(sorted(used))}) expands "
+            "every term in Python. Use jm.sum with a jm.Element index instead.",
+        )
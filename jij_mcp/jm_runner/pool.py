@@ -0,0 +1,408 @@
+import asyncio
+import collections
+import json
+import os
+import signal
+import subprocess
+import sys
+import typing as typ
+
+from python_repr import line_context
+
+
+# Number of worker processes, and therefore of jm_check runs executed in parallel
+DEFAULT_JM_WORKERS = int(
+    os.environ.get("JIJ_MCP_JM_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+# A worker is replaced after this many jobs, or once its memory exceeds the threshold
+DEFAULT_JM_WORKER_MAX_JOBS = int(os.environ.get("JIJ_MCP_JM_WORKER_MAX_JOBS", "50"))
+DEFAULT_JM_WORKER_MAX_RSS_MB = int(os.environ.get("JIJ_MCP_JM_WORKER_MAX_RSS_MB", "1024"))
+# Modules imported by a worker before it accepts jobs
+DEFAULT_JM_PRELOAD_MODULES = [
+    module.strip()
+    for module in os.environ.get("JIJ_MCP_JM_PRELOAD", "jijmodeling,numpy").split(",")
+    if module.strip()
+]
+# Number of jm_check sessions kept at once, each with a worker of its own. The least
+# recently used session is closed to make room for a new one.
+DEFAULT_JM_MAX_SESSIONS = int(os.environ.get("JIJ_MCP_JM_MAX_SESSIONS", "4"))
+# Server-wide maximums of the per-call limits: wall-clock seconds, and MiB the code
+# may allocate on top of the worker's own memory
+MAX_JM_TIMEOUT = float(os.environ.get("JIJ_MCP_JM_MAX_TIMEOUT", "30"))
+MAX_JM_MEMORY_MB = int(os.environ.get("JIJ_MCP_JM_MAX_MEMORY_MB", "2048"))
+# Seconds a worker may take to import the preloaded modules
+_STARTUP_TIMEOUT = 120
+
+# The jij_mcp directory, which holds the worker module and the modules it imports
+_SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WorkerError(RuntimeError):
+    """Raised when a worker fails to start or exits during a job."""
+
+
+class WorkerTimeout(WorkerError):
+    """Raised when a job does not finish in time."""
+
+
+class JmWorker:
+    """One worker process (see `jm_runner.worker`)."""
+
+    def __init__(self, preload_modules: list[str]):
+        self.preload_modules = preload_modules
+        self.jobs = 0
+        self.rss_bytes = 0
+        # Last progress message of the current job
+        self.progress: typ.Optional[dict] = None
+        self._process: typ.Optional[asyncio.subprocess.Process] = None
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        # A killed process keeps returncode None until it is reaped
+        return (
+            self._process is not None
+            and not self._closed
+            and self._process.returncode is None
+        )
+
+    @property
+    def returncode(self) -> typ.Optional[int]:
+        return self._process.returncode if self._process is not None else None
+
+    async def _read_message(self, timeout: typ.Optional[float] = None) -> dict:
+        try:
+            line = await asyncio.wait_for(self._process.stdout.readline(), timeout)
+        except asyncio.TimeoutError as e:
+            raise WorkerTimeout("Worker did not answer in time") from e
+        if not line:
+            await self._process.wait()
+            raise WorkerError(f"Worker exited with code {self._process.returncode}")
+        return json.loads(line)
+
+    async def start(self) -> None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (_SOURCE_DIR, env.get("PYTHONPATH")) if path
+        )
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "jm_runner.worker",
+            json.dumps(self.preload_modules),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+        )
+        try:
+            await self._read_message(_STARTUP_TIMEOUT)
+        except BaseException:
+            self.close()
+            raise
+
+    async def run(self, job: dict, timeout: float) -> dict:
+        """
+        Sends a job and returns the worker's result, tracking its progress.
+
+        Raises:
+            WorkerTimeout: If the job did not finish within `timeout` seconds.
+            WorkerError: If the worker exited during the job.
+        """
+        self.jobs += 1
+        self.progress = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            self._process.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+            await self._process.stdin.drain()
+            while True:
+                message = await self._read_message(max(0.0, deadline - loop.time()))
+                if "progress" in message:
+                    self.progress = message["progress"]
+                    continue
+                self.rss_bytes = message.get("rss_bytes", 0)
+                return message["result"]
+        except (OSError, ValueError) as e:
+            self.close()
+            raise WorkerError(f"Worker failed: {e}") from e
+        except BaseException:
+            # Timed out, or cancelled, in the middle of a job: the worker state is unknown
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.alive:
+            self._process.kill()
+        self._closed = True
+
+    async def aclose(self) -> None:
+        """Kills the worker and waits until it is reaped, so no transport outlives the loop."""
+        self.close()
+        if self._process is not None:
+            await self._process.wait()
+
+
+class JmWorkerPool:
+    """
+    A pool of worker processes with jijmodeling and numpy already imported.
+    Jobs run in parallel on up to `size` workers; a worker is replaced after
+    `max_jobs` jobs or when its resident memory exceeds `max_rss_mb`.
+
+    A job with a session ID runs on the worker of that session instead, which keeps the
+    namespace between jobs and re-executes only what changed. Up to `max_sessions`
+    sessions are kept; a session is dropped with its worker when a limit stops a job
+    or the worker's memory exceeds `max_rss_mb`.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_JM_WORKERS,
+        max_jobs: int = DEFAULT_JM_WORKER_MAX_JOBS,
+        max_rss_mb: int = DEFAULT_JM_WORKER_MAX_RSS_MB,
+        preload_modules: typ.Optional[list[str]] = None,
+        max_sessions: int = DEFAULT_JM_MAX_SESSIONS,
+    ):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.preload_modules = (
+            DEFAULT_JM_PRELOAD_MODULES if preload_modules is None else preload_modules
+        )
+        self.max_sessions = max_sessions
+        self._idle: list[JmWorker] = []
+        self._slots: typ.Optional[asyncio.Semaphore] = None
+        # Session ID -> (worker, lock serializing the jobs of the session), least recently used first
+        self._sessions: collections.OrderedDict[str, tuple[JmWorker, asyncio.Lock]] = (
+            collections.OrderedDict()
+        )
+
+    async def _take_worker(self) -> JmWorker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+        worker = JmWorker(self.preload_modules)
+        await worker.start()
+        return worker
+
+    @staticmethod
+    def _interrupted_result(
+        code: str, error_type: str, message: str, progress: typ.Optional[dict]
+    ) -> dict:
+        """A result for a job stopped by a limit, pointing at the statement that was running."""
+        line_number = progress["line"] if progress else None
+        error = line_context(code, line_number) if line_number else {
+            "line_number": None,
+            "error_line": None,
+            "context": None,
+        }
+        error["error_type"] = error_type
+        error["message"] = message
+        return {
+            "status": "error",
+            "error": error,
+            "progress": {
+                "statements_completed": progress["statement"] if progress else 0,
+                "statements_total": progress["statements"] if progress else None,
+                "line_number": line_number,
+            },
+        }
+
+    def _return_worker(self, worker: JmWorker) -> None:
+        if (
+            worker.alive
+            and worker.jobs < self.max_jobs
+            and worker.rss_bytes <= self.max_rss_mb * 1024 * 1024
+        ):
+            self._idle.append(worker)
+        else:
+            worker.close()
+
+    def _session(self, session_id: str) -> tuple[JmWorker, asyncio.Lock]:
+        if session_id in self._sessions:
+            self._sessions.move_to_end(session_id)
+            return self._sessions[session_id]
+        while len(self._sessions) >= max(1, self.max_sessions):
+            # Close the least recently used session that is not running a job
+            evicted = next(
+                (sid for sid, (_worker, lock) in self._sessions.items() if not lock.locked()),
+                None,
+            )
+            if evicted is None:
+                break
+            self._drop_session(evicted, self._sessions[evicted])
+        session = (JmWorker(self.preload_modules), asyncio.Lock())
+        self._sessions[session_id] = session
+        return session
+
+    def _drop_session(self, session_id: str, session: tuple[JmWorker, asyncio.Lock]) -> None:
+        session[0].close()
+        if self._sessions.get(session_id) is session:
+            del self._sessions[session_id]
+
+    async def _run_on_worker(
+        self, worker: JmWorker, code: str, job: dict, timeout: float
+    ) -> dict:
+        """Runs a job on a worker, turning a stopped job into an interrupted result."""
+        memory = job["memory_mb"]
+        try:
+            result = await worker.run(job, timeout)
+            if result.get("exception_type") == "MemoryError":
+                # The worker survived, but its heap may be fragmented; replace it
+                worker.close()
+                result = self._interrupted_result(
+                    code,
+                    "MemoryLimit",
+                    f"The code needed more than {memory} MiB of memory.",
+                    worker.progress,
+                )
+        except WorkerTimeout:
+            result = self._interrupted_result(
+                code,
+                "Timeout",
+                f"Execution did not finish within {timeout:g} seconds.",
+                worker.progress,
+            )
+        except WorkerError as e:
+            if worker.returncode in (-signal.SIGKILL, -signal.SIGABRT):
+                # Killed by the OOM killer, or aborted by a failed native allocation
+                result = self._interrupted_result(
+                    code,
+                    "MemoryLimit",
+                    f"The worker was killed, most likely out of memory ({e}).",
+                    worker.progress,
+                )
+            else:
+                result = self._interrupted_result(
+                    code, "WorkerExited", str(e), worker.progress
+                )
+        return result
+
+    @staticmethod
+    def _limits(
+        timeout_seconds: typ.Optional[float], memory_mb: typ.Optional[int]
+    ) -> tuple[float, int]:
+        """
+        Clamps the per-call limits to the server-wide maximums; unset limits use them.
+
+        Raises:
+            ValueError: If a limit is not positive.
+        """
+        for name, value in (("timeout_seconds", timeout_seconds), ("memory_mb", memory_mb)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive, got {value}.")
+        return (
+            MAX_JM_TIMEOUT if timeout_seconds is None else min(timeout_seconds, MAX_JM_TIMEOUT),
+            MAX_JM_MEMORY_MB if memory_mb is None else min(memory_mb, MAX_JM_MEMORY_MB),
+        )
+
+    def _job_slots(self) -> asyncio.Semaphore:
+        # Created on first use, inside the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        return self._slots
+
+    async def _run_pooled(self, code: str, job: dict, timeout: float) -> dict:
+        async with self._job_slots():
+            worker = await self._take_worker()
+            try:
+                return await self._run_on_worker(worker, code, job, timeout)
+            finally:
+                self._return_worker(worker)
+
+    async def run(
+        self,
+        code: str,
+        timeout_seconds: typ.Optional[float] = None,
+        memory_mb: typ.Optional[int] = None,
+        session_id: typ.Optional[str] = None,
+    ) -> dict:
+        """
+        Executes `code` in a worker, in a fresh namespace, within a wall-clock time limit
+        and a limit on the memory the code may allocate. Both are clamped to the
+        server-wide maximums. A worker that times out is killed; cancelling the call
+        kills it as well.
+
+        With `session_id`, the code runs on the worker of the session, which restores the
+        namespace after the statements that did not change since the session's last run
+        and executes only the rest. Jobs of one session run one at a time.
+
+        Returns:
+            dict: The result of `PythonREPL.run` for the code. When a limit stops the code,
+            `error.error_type` is "Timeout" or "MemoryLimit" and `progress` tells how many
+            top-level statements completed and which line was running. In a session,
+            `incremental` tells how many statements were reused and executed.
+
+        Raises:
+            ValueError: If `timeout_seconds` or `memory_mb` is not positive.
+            WorkerError: If no worker could be started.
+        """
+        timeout, memory = self._limits(timeout_seconds, memory_mb)
+        job = {"code": code, "memory_mb": memory}
+
+        if session_id is None:
+            return await self._run_pooled(code, job, timeout)
+
+        while True:
+            session = self._session(session_id)
+            worker, lock = session
+            async with lock:
+                if self._sessions.get(session_id) is not session:
+                    continue  # The session was dropped while this job waited
+                async with self._job_slots():
+                    if not worker.alive:
+                        try:
+                            await worker.start()
+                        except BaseException:
+                            self._drop_session(session_id, session)
+                            raise
+                    job["session"] = True
+                    try:
+                        return await self._run_on_worker(worker, code, job, timeout)
+                    finally:
+                        if not worker.alive or worker.rss_bytes > self.max_rss_mb * 1024 * 1024:
+                            # The session starts over on its next job
+                            self._drop_session(session_id, session)
+
+    async def profile(
+        self,
+        code: str,
+        instance_data: dict[str, typ.Any],
+        timeout_seconds: typ.Optional[float] = None,
+        memory_mb: typ.Optional[int] = None,
+    ) -> dict:
+        """
+        Executes `code` in a worker like `run`, then evaluates every `jm.Problem` it defines
+        with `instance_data` and measures the resulting instances. The interpretation
+        counts towards the same limits as the execution.
+
+        Returns:
+            dict: The result of `jm_runner.profile.profile_code`, or an interrupted result
+            as returned by `run`.
+
+        Raises:
+            ValueError: If `timeout_seconds` or `memory_mb` is not positive.
+            WorkerError: If no worker could be started.
+        """
+        timeout, memory = self._limits(timeout_seconds, memory_mb)
+        job = {"code": code, "memory_mb": memory, "profile": instance_data}
+        return await self._run_pooled(code, job, timeout)
+
+    def close_all(self) -> None:
+        for worker in self._idle:
+            worker.close()
+        self._idle.clear()
+        for worker, _lock in self._sessions.values():
+            worker.close()
+        self._sessions.clear()
+
+    async def aclose_all(self) -> None:
+        """Closes the idle and session workers and waits for them to exit; used at server shutdown."""
+        workers = self._idle + [worker for worker, _lock in self._sessions.values()]
+        self._idle.clear()
+        self._sessions.clear()
+        await asyncio.gather(*(worker.aclose() for worker in workers))
+
+
+jm_worker_pool = JmWorkerPool()
@@ -0,0 +1,140 @@
+"""
+Profiling of JijModeling problems against instance data, inside a worker process.
+
+The code is executed, every `jm.Problem` it leaves in its namespace is evaluated with
+`jm.Interpreter`, and the resulting instances are measured: decision variables,
+constraints, nonzero terms per constraint, time per phase and peak memory.
+"""
+
+import time
+import typing as typ
+
+from python_repr import PythonREPL
+
+
+def _reset_peak_rss() -> bool:
+    """Resets the peak resident set size of this process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _status_bytes(field: str) -> typ.Optional[int]:
+    """Reads a memory field such as "VmHWM" (peak resident memory) of this process (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _no_position_error(error_type: str) -> dict:
+    return {"line_number": None, "error_line": None, "context": None, "error_type": error_type}
+
+
+def _term_count(function: typ.Any) -> int:
+    """Counts the terms of an OMMX function with a nonzero coefficient; `terms` always holds the constant."""
+    return sum(1 for coefficient in function.terms.values() if coefficient != 0)
+
+
+def _instance_size(instance: typ.Any) -> dict:
+    """Counts the decision variables, constraints and terms of an OMMX instance."""
+    groups: dict[str, dict] = {}
+    constraint_terms = 0
+    constraints = instance.get_constraints()
+    for constraint in constraints:
+        terms = _term_count(constraint.function)
+        constraint_terms += terms
+        group = groups.setdefault(
+            constraint.name, {"name": constraint.name, "instances": 0, "terms": 0, "max_terms": 0}
+        )
+        group["instances"] += 1
+        group["terms"] += terms
+        group["max_terms"] = max(group["max_terms"], terms)
+    objective_terms = _term_count(instance.objective)
+    return {
+        "decision_variables": len(instance.get_decision_variables()),
+        "constraints": len(constraints),
+        "objective_terms": objective_terms,
+        "constraint_terms": constraint_terms,
+        "nonzero_terms": objective_terms + constraint_terms,
+        # Largest first, as these are where a formulation blows up
+        "constraint_groups": sorted(groups.values(), key=lambda g: g["terms"], reverse=True),
+    }
+
+
+def profile_code(
+    code: str,
+    instance_data: dict[str, typ.Any],
+    on_statement: typ.Optional[typ.Callable[[int, int, int], None]] = None,
+) -> dict[str, typ.Any]:
+    """
+    Executes `code` and profiles every `jm.Problem` in its namespace against `instance_data`.
+
+    Returns:
+        dict: On success, `problems` holds the size and timings of each problem (or the
+        interpreter's error for it), `timings` the seconds per phase and `memory` the
+        resident memory of the worker before the run and its peak during it.
+        If the code fails, the result of `PythonREPL.run`.
+    """
+    import jijmodeling as jm
+
+    peak_reset = _reset_peak_rss()
+    baseline_rss = _status_bytes("VmRSS")
+    started = time.perf_counter()
+    namespace: dict[str, typ.Any] = {"__name__": "__main__"}
+    result = PythonREPL.run(code, namespace, on_statement)
+    execute_seconds = time.perf_counter() - started
+    if result["status"] != "success":
+        return result
+
+    problems = []
+    for name, value in namespace.items():
+        if not isinstance(value, jm.Problem):
+            continue
+        profile: dict[str, typ.Any] = {"variable": name, "name": value.name}
+        phase_started = time.perf_counter()
+        try:
+            instance = jm.Interpreter(instance_data).eval_problem(value)
+        except MemoryError:
+            # Reported like a MemoryError of the code, so that the pool replaces the worker
+            return {
+                "status": "error",
+                "error": _no_position_error("MemoryError"),
+                "exception_type": "MemoryError",
+            }
+        except Exception as e:
+            profile["error"] = f"{type(e).__name__}: {e}"
+            problems.append(profile)
+            continue
+        interpret_seconds = time.perf_counter() - phase_started
+        phase_started = time.perf_counter()
+        profile.update(_instance_size(instance))
+        profile["timings"] = {
+            "interpret": interpret_seconds,
+            "count": time.perf_counter() - phase_started,
+        }
+        problems.append(profile)
+
+    if not problems:
+        return {
+            "status": "error",
+            "error": _no_position_error("No jm.Problem object was found after executing the code."),
+        }
+    return {
+        "status": "success",
+        "problems": problems,
+        "timings": {"execute": execute_seconds, "total": time.perf_counter() - started},
+        "memory": {
+            "baseline_rss_bytes": baseline_rss,
+            "peak_rss_bytes": _status_bytes("VmHWM"),
+            # Otherwise the peak may be one of an earlier job of the worker
+            "peak_is_of_this_run": peak_reset,
+        },
+    }
@@ -0,0 +1,186 @@
+"""
+Incremental execution for jm_check sessions, inside a worker process.
+
+The code is split into top-level statements. Each statement is fingerprinted together
+with every statement before it, so a fingerprint only matches when the statement and
+everything it may depend on are unchanged. After each statement the namespace is
+snapshotted; the next run of the session restores the snapshot after the longest
+unchanged prefix and executes only the statements from there on.
+
+A snapshot shares immutable values (numbers, strings, modules, functions and the
+JijModeling expressions) and deep-copies the others. If a value cannot be copied, e.g. a
+`jm.Problem`, which `+=` modifies in place, the snapshot is not kept and a later run
+resumes from an earlier one.
+"""
+
+import __future__
+import ast
+import copy
+import hashlib
+import traceback
+import types
+import typing as typ
+
+from python_repr import extract_error_position_codes
+
+
+_SHARED_TYPES = (
+    type(None),
+    bool,
+    int,
+    float,
+    complex,
+    str,
+    bytes,
+    range,
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+)
+# JijModeling objects that are modified in place
+_MUTABLE_JM_TYPES = ("Problem",)
+
+
+class _Uncopyable(Exception):
+    pass
+
+
+def _shareable(value: typ.Any) -> bool:
+    if isinstance(value, _SHARED_TYPES):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(_shareable(item) for item in value)
+    value_type = type(value)
+    return (
+        value_type.__module__.split(".")[0] == "jijmodeling"
+        and value_type.__name__ not in _MUTABLE_JM_TYPES
+    )
+
+
+def _snapshot(namespace: dict) -> dict:
+    """
+    Returns a copy of the namespace that later statements cannot modify.
+
+    Raises:
+        _Uncopyable: If a value can be neither shared nor copied.
+    """
+    snapshot = {}
+    for name, value in namespace.items():
+        if name == "__builtins__":
+            continue
+        if _shareable(value):
+            snapshot[name] = value
+            continue
+        try:
+            snapshot[name] = copy.deepcopy(value)
+        except Exception as e:
+            raise _Uncopyable(name) from e
+    return snapshot
+
+
+def statement_fingerprints(statements: list[ast.stmt]) -> list[str]:
+    """
+    Returns a fingerprint per statement that covers the statement and all the ones
+    before it. Positions are not part of it, so moving code does not change it.
+    """
+    fingerprints = []
+    digest = hashlib.sha256()
+    for statement in statements:
+        digest.update(ast.dump(statement, include_attributes=False).encode("utf-8"))
+        fingerprints.append(digest.copy().hexdigest())
+    return fingerprints
+
+
+class IncrementalSession:
+    """The namespace snapshots of one session, kept between runs."""
+
+    def __init__(self):
+        self.namespace: dict[str, typ.Any] = {"__name__": "__main__"}
+        # Fingerprint of each statement of the last run, and the snapshot taken after it
+        # (None if there is none)
+        self.fingerprints: list[str] = []
+        self.snapshots: list[typ.Optional[dict]] = []
+
+    def _resume_point(self, fingerprints: list[str]) -> int:
+        """Number of leading statements whose results can be restored from a snapshot."""
+        unchanged = 0
+        for old, new in zip(self.fingerprints, fingerprints):
+            if old != new:
+                break
+            unchanged += 1
+        while unchanged > 0 and self.snapshots[unchanged - 1] is None:
+            unchanged -= 1
+        return unchanged
+
+    def run(
+        self,
+        code: str,
+        on_statement: typ.Optional[typ.Callable[[int, int, int], None]] = None,
+    ) -> dict[str, typ.Any]:
+        """
+        Executes the statements of `code` that changed since the last run, in the same
+        way as `PythonREPL.run` with `on_statement`.
+
+        Returns:
+            dict: The result of `PythonREPL.run`, with an `incremental` dict telling how many
+            statements were reused and executed.
+        """
+        try:
+            statements = ast.parse(code, "<string>").body
+        except SyntaxError as e:
+            return {
+                "status": "error",
+                "error": extract_error_position_codes(code, traceback.format_exc()),
+                "exception_type": type(e).__name__,
+            }
+        fingerprints = statement_fingerprints(statements)
+        reused = self._resume_point(fingerprints)
+
+        self.namespace.clear()
+        if reused:
+            # Copied again, so that the snapshot itself stays unmodified
+            self.namespace.update(_snapshot(self.snapshots[reused - 1]))
+        else:
+            self.namespace["__name__"] = "__main__"
+        self.fingerprints = fingerprints[:reused]
+        self.snapshots = self.snapshots[:reused]
+
+        incremental = {
+            "statements_total": len(statements),
+            "statements_reused": reused,
+            "statements_executed": 0,
+            "resumed_at_line": statements[reused].lineno if reused < len(statements) else None,
+        }
+        flags = 0
+        for index, statement in enumerate(statements):
+            if isinstance(statement, ast.ImportFrom) and statement.module == "__future__":
+                for alias in statement.names:
+                    feature = getattr(__future__, alias.name, None)
+                    if feature is not None:
+                        flags |= feature.compiler_flag
+            if index < reused:
+                continue
+            if on_statement is not None:
+                on_statement(index, statement.lineno, len(statements))
+            module = ast.Module(body=[statement], type_ignores=[])
+            try:
+                exec(
+                    compile(module, "<string>", "exec", flags=flags, dont_inherit=True),
+                    self.namespace,
+                )
+            except Exception as e:
+                return {
+                    "status": "error",
+                    "error": extract_error_position_codes(code, traceback.format_exc()),
+                    "exception_type": type(e).__name__,
+                    "incremental": incremental,
+                }
+            incremental["statements_executed"] += 1
+            try:
+                snapshot = _snapshot(self.namespace)
+            except _Uncopyable:
+                snapshot = None
+            self.fingerprints.append(fingerprints[index])
+            self.snapshots.append(snapshot)
+        return {"status": "success", "incremental": incremental}
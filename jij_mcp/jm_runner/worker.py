@@ -0,0 +1,126 @@
+"""
+A worker process that executes JijModeling code for jm_check.
+
+It imports the heavy modules once and then executes one job per request, each in a
+fresh namespace, so the MCP server process never runs agent code itself. A worker that
+serves a session instead keeps the namespace snapshots between jobs and re-executes only
+the statements that changed (see `jm_runner.session`).
+Start it from the jij_mcp directory (or with it on PYTHONPATH):
+
+    python -m jm_runner.worker PRELOAD_MODULES_JSON
+
+Protocol (one JSON object per line):
+    -> {"ready": true, "preloaded": [...]}             once, after the imports
+    <- {"code": str, "memory_mb": int | null, "session": bool}  a job, or
+    <- {"code": str, "memory_mb": int | null, "profile": {instance data}}  a profiling job
+    -> {"progress": {"statement", "statements", "line"}}  before each top-level statement
+    -> {"result": {...}, "rss_bytes": int}              the PythonREPL result of the job, or the
+                                                        profile (see `jm_runner.profile`)
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import typing as typ
+
+from jm_runner.profile import profile_code
+from jm_runner.session import IncrementalSession
+from python_repr import PythonREPL
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_MB = 1024 * 1024
+
+
+def address_space_bytes() -> typ.Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextlib.contextmanager
+def memory_limit(memory_mb: typ.Optional[int]) -> typ.Iterator[None]:
+    """
+    Lets the job allocate at most `memory_mb` MiB of address space on top of what the
+    worker already uses. Only the soft limit is lowered, so it is restored afterwards.
+    """
+    limit = getattr(resource, "RLIMIT_AS", None)
+    baseline = address_space_bytes()
+    if not memory_mb or limit is None or baseline is None:
+        yield
+        return
+    soft, hard = resource.getrlimit(limit)
+    cap = baseline + memory_mb * _MB
+    if hard != resource.RLIM_INFINITY:
+        cap = min(cap, hard)
+    resource.setrlimit(limit, (cap, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(limit, (soft, hard))
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process, or the peak where it is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_job(
+    job: dict, protocol: typ.TextIO, session: typ.Optional[IncrementalSession] = None
+) -> dict:
+    def report_progress(index: int, line_number: int, statement_count: int) -> None:
+        message = {"statement": index, "statements": statement_count, "line": line_number}
+        protocol.write(json.dumps({"progress": message}) + "\n")
+
+    # Output of the checked code is not part of the result
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        with memory_limit(job.get("memory_mb")):
+            if "profile" in job:
+                result = profile_code(job["code"], job["profile"], on_statement=report_progress)
+            elif job.get("session") and session is not None:
+                result = session.run(job["code"], on_statement=report_progress)
+            else:
+                result = PythonREPL.run(job["code"], on_statement=report_progress)
+    return result
+
+
+def main() -> None:
+    # Keep the protocol channel private: anything printed goes to stderr instead
+    protocol = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+
+    preloaded = []
+    for module in json.loads(sys.argv[1]):
+        try:
+            importlib.import_module(module)
+            preloaded.append(module)
+        except Exception:
+            pass
+    protocol.write(json.dumps({"ready": True, "preloaded": preloaded}) + "\n")
+
+    session = IncrementalSession()
+    for line in sys.stdin:
+        result = run_job(json.loads(line), protocol, session)
+        protocol.write(json.dumps({"result": result, "rss_bytes": rss_bytes()}, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+"""
+Static size estimates of JijModeling models, derived from the code without data.
+
+The code is read, not executed. Placeholders, `len_at` dimensions and the `belong_to`
+ranges of Elements give the size of every index; the `jm.sum` and `forall` structure of
+the objective and of each constraint family then gives polynomial formulas for the
+number of constraint instances and of terms, e.g. `n_l * n_t * n_p^2`.
+
+Sizes are upper bounds: conditions on indices (`(q, p != q)`) are ignored, every product
+is assumed fully expanded and every atom counts as one term.
+
+A dimension is named after the Placeholder (its name string) or, for arrays, after the
+Placeholder and axis: `d.len_at(0)`. Given sizes for them, the formulas are evaluated.
+"""
+
+import ast
+import fractions
+import re
+import typing as typ
+
+from jm_rules import DECISION_VARIABLE_TYPES, RuleContext
+
+
+# A polynomial in the dimensions: monomial -> coefficient, where a monomial is a sorted
+# tuple of (dimension, power) pairs
+Polynomial = dict[tuple[tuple[str, int], ...], int]
+
+# Families whose terms add up to at least this share of all terms are hot spots (exact,
+# as term counts may be too large for a float)
+_HOT_SPOT_SHARE = fractions.Fraction(4, 5)
+# Largest evaluated size that is reported; larger ones are an overflow (the largest float)
+_MAX_EVALUATED = 2**1024
+
+
+def _constant(value: int) -> Polynomial:
+    return {(): value} if value else {}
+
+
+def _dimension(label: str) -> Polynomial:
+    return {((label, 1),): 1}
+
+
+def _add(p: Polynomial, q: Polynomial, sign: int = 1) -> Polynomial:
+    result = dict(p)
+    for monomial, coefficient in q.items():
+        result[monomial] = result.get(monomial, 0) + sign * coefficient
+    return {m: c for m, c in result.items() if c}
+
+
+def _mul(p: Polynomial, q: Polynomial) -> Polynomial:
+    result: Polynomial = {}
+    for m1, c1 in p.items():
+        for m2, c2 in q.items():
+            powers = dict(m1)
+            for label, power in m2:
+                powers[label] = powers.get(label, 0) + power
+            monomial = tuple(sorted(powers.items()))
+            result[monomial] = result.get(monomial, 0) + c1 * c2
+    return {m: c for m, c in result.items() if c}
+
+
+def _degree(monomial: tuple[tuple[str, int], ...]) -> int:
+    return sum(power for _label, power in monomial)
+
+
+def _format_monomial(monomial: tuple[tuple[str, int], ...]) -> str:
+    factors = []
+    for label, power in monomial:
+        if not re.fullmatch(r"[\w.]+(\(\d+\))?", label):
+            label = f"({label})"
+        factors.append(label if power == 1 else f"{label}^{power}")
+    return " * ".join(factors)
+
+
+def format_polynomial(p: Polynomial) -> str:
+    """Formats a polynomial with the highest degree first, e.g. `n^2 * m + n - 1`."""
+    if not p:
+        return "0"
+    text = ""
+    for monomial, coefficient in sorted(p.items(), key=lambda item: (-_degree(item[0]), item[0])):
+        factors = _format_monomial(monomial)
+        magnitude = abs(coefficient)
+        term = factors if magnitude == 1 and factors else (
+            f"{magnitude} * {factors}" if factors else str(magnitude)
+        )
+        if not text:
+            text = term if coefficient > 0 else f"-{term}"
+        else:
+            text += f" + {term}" if coefficient > 0 else f" - {term}"
+    return text
+
+
+def big_o(p: Polynomial) -> str:
+    """The highest-degree monomials of a polynomial without coefficients, e.g. `O(n^2 * m)`."""
+    if not p:
+        return "O(1)"
+    degree = max(_degree(monomial) for monomial in p)
+    leading = sorted(m for m, c in p.items() if _degree(m) == degree and c > 0)
+    if not leading or degree == 0:
+        return "O(1)"
+    return "O(" + " + ".join(_format_monomial(m) for m in leading) + ")"
+
+
+def _evaluate_dimension(label: str, sizes: dict[str, typ.Any]) -> typ.Optional[float]:
+    if label in sizes:
+        # A shape given for a scalar dimension does not evaluate it
+        return None if isinstance(sizes[label], (list, tuple)) else sizes[label]
+    # An array given by its shape, e.g. {"d": [10, 20]} for d.len_at(1)
+    name, _, axis = label.partition(".len_at(")
+    if axis and isinstance(sizes.get(name), (list, tuple)):
+        try:
+            return sizes[name][int(axis.rstrip(")"))]
+        except (ValueError, IndexError):
+            return None
+    return None
+
+
+def _size_error(value: typ.Any) -> typ.Optional[str]:
+    """Returns why a value is not a valid size: a non-negative int, or a shape (a list of them)."""
+    if isinstance(value, (list, tuple)):
+        for axis in value:
+            # None is the length of a jagged axis
+            if axis is not None and _size_error(axis) is not None:
+                return f"{axis!r} in the shape is not a non-negative integer"
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        return f"{value!r} is not a non-negative integer"
+    return None
+
+
+def evaluate_polynomial(
+    p: Polynomial, sizes: dict[str, typ.Any]
+) -> tuple[typ.Optional[float], set[str]]:
+    """Returns the value of a polynomial, or None and the dimensions missing from `sizes`."""
+    total = 0
+    missing = set()
+    for monomial, coefficient in p.items():
+        value = coefficient
+        for label, power in monomial:
+            size = _evaluate_dimension(label, sizes)
+            if size is None:
+                missing.add(label)
+                continue
+            value *= size**power
+        total += value
+    return (None, missing) if missing else (total, missing)
+
+
+class _Model:
+    """What the estimator knows about the names bound by the code."""
+
+    def __init__(self, tree: ast.Module):
+        self.context = RuleContext.from_imports(tree)
+        # Name -> (kind, value): ("placeholder", (label, ndim, shape node)),
+        # ("element", size), ("dimension", polynomial), ("expression", node),
+        # ("constraint", call), ("problem", None)
+        self.names: dict[str, tuple[str, typ.Any]] = {}
+
+    def jm_call(self, node: typ.Any) -> typ.Optional[str]:
+        return self.context.jm_function(node) if isinstance(node, ast.Call) else None
+
+    def bind(self, name: str, value: ast.expr) -> None:
+        function = self.jm_call(value)
+        if function == "Placeholder":
+            label = _string_argument(value) or name
+            ndim = _keyword(value, "ndim")
+            shape = _keyword(value, "shape")
+            dimensions = (
+                ndim.value
+                if isinstance(ndim, ast.Constant) and isinstance(ndim.value, int)
+                else len(shape.elts)
+                if isinstance(shape, (ast.Tuple, ast.List))
+                else 0
+            )
+            self.names[name] = ("placeholder", (label, dimensions, shape))
+        elif function == "Element":
+            belong_to = value.args[1] if len(value.args) > 1 else _keyword(value, "belong_to")
+            self.names[name] = ("element", self.set_size(belong_to))
+        elif function == "Problem":
+            self.names[name] = ("problem", None)
+        elif function == "Constraint":
+            self.names[name] = ("constraint", value)
+        elif function is None and _is_length(value):
+            self.names[name] = ("dimension", self.dimension(value))
+        elif function in ("sum", "prod") or isinstance(value, (ast.BinOp, ast.Compare)):
+            self.names[name] = ("expression", value)
+        else:
+            self.names.pop(name, None)
+
+    def array_length(self, node: ast.expr, axis: int) -> Polynomial:
+        """The length of an array Placeholder along an axis."""
+        if isinstance(node, ast.Name) and self.names.get(node.id, ("",))[0] == "placeholder":
+            label, _ndim, shape = self.names[node.id][1]
+            if isinstance(shape, (ast.Tuple, ast.List)) and axis < len(shape.elts):
+                return self.dimension(shape.elts[axis])
+            return _dimension(f"{label}.len_at({axis})")
+        return _dimension(f"{ast.unparse(node)}.len_at({axis})")
+
+    def dimension(self, node: typ.Optional[ast.expr]) -> Polynomial:
+        """A number given by dimensions, such as `n`, `d.len_at(0)` or `n - 1`."""
+        if node is None:
+            return _constant(1)
+        if isinstance(node, ast.Constant) and isinstance(node.value, int):
+            return _constant(node.value)
+        if isinstance(node, ast.Name):
+            kind, value = self.names.get(node.id, ("", None))
+            if kind == "placeholder":
+                label, ndim, _shape = value
+                return _dimension(label) if ndim == 0 else self.array_length(node, 0)
+            if kind == "dimension":
+                return value
+            if kind == "element":
+                return value
+            return _dimension(node.id)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+            left, right = self.dimension(node.left), self.dimension(node.right)
+            if isinstance(node.op, ast.Mult):
+                return _mul(left, right)
+            return _add(left, right, 1 if isinstance(node.op, ast.Add) else -1)
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "len_at"
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+        ):
+            return self.array_length(node.func.value, node.args[0].value)
+        if (
+            isinstance(node, ast.Subscript)
+            and isinstance(node.value, ast.Attribute)
+            and node.value.attr == "shape"
+            and isinstance(node.slice, ast.Constant)
+        ):
+            return self.array_length(node.value.value, node.slice.value)
+        return _dimension(ast.unparse(node))
+
+    def set_size(self, node: typ.Optional[ast.expr]) -> Polynomial:
+        """The number of values an Element takes from its `belong_to`."""
+        if isinstance(node, ast.Tuple) and len(node.elts) == 2:
+            return _add(self.dimension(node.elts[1]), self.dimension(node.elts[0]), -1)
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            # A row of a (jagged) array, e.g. E[i]
+            indices = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+            return self.array_length(node.value, len(indices))
+        return self.dimension(node)
+
+    def index_size(self, node: ast.expr) -> Polynomial:
+        """The number of combinations of a `jm.sum` index or a `forall`."""
+        if isinstance(node, ast.List):
+            size = _constant(1)
+            for item in node.elts:
+                size = _mul(size, self.index_size(item))
+            return size
+        if isinstance(node, ast.Tuple) and node.elts:
+            # (i, condition): the condition only removes combinations
+            if len(node.elts) == 2 and not self._is_element(node.elts[1]):
+                return self.index_size(node.elts[0])
+            return self.index_size(ast.List(elts=node.elts))
+        if isinstance(node, ast.Name) and self._is_element(node):
+            return self.names[node.id][1]
+        if self.jm_call(node) == "Element":
+            belong_to = node.args[1] if len(node.args) > 1 else _keyword(node, "belong_to")
+            return self.set_size(belong_to)
+        return _dimension(f"|{ast.unparse(node)}|")
+
+    def _is_element(self, node: ast.expr) -> bool:
+        return isinstance(node, ast.Name) and self.names.get(node.id, ("",))[0] == "element"
+
+    def terms(self, node: ast.expr, depth: int = 0) -> Polynomial:
+        """The number of terms of an expression once every sum and product is expanded."""
+        if depth > 50:
+            return _constant(1)
+        function = self.jm_call(node)
+        if function in ("sum", "prod") and len(node.args) >= 2:
+            body = self.terms(node.args[1], depth + 1)
+            if function == "prod":
+                return body
+            return _mul(self.index_size(node.args[0]), body)
+        if isinstance(node, ast.BinOp):
+            left, right = self.terms(node.left, depth + 1), self.terms(node.right, depth + 1)
+            if isinstance(node.op, (ast.Add, ast.Sub)):
+                return _add(left, right)
+            if isinstance(node.op, ast.Mult):
+                return _mul(left, right)
+            if isinstance(node.op, ast.Pow) and isinstance(node.right, ast.Constant):
+                result = _constant(1)
+                for _ in range(max(0, min(int(node.right.value), 8))):
+                    result = _mul(result, left)
+                return result
+            return left
+        if isinstance(node, ast.UnaryOp):
+            return self.terms(node.operand, depth + 1)
+        if isinstance(node, ast.Compare):
+            result = self.terms(node.left, depth + 1)
+            for comparator in node.comparators:
+                result = _add(result, self.terms(comparator, depth + 1))
+            return result
+        if isinstance(node, ast.Name) and self.names.get(node.id, ("",))[0] == "expression":
+            return self.terms(self.names[node.id][1], depth + 1)
+        return _constant(1)
+
+    def decision_variables(self, call: ast.Call) -> Polynomial:
+        shape = _keyword(call, "shape")
+        if shape is None:
+            return _constant(1)
+        if isinstance(shape, (ast.Tuple, ast.List)):
+            size = _constant(1)
+            for dimension in shape.elts:
+                size = _mul(size, self.dimension(dimension))
+            return size
+        return self.dimension(shape)
+
+
+def _keyword(call: ast.Call, name: str) -> typ.Optional[ast.expr]:
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _string_argument(call: ast.Call) -> typ.Optional[str]:
+    name = call.args[0] if call.args else _keyword(call, "name")
+    return name.value if isinstance(name, ast.Constant) and isinstance(name.value, str) else None
+
+
+def _is_length(node: ast.expr) -> bool:
+    """Whether an expression is a dimension, like `d.len_at(0)` or `d.shape[0]`."""
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "len_at"
+    ) or (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Attribute)
+        and node.value.attr == "shape"
+    )
+
+
+def _statements(tree: ast.Module) -> typ.Iterator[ast.stmt]:
+    """Statements in source order, including those in nested blocks."""
+    stack: list[ast.stmt] = list(reversed(tree.body))
+    while stack:
+        statement = stack.pop()
+        yield statement
+        for field in ("body", "orelse", "finalbody"):
+            stack.extend(reversed(getattr(statement, field, None) or []))
+
+
+def declared_placeholders(code: str) -> list[dict]:
+    """
+    Returns the Placeholders declared by the code, in order: `name`, `variable`, `line`,
+    `ndim`, `shape` (a polynomial in the dimensions per axis, None for an axis of unknown
+    size, or None without a shape), `jagged` and `dtype` ("INTEGER", "FLOAT" or None).
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    tree = ast.parse(code)
+    model = _Model(tree)
+    placeholders = []
+    for statement in _statements(tree):
+        if not (
+            isinstance(statement, ast.Assign)
+            and len(statement.targets) == 1
+            and isinstance(statement.targets[0], ast.Name)
+        ):
+            continue
+        name = statement.targets[0].id
+        call = statement.value
+        if model.jm_call(call) == "Placeholder":
+            label = _string_argument(call) or name
+            shape = _keyword(call, "shape")
+            ndim = _keyword(call, "ndim")
+            axes = None
+            if isinstance(shape, (ast.Tuple, ast.List)):
+                axes = [
+                    None
+                    if isinstance(axis, ast.Constant) and axis.value is None
+                    else model.dimension(axis)
+                    for axis in shape.elts
+                ]
+            jagged = _keyword(call, "jagged")
+            dtype = _keyword(call, "dtype")
+            placeholders.append(
+                {
+                    "name": label,
+                    "variable": name,
+                    "line": statement.lineno,
+                    "ndim": ndim.value
+                    if isinstance(ndim, ast.Constant) and isinstance(ndim.value, int)
+                    else len(axes)
+                    if axes is not None
+                    else 0,
+                    "shape": axes,
+                    "jagged": isinstance(jagged, ast.Constant) and jagged.value is True,
+                    "dtype": dtype.attr
+                    if isinstance(dtype, ast.Attribute)
+                    else dtype.value.upper()
+                    if isinstance(dtype, ast.Constant) and isinstance(dtype.value, str)
+                    else None,
+                }
+            )
+        model.bind(name, call)
+    return placeholders
+
+
+def estimate_model_size(code: str, sizes: typ.Optional[dict[str, typ.Any]] = None) -> dict:
+    """
+    Estimates the size of the decision variables, the objective and every constraint
+    family of the code, without executing it.
+
+    Args:
+        code: JijModeling code.
+        sizes: Optional sizes of the dimensions, e.g. `{"n": 100, "d.len_at(0)": 20}`.
+            An array's shape may be given as a list instead, `{"d": [20, 30]}`, and a
+            dimension bound to a name, `n_p = d.len_at(0)`, by that name.
+
+    Returns:
+        dict: `decision_variables` and `families` (objective and constraints), each with
+        formulas and, with `sizes`, their values; `hot_spots` names the families with the
+        most terms, and `missing_dimensions` those dimensions needed that `sizes` lacks.
+        Sizes that are not non-negative integers are left out and reported under
+        `invalid_sizes`; if the values are too large to compute, `error` says so.
+
+    Raises:
+        SyntaxError: If the code cannot be parsed.
+    """
+    tree = ast.parse(code)
+    model = _Model(tree)
+    variables = []
+    families = []
+
+    def add_family(kind: str, name: str, line: int, instances: Polynomial, terms: Polynomial) -> None:
+        total = _mul(instances, terms)
+        family = {
+            "kind": kind,
+            "name": name,
+            "line": line,
+            "instances": format_polynomial(instances),
+            "terms_per_instance": format_polynomial(terms),
+            "terms": format_polynomial(total),
+            "complexity": big_o(total),
+            "_instances": instances,
+            "_total": total,
+        }
+        families.append(family)
+
+    def add_to_problem(value: ast.expr, line: int) -> None:
+        if isinstance(value, ast.Name) and model.names.get(value.id, ("",))[0] == "constraint":
+            value = model.names[value.id][1]
+        if model.jm_call(value) == "Constraint":
+            name = _string_argument(value) or "<constraint>"
+            expression = value.args[1] if len(value.args) > 1 else _keyword(value, "expression")
+            forall = _keyword(value, "forall")
+            instances = model.index_size(forall) if forall is not None else _constant(1)
+            terms = model.terms(expression) if expression is not None else _constant(0)
+            add_family("constraint", name, line, instances, terms)
+        else:
+            add_family("objective", "<objective>", line, _constant(1), model.terms(value))
+
+    for statement in _statements(tree):
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            target = statement.targets[0]
+            if isinstance(target, ast.Name):
+                if model.jm_call(statement.value) in DECISION_VARIABLE_TYPES:
+                    count = model.decision_variables(statement.value)
+                    variables.append(
+                        {
+                            "name": _string_argument(statement.value) or target.id,
+                            "line": statement.lineno,
+                            "count": format_polynomial(count),
+                            "_count": count,
+                        }
+                    )
+                model.bind(target.id, statement.value)
+        elif (
+            isinstance(statement, ast.AugAssign)
+            and isinstance(statement.op, ast.Add)
+            and isinstance(statement.target, ast.Name)
+            and model.names.get(statement.target.id, ("",))[0] == "problem"
+        ):
+            add_to_problem(statement.value, statement.lineno)
+
+    missing: set[str] = set()
+    invalid_sizes = {}
+    error = None
+    if sizes:
+        invalid_sizes = {
+            name: reason
+            for name, reason in ((name, _size_error(value)) for name, value in sizes.items())
+            if reason is not None
+        }
+        sizes = {name: value for name, value in sizes.items() if name not in invalid_sizes}
+    if sizes:
+        # A dimension may also be given by the name it is bound to, e.g. `n = d.len_at(0)`
+        for name, (kind, value) in model.names.items():
+            if kind == "dimension" and name in sizes and len(value) == 1:
+                ((monomial, coefficient),) = value.items()
+                if coefficient == 1 and len(monomial) == 1 and monomial[0][1] == 1:
+                    sizes.setdefault(monomial[0][0], sizes[name])
+
+        def evaluated(p: Polynomial) -> typ.Optional[float]:
+            value, missing_labels = evaluate_polynomial(p, sizes)
+            missing.update(missing_labels)
+            if value is not None and abs(value) >= _MAX_EVALUATED:
+                raise OverflowError("a value exceeds 2**1024")
+            return value
+
+        try:
+            for variable in variables:
+                variable["evaluated"] = evaluated(variable["_count"])
+            for family in families:
+                family["evaluated"] = {
+                    "instances": evaluated(family["_instances"]),
+                    "terms": evaluated(family["_total"]),
+                }
+        except OverflowError as e:
+            error = f"OverflowError: the sizes are too large to evaluate the formulas ({e})"
+            sizes = None
+            for item in variables + families:
+                item.pop("evaluated", None)
+        for label in sorted(missing):
+            if isinstance(sizes.get(label) if sizes else None, (list, tuple)):
+                invalid_sizes[label] = f"{sizes[label]!r} is a shape, but {label} is a scalar dimension"
+                missing.discard(label)
+
+    # Hot spots: the families with the highest degree, or, with sizes, the largest
+    # families that together hold most of the terms
+    hot_spots = []
+    if families:
+        if sizes and all(f["evaluated"]["terms"] is not None for f in families):
+            ranked = sorted(families, key=lambda f: f["evaluated"]["terms"], reverse=True)
+            total_terms = sum(f["evaluated"]["terms"] for f in ranked)
+            covered = 0
+            for family in ranked:
+                hot_spots.append(family)
+                covered += family["evaluated"]["terms"]
+                if covered >= _HOT_SPOT_SHARE * total_terms:
+                    break
+        else:
+            degrees = {id(f): max((_degree(m) for m in f["_total"]), default=0) for f in families}
+            highest = max(degrees.values())
+            hot_spots = [f for f in families if degrees[id(f)] == highest]
+    for variable in variables:
+        del variable["_count"]
+    for family in families:
+        family["hot_spot"] = any(family is hot for hot in hot_spots)
+        del family["_instances"], family["_total"]
+
+    result = {
+        "decision_variables": variables,
+        "families": families,
+        "hot_spots": [f"{f['name']} (line {f['line']})" for f in hot_spots],
+        "missing_dimensions": sorted(missing),
+    }
+    if invalid_sizes:
+        result["invalid_sizes"] = invalid_sizes
+    if error is not None:
+        result["error"] = error
+    return result
@@ -1,11 +1,38 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 from jm_prompts import jijmodeling_guide_prompt
-from jm_checker import jijmodeling_check
+from jm_checker import jijmodeling_check, jijmodeling_check_batch, jijmodeling_profile
+from jm_size import estimate_model_size
+from jm_data import validate_instance_data
 from fetch import Fetcher, FetchRequestArgs, FetchResponse
 from quantum.qiskit_prompt import qiskit_v1_v2_migration_prompt
-from py_checker.pyright_check import run_code_in_temporary_venv
+from py_checker.sandbox import ExecutionLimits
+from py_checker.fork_pool import fork_server_pool
+from jm_runner.pool import jm_worker_pool
+from py_checker.pyright_check import (
+    QISKIT_REQUIREMENTS,
+    check_code_with_stubs,
+    check_codes_in_venv,
+    run_code_in_temporary_venv,
+)
 
+import asyncio
+import json
+import time
 import typing as typ
+from contextlib import asynccontextmanager
+
+from pydantic import Field
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> typ.AsyncIterator[None]:
+    """Opens the shared HTTP client; at shutdown, closes it and the warm worker processes."""
+    try:
+        async with Fetcher.lifespan(server):
+            yield
+    finally:
+        await fork_server_pool.aclose_all()
+        await jm_worker_pool.aclose_all()
 
 
 mcp = FastMCP(
@@ -45,12 +72,18 @@ mcp = FastMCP(
 - **jijmodeling_guide**: Use when learning about JijModeling syntax and practical usage
 - **learn_jijmodeling**: Use when you need a quick reference or overview of JijModeling
 - **jm_check**: Use when validating your JijModeling code for potential issues
+- **jm_check_batch**: Use when validating several JijModeling code variants at once
+- **jm_estimate_size**: Use to see how the size of your JijModeling model grows with its dimensions, before any data exists
+- **jm_profile**: Use to measure the size of your JijModeling model with instance data before solving it
+- **jm_validate_data**: Use to check instance data files against the Placeholders of your JijModeling model before loading them
 
 ### Qiskit Tools
 - **qiskit_v0tov1v2_migration_guide**: Use when transitioning from older Qiskit versions
 - **qiskit_v1_api_reference_toc**: Use to explore Qiskit v1 API documentation
 - **qiskit_v2_api_reference_toc**: Use to explore the latest Qiskit v2 API documentation
 - **qiskit_tutorial**: Use to access IBM Quantum Learning Hub tutorials
+- **qiskit_code_static_check**: Use to check Qiskit code against Qiskit v1 or v2
+- **qiskit_code_static_check_batch**: Use to check several Qiskit code variants at once
 
 ## JijModeling Workflow
 You will guide users through implementing optimization models in JijModeling following these steps:
@@ -76,6 +109,7 @@ Guide users through quantum computing tasks with these steps:
 """
     ),
     debug=True,
+    lifespan=server_lifespan,
 )
 
 # Mathematical Optimization ----------
@@ -97,17 +131,140 @@ def learn_jijmodeling() -> str:
 
 
 @mcp.tool()
-def jm_check(code: str) -> dict:
+async def jm_check(
+    code: str,
+    timeout_seconds: typ.Annotated[typ.Optional[float], Field(gt=0)] = None,
+    memory_mb: typ.Annotated[typ.Optional[int], Field(gt=0)] = None,
+    session_id: typ.Optional[str] = None,
+) -> dict:
     """
     Check the code for JijModeling rules.
+    The code is executed with a time limit and a memory limit. If a limit stops it, the error type
+    is "Timeout" or "MemoryLimit" and "progress" tells which statement was running.
+    If the code uses Python for loops, "suggested_rewrite" may hold the code rewritten with jm.Element,
+    jm.sum and forall, its diff, and whether the rewritten code executes ("verified").
 
     Args:
         code (str): The code to check.
+        timeout_seconds (typ.Optional[float], optional): Wall-clock time limit in seconds, greater than 0. Defaults to the server's maximum.
+        memory_mb (typ.Optional[int], optional): Memory the code may allocate in MiB, greater than 0. Defaults to the server's maximum.
+        session_id (typ.Optional[str], optional): Pass the same ID when checking successive edits of the same code.
+            Statements before the first changed one are then not executed again, and "incremental" tells how many
+            statements were reused. Defaults to None (the whole code is executed).
 
     Returns:
         dict: The result of the check.
     """
-    return jijmodeling_check(code)
+    return await jijmodeling_check(code, timeout_seconds, memory_mb, session_id)
+
+
+@mcp.tool()
+async def jm_check_batch(
+    codes: list[str],
+    ctx: Context,
+    timeout_seconds: typ.Annotated[typ.Optional[float], Field(gt=0)] = None,
+    memory_mb: typ.Annotated[typ.Optional[int], Field(gt=0)] = None,
+) -> dict:
+    """
+    Check several JijModeling code snippets at once, e.g. alternative formulations of the same model.
+    Works like jm_check for each snippet, but the snippets are checked in parallel in separate workers.
+    Each result is also sent as a log message (and as progress) as soon as its snippet is done.
+
+    Args:
+        codes (list[str]): The code snippets to check.
+        timeout_seconds (typ.Optional[float], optional): Wall-clock time limit in seconds per snippet, greater than 0. Defaults to the server's maximum.
+        memory_mb (typ.Optional[int], optional): Memory each snippet may allocate in MiB, greater than 0. Defaults to the server's maximum.
+
+    Returns:
+        dict: The result of each snippet under "results", in the same order as `codes`, with its "elapsed_seconds".
+    """
+    done = 0
+
+    async def stream(index: int, result: dict) -> None:
+        nonlocal done
+        done += 1
+        await ctx.report_progress(done, len(codes))
+        await ctx.info(json.dumps({"index": index, "result": result}, default=str))
+
+    started = time.perf_counter()
+    results = await jijmodeling_check_batch(codes, timeout_seconds, memory_mb, on_result=stream)
+    return {"results": results, "elapsed_seconds": time.perf_counter() - started}
+
+
+@mcp.tool()
+async def jm_profile(
+    code: str,
+    instance_data: dict[str, typ.Any],
+    timeout_seconds: typ.Annotated[typ.Optional[float], Field(gt=0)] = None,
+    memory_mb: typ.Annotated[typ.Optional[int], Field(gt=0)] = None,
+) -> dict:
+    """
+    Compile the JijModeling problems defined by the code against instance data and report their size.
+    Use it to find formulations that grow too large (e.g. quadratic numbers of terms) before solving.
+    The code is executed, and every jm.Problem it defines is evaluated with jm.Interpreter(instance_data).
+
+    Args:
+        code (str): The model code. It must define at least one jm.Problem.
+        instance_data (dict[str, typ.Any]): Values of the Placeholders by name, e.g. {"n": 10, "d": [[0, 1], [1, 0]]}.
+        timeout_seconds (typ.Optional[float], optional): Wall-clock time limit in seconds for execution and evaluation, greater than 0. Defaults to the server's maximum.
+        memory_mb (typ.Optional[int], optional): Memory the code and the evaluation may allocate in MiB, greater than 0. Defaults to the server's maximum.
+
+    Returns:
+        dict: For each problem, the numbers of decision variables, constraints and nonzero terms, the terms per
+            constraint (largest first) and the evaluation time; the execution time and the peak memory of the run.
+    """
+    return await jijmodeling_profile(code, instance_data, timeout_seconds, memory_mb)
+
+
+@mcp.tool()
+def jm_estimate_size(code: str, sizes: typ.Optional[dict[str, typ.Any]] = None) -> dict:
+    """
+    Estimate how large a JijModeling model gets, from the code alone and without any instance data.
+    The jm.sum and forall structure gives a formula per constraint family (e.g. "O(n_l * n_t * n_p^2)"),
+    and the largest families are flagged as hot spots. Use jm_profile to measure a model with real data.
+
+    Args:
+        code (str): The model code. It is not executed.
+        sizes (typ.Optional[dict[str, typ.Any]], optional): Sizes of the dimensions to evaluate the formulas with,
+            by Placeholder name ("n"), array axis ("d.len_at(0)"), array shape ("d": [20, 30]) or the name a
+            dimension is assigned to ("n_p" for n_p = d.len_at(0)). Defaults to None (formulas only).
+
+    Returns:
+        dict: Formulas (and values) for the decision variables and for the instances and terms of the objective
+            and each constraint family, the hot spots, and the dimensions missing from sizes. Sizes must be
+            non-negative integers (or shapes of them); others are ignored and listed under invalid_sizes.
+    """
+    try:
+        return estimate_model_size(code, sizes)
+    except SyntaxError as e:
+        return {"error": f"SyntaxError: {e}"}
+
+
+@mcp.tool()
+async def jm_validate_data(
+    code: str,
+    files: dict[str, str],
+    values: typ.Optional[dict[str, typ.Any]] = None,
+) -> dict:
+    """
+    Validate instance data files against the Placeholders declared by JijModeling code, without loading them into memory.
+    Checks the number of dimensions, jagged arrays, declared shapes (e.g. shape=(n, n) against the value of n),
+    integer dtypes and NaN/infinite values, and reports the memory each array takes once loaded.
+
+    Args:
+        code (str): The model code. It is not executed.
+        files (dict[str, str]): Data file of each Placeholder by name, relative to the server's data directory:
+            .npy, .npz ("data.npz:name" for one of several arrays), .csv (one row per line) or .parquet.
+        values (typ.Optional[dict[str, typ.Any]], optional): Values given inline by Placeholder name, e.g. {"n": 10}. Defaults to None.
+
+    Returns:
+        dict: Whether the data is valid, a summary of the data and the errors of each Placeholder, all errors
+            and warnings, and the total memory of the data once loaded.
+    """
+    try:
+        return await asyncio.to_thread(validate_instance_data, code, files, values)
+    except SyntaxError as e:
+        return {"error": f"SyntaxError: {e}"}
 
 
 # Quantum Computing ----------
@@ -141,7 +298,7 @@ async def qiskit_v1_api_reference_toc() -> str:
         str: The table of contents in Markdown format.
     """
     url = "https://docs.quantum.ibm.com/api/qiskit/1.4"
-    response: FetchResponse = await fetch_as_markdown(url)
+    response: FetchResponse = await fetch_as_markdown(url, max_length=0)
     if response.isError:
         return response.errorMessage if response.errorMessage else "Error fetching the content"
     return url + "\n" + response.content[0]["text"]
@@ -154,7 +311,7 @@ async def qiskit_v2_api_reference_toc() -> str:
         str: The table of contents in Markdown format.
     """
     url = "https://docs.quantum.ibm.com/api/qiskit"
-    response: FetchResponse = await fetch_as_markdown(url)
+    response: FetchResponse = await fetch_as_markdown(url, max_length=0)
     if response.isError:
         return response.errorMessage if response.errorMessage else "Error fetching the content"
     return url + "\n" + response.content[0]["text"]
@@ -179,7 +336,7 @@ async def qiskit_tutorial(tutorial_name: str) -> str:
     else:
         url = f"https://learning.quantum.ibm.com/tutorial/{tutorial_name}"
 
-    response: FetchResponse = await fetch_as_markdown(url)
+    response: FetchResponse = await fetch_as_markdown(url, max_length=0)
     if response.isError:
         return response.errorMessage if response.errorMessage else "Error fetching the content"
 
@@ -190,11 +347,23 @@ async def qiskit_tutorial(tutorial_name: str) -> str:
         return url + "\n" + response.content[0]["text"] 
 
 
+def _qiskit_dependencies(
+    qiskit_version: str, other_dependencies: typ.Optional[list[str]]
+) -> list[str]:
+    """Returns the dependency list for a check without modifying `other_dependencies`."""
+    dependencies = list(other_dependencies) if other_dependencies else []
+    dependencies.append(QISKIT_REQUIREMENTS.get(qiskit_version, "qiskit"))
+    return dependencies
+
+
 @mcp.tool()
 async def qiskit_code_static_check(
     code: str,
     qiskit_version: typ.Literal["v1", "v2"],
     other_dependencies: typ.Optional[list[str]] = None,
+    execute_code: bool = False,
+    execution_limits: typ.Optional[ExecutionLimits] = None,
+    mode: typ.Literal["venv", "stubs"] = "venv",
 ) -> dict:
     """
     Check the provided Qiskit code for static analysis.
@@ -205,48 +374,97 @@ async def qiskit_code_static_check(
     In such cases, please refer to the v1 or v2 migration guide or similar tutorials.
     Use v2 unless you have a specific reason not to.
     If you need other dependencies like qiskit-ibm-runtime or qiskit-aer, please specify them as a list in other_dependencies.
+    If execute_code is True and the static analysis passes, the code is also run with resource limits
+    (time, memory, CPU, processes, file size, output size). Keep simulations small.
+    With mode="stubs", the code is only checked against pre-generated type stubs of the Qiskit
+    version, which is much faster and catches removed or renamed APIs, but cannot execute code
+    and does not check other_dependencies: imports of modules outside the stubs are reported as unresolved.
 
     Args:
         code (str): AI-generated Qiskit code to check.
         qiskit_version (typ.Literal["v1", "v2"]): The Qiskit version to use for checking the code.
         other_dependencies (typ.Optional[list[str]], optional): List of other dependencies to include. Defaults to None.
+        execute_code (bool, optional): Whether to run the code after a successful check. Defaults to False.
+        execution_limits (typ.Optional[ExecutionLimits], optional): Resource limits for the run. They cannot exceed the server's maximums. Defaults to the server's maximums.
+        mode (typ.Literal["venv", "stubs"], optional): "venv" checks in an environment with the packages installed, "stubs" checks against Qiskit type stubs only. Defaults to "venv".
 
     Returns:
-        dict: The result of the static analysis, including any errors or warnings.
+        dict: The result of the static analysis, including any errors or warnings, and the execution result if requested.
     """
-    dependencies = other_dependencies if other_dependencies else []
-    if qiskit_version == "v1":
-        dependencies.append("qiskit==1.4.2")
-    elif qiskit_version == "v2":
-        dependencies.append("qiskit>=2.0.0")
-    else:
-        dependencies.append("qiskit")
+    if mode == "stubs":
+        result = await check_code_with_stubs(code, qiskit_version)
+        if execute_code or other_dependencies:
+            result["log"].append(
+                "execute_code and other_dependencies are ignored in stubs mode; use mode=\"venv\"."
+            )
+        return result
 
-    result = run_code_in_temporary_venv(
+    dependencies = _qiskit_dependencies(qiskit_version, other_dependencies)
+
+    result = await run_code_in_temporary_venv(
         code,
         dependencies=dependencies,
-        execute_code_after_check=False
+        execute_code_after_check=execute_code,
+        execution_limits=execution_limits,
     )
 
     return result
 
 
+@mcp.tool()
+async def qiskit_code_static_check_batch(
+    codes: list[str],
+    qiskit_version: typ.Literal["v1", "v2"],
+    other_dependencies: typ.Optional[list[str]] = None,
+) -> dict:
+    """
+    Check several Qiskit code snippets for static analysis at once.
+    Works like qiskit_code_static_check, but all snippets are checked against the same
+    Qiskit version and dependencies in a single run, which is much faster than checking
+    them one by one. Use this when you have several variants of the same code.
+
+    Args:
+        codes (list[str]): AI-generated Qiskit code snippets to check.
+        qiskit_version (typ.Literal["v1", "v2"]): The Qiskit version to use for checking the code.
+        other_dependencies (typ.Optional[list[str]], optional): List of other dependencies to include. Defaults to None.
+
+    Returns:
+        dict: The static analysis result of each snippet under "results", in the same order as `codes`.
+    """
+    dependencies = _qiskit_dependencies(qiskit_version, other_dependencies)
+
+    return await check_codes_in_venv(codes, dependencies=dependencies)
+
+
 # Utils ----------------------
 @mcp.tool()
 async def fetch_as_markdown(
-    url: str, headers: typ.Optional[dict[str, str]] = None
+    url: str,
+    headers: typ.Optional[dict[str, str]] = None,
+    start_index: int = 0,
+    max_length: typ.Optional[int] = None,
+    engine: typ.Optional[typ.Literal["markdownify", "lxml"]] = None,
 ) -> FetchResponse:
     """
     Fetch a website, convert its HTML content to Markdown, and return it.
+    Large pages are returned in parts: if nextIndex is set, call again with start_index=nextIndex for the rest.
 
     Args:
         url (str): URL of the website to fetch.
         headers (Optional[dict[str, str]]): Custom headers for the request.
+        start_index (int, optional): Character of the Markdown to start at. Defaults to 0.
+        max_length (Optional[int], optional): Characters of Markdown to return at most, 0 for the whole page. Defaults to the server's limit.
+        engine (Optional[Literal["markdownify", "lxml"]], optional): "lxml" converts only the main content of the page
+            (without navigation, sidebars and footers) and is faster; "markdownify" converts the whole page. Defaults to the server's engine.
 
     Returns:
         FetchResponse: An object containing the Markdown content or an error message.
                        On success, isError is false and content contains the Markdown text.
+                       totalLength is the length of the whole Markdown, nextIndex the start of the next part (null after the last),
+                       and truncated is true if the page was larger than the server's download limit and was cut.
                        On failure, isError is true and errorMessage contains the error details.
     """
-    args = FetchRequestArgs(url=url, headers=headers)
+    args = FetchRequestArgs(
+        url=url, headers=headers, start_index=start_index, max_length=max_length, engine=engine
+    )
     return await Fetcher.markdown(args)
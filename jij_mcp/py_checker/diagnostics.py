@@ -0,0 +1,54 @@
+import typing as typ
+
+# Placeholder to display instead of temporary file paths
+# To use a fixed filename in feedback to AI
+FILE_PLACEHOLDER = "[checked_code.py]"
+
+# Severities reported back to the AI, in the order Pyright prints them in its summary
+_SEVERITIES = ("error", "warning", "information")
+
+
+def make_diagnostic(
+    severity: str, line: int, column: int, message: str, rule: typ.Optional[str]
+) -> dict:
+    """
+    Builds a backend-independent diagnostic.
+    `line` and `column` are 1-based, as printed by the Pyright CLI.
+    """
+    return {
+        "severity": severity,
+        "line": line,
+        "column": column,
+        "message": message,
+        "rule": rule,
+    }
+
+
+def format_check_result(diagnostics: list[dict]) -> dict:
+    """
+    Turns diagnostics of one checked file into a Pyright check result.
+
+    Returns:
+        dict: `success` (no errors), `output` (CLI-style text with the file path replaced
+        by a placeholder), `errors` (error messages only) and `diagnostics`.
+    """
+    reported = [d for d in diagnostics if d["severity"] in _SEVERITIES]
+    lines = []
+    for d in reported:
+        rule = f" ({d['rule']})" if d["rule"] else ""
+        lines.append(
+            f"  {FILE_PLACEHOLDER}:{d['line']}:{d['column']} - {d['severity']}: {d['message']}{rule}"
+        )
+    counts = {
+        severity: sum(1 for d in reported if d["severity"] == severity)
+        for severity in _SEVERITIES
+    }
+    summary = ", ".join(
+        f"{count} {name if count == 1 else name + 's'}" for name, count in counts.items()
+    )
+    return {
+        "success": counts["error"] == 0,
+        "output": "\n".join(([FILE_PLACEHOLDER] + lines if lines else []) + [summary]),
+        "errors": [d["message"] for d in reported if d["severity"] == "error"],
+        "diagnostics": reported,
+    }
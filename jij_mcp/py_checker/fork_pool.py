@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import subprocess
+import time
+import typing as typ
+
+from .sandbox import (
+    ExecutionLimits,
+    complete_execution_result,
+    execute_code_with_limits,
+    new_execution_result,
+    read_file_capped,
+    resolve_execution_limits,
+    rlimits_of,
+)
+
+
+# Warm fork-server workers are only available where os.fork exists
+FORK_WORKERS_ENABLED = hasattr(os, "fork") and os.environ.get(
+    "JIJ_MCP_EXEC_FORK_WORKERS", "1"
+).lower() not in ("0", "false", "no")
+# Number of fork servers (and therefore parallel executions) per environment
+DEFAULT_WORKERS_PER_ENVIRONMENT = int(os.environ.get("JIJ_MCP_EXEC_WORKERS_PER_ENV", "2"))
+# A fork server is replaced after this many jobs
+DEFAULT_WORKER_MAX_JOBS = int(os.environ.get("JIJ_MCP_EXEC_WORKER_MAX_JOBS", "100"))
+# Modules imported by a fork server before it accepts jobs; missing ones are skipped
+DEFAULT_PRELOAD_MODULES = [
+    module.strip()
+    for module in os.environ.get(
+        "JIJ_MCP_EXEC_PRELOAD", "numpy,qiskit,qiskit_aer"
+    ).split(",")
+    if module.strip()
+]
+# Seconds a fork server may take to import the preloaded modules
+_STARTUP_TIMEOUT = 300
+# Extra seconds granted on top of the job timeout before a fork server is considered stuck
+_RESPONSE_GRACE = 30
+
+_FORK_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fork_server.py")
+
+
+class WorkerError(RuntimeError):
+    """Raised when a fork server fails to start or stops answering."""
+
+
+class ForkServerWorker:
+    """One fork server process running in a pooled environment."""
+
+    def __init__(self, python_executable: str, preload_modules: list[str]):
+        self.python_executable = python_executable
+        self.preload_modules = preload_modules
+        self.jobs = 0
+        self._process: typ.Optional[asyncio.subprocess.Process] = None
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        # A killed process keeps returncode None until it is reaped
+        return (
+            self._process is not None
+            and not self._closed
+            and self._process.returncode is None
+        )
+
+    async def _read_message(self, timeout: float) -> dict:
+        try:
+            line = await asyncio.wait_for(self._process.stdout.readline(), timeout)
+        except asyncio.TimeoutError as e:
+            raise WorkerError("Fork server did not answer in time") from e
+        if not line:
+            raise WorkerError("Fork server exited")
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise WorkerError(f"Fork server sent a malformed message: {line[:200]!r}") from e
+
+    async def start(self) -> None:
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                self.python_executable,
+                _FORK_SERVER,
+                json.dumps(self.preload_modules),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            self._closed = True
+            raise WorkerError(f"Fork server could not be started: {e}") from e
+        try:
+            message = await self._read_message(_STARTUP_TIMEOUT)
+            if not message.get("ready"):
+                raise WorkerError(f"Fork server sent an unexpected handshake: {message!r:.200}")
+        except BaseException:
+            self.close()
+            raise
+
+    async def run(self, job: dict) -> dict:
+        self.jobs += 1
+        try:
+            self._process.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+            await self._process.stdin.drain()
+            return await self._read_message(job["timeout"] + _RESPONSE_GRACE)
+        except (OSError, ValueError) as e:
+            self.close()
+            raise WorkerError(f"Fork server failed: {e}") from e
+        except BaseException:
+            # Cancelled or stuck in the middle of a job: the worker state is unknown
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.alive:
+            self._process.kill()
+        self._closed = True
+
+    async def aclose(self) -> None:
+        """Kills the fork server and waits until it is reaped, so no transport outlives the loop."""
+        self.close()
+        if self._process is not None:
+            await self._process.wait()
+
+
+class ForkServerPool:
+    """
+    Keeps warm fork servers per environment. Each job is executed in a fresh child
+    forked from a server that has already imported the heavy modules; servers are
+    recycled after `max_jobs` jobs.
+    """
+
+    def __init__(
+        self,
+        workers_per_environment: int = DEFAULT_WORKERS_PER_ENVIRONMENT,
+        max_jobs: int = DEFAULT_WORKER_MAX_JOBS,
+        preload_modules: typ.Optional[list[str]] = None,
+    ):
+        self.workers_per_environment = workers_per_environment
+        self.max_jobs = max_jobs
+        self.preload_modules = (
+            DEFAULT_PRELOAD_MODULES if preload_modules is None else preload_modules
+        )
+        self._idle: dict[str, list[ForkServerWorker]] = {}
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self._loop: typ.Optional[asyncio.AbstractEventLoop] = None
+
+    async def _take_worker(self, python_executable: str) -> ForkServerWorker:
+        idle = self._idle.setdefault(python_executable, [])
+        while idle:
+            worker = idle.pop()
+            if worker.alive:
+                return worker
+        worker = ForkServerWorker(python_executable, self.preload_modules)
+        await worker.start()
+        return worker
+
+    def _return_worker(self, worker: ForkServerWorker) -> None:
+        if worker.alive and worker.jobs < self.max_jobs:
+            self._idle.setdefault(worker.python_executable, []).append(worker)
+        else:
+            worker.close()
+
+    async def execute(
+        self,
+        python_executable: str,
+        code_file: str,
+        cwd: str,
+        limits: typ.Optional[ExecutionLimits] = None,
+    ) -> dict:
+        """
+        Executes a code file in a child of a warm fork server of the environment.
+        Limits and the result are the same as for `execute_code_with_limits`.
+
+        Raises:
+            WorkerError: If no fork server could be started for the environment.
+        """
+        self._loop = asyncio.get_running_loop()
+        applied = resolve_execution_limits(limits)
+        result = new_execution_result(applied)
+        stdout_file = os.path.join(cwd, ".jij_mcp_stdout")
+        stderr_file = os.path.join(cwd, ".jij_mcp_stderr")
+        slots = self._slots.setdefault(
+            python_executable, asyncio.Semaphore(self.workers_per_environment)
+        )
+        async with slots:
+            worker = await self._take_worker(python_executable)
+            started = time.monotonic()
+            try:
+                response = await worker.run(
+                    {
+                        "code_file": code_file,
+                        "cwd": cwd,
+                        "stdout_file": stdout_file,
+                        "stderr_file": stderr_file,
+                        "limits": rlimits_of(applied),
+                        "timeout": applied.timeout_seconds,
+                    }
+                )
+            except WorkerError as e:
+                # The job may have run partially, so it is reported instead of retried
+                result["stderr"] = f"Execution worker failed: {e}"
+                result["duration_seconds"] = round(time.monotonic() - started, 3)
+                return result
+            finally:
+                self._return_worker(worker)
+        try:
+            return complete_execution_result(
+                result,
+                applied,
+                response["return_code"],
+                response["timed_out"],
+                read_file_capped(stdout_file, applied.max_output_bytes),
+                read_file_capped(stderr_file, applied.max_output_bytes),
+                started,
+                response.get("cpu_seconds"),
+            )
+        finally:
+            for path in (stdout_file, stderr_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _close_workers(self, python_executable: str) -> None:
+        for worker in self._idle.pop(python_executable, []):
+            worker.close()
+
+    def discard(self, python_executable: str) -> None:
+        """Closes the idle fork servers of an environment. Safe to call from any thread."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._close_workers, python_executable)
+
+    def close_all(self) -> None:
+        for python_executable in list(self._idle):
+            self._close_workers(python_executable)
+
+    async def aclose_all(self) -> None:
+        """Closes every idle fork server and waits for them to exit; used at server shutdown."""
+        workers = [worker for idle in self._idle.values() for worker in idle]
+        self._idle.clear()
+        await asyncio.gather(*(worker.aclose() for worker in workers))
+
+
+fork_server_pool = ForkServerPool()
+
+
+async def execute_code_in_environment(
+    python_executable: str,
+    code_file: str,
+    cwd: str,
+    limits: typ.Optional[ExecutionLimits],
+    log: list[str],
+) -> dict:
+    """
+    Executes a code file with limits, in a warm fork-server worker when possible and in a
+    freshly started interpreter otherwise. The result tells which one ran the job in `warm_worker`.
+    """
+    if FORK_WORKERS_ENABLED:
+        try:
+            result = await fork_server_pool.execute(python_executable, code_file, cwd, limits)
+            result["warm_worker"] = True
+            return result
+        except WorkerError as e:
+            log.append(f"Warm worker unavailable, starting a new interpreter: {e}")
+    result = await execute_code_with_limits(python_executable, code_file, cwd, limits)
+    result["warm_worker"] = False
+    return result
@@ -0,0 +1,121 @@
+"""
+A fork server for executing code in a pooled environment.
+
+It imports the heavy modules once, then forks a fresh child for every job, so user code
+starts with qiskit (and friends) already imported. It is executed by the interpreter of a
+pooled environment, so it only uses the standard library.
+
+Usage: python fork_server.py PRELOAD_MODULES_JSON
+
+Protocol (one JSON object per line):
+    -> {"ready": true, "preloaded": [...]}                       once, after the imports
+    <- {"code_file", "cwd", "stdout_file", "stderr_file", "limits", "timeout"}
+    -> {"return_code": int, "timed_out": bool, "cpu_seconds": float}   for every job
+"""
+
+import importlib
+import json
+import os
+import runpy
+import signal
+import sys
+import time
+import traceback
+
+from sandbox_launcher import apply_limits
+
+
+def _run_child(job: dict) -> None:
+    """Runs in the forked child; never returns."""
+    exit_code = 1
+    try:
+        os.setsid()
+        os.chdir(job["cwd"])
+        for fd, path in ((1, job["stdout_file"]), (2, job["stderr_file"])):
+            target = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.dup2(target, fd)
+            os.close(target)
+        sys.stdout = os.fdopen(1, "w", buffering=1, encoding="utf-8", closefd=False)
+        sys.stderr = os.fdopen(2, "w", buffering=1, encoding="utf-8", closefd=False)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)  # Never read the fork server's job channel
+        os.close(devnull)
+        sys.stdin = open(os.devnull)
+        apply_limits(job["limits"])
+        sys.argv = [job["code_file"]]
+        sys.path[0] = os.path.dirname(job["code_file"])
+        try:
+            runpy.run_path(job["code_file"], run_name="__main__")
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _wait(pid: int, timeout: float) -> tuple[int, bool, float]:
+    """Waits for the child; returns its exit code, whether it timed out and its CPU seconds."""
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        finished_pid, status, usage = os.wait4(pid, os.WNOHANG)
+        if finished_pid == pid:
+            return os.waitstatus_to_exitcode(status), False, usage.ru_utime + usage.ru_stime
+        if time.monotonic() >= deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            _pid, status, usage = os.wait4(pid, 0)
+            return os.waitstatus_to_exitcode(status), True, usage.ru_utime + usage.ru_stime
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def main() -> None:
+    # Keep the protocol channel private: anything the preloaded modules or the
+    # server itself print goes to stderr instead of corrupting stdout.
+    protocol = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+
+    preloaded = []
+    for module in json.loads(sys.argv[1]):
+        try:
+            importlib.import_module(module)
+            preloaded.append(module)
+        except Exception:
+            pass
+    protocol.write(json.dumps({"ready": True, "preloaded": preloaded}) + "\n")
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            protocol.close()
+            _run_child(job)
+        return_code, timed_out, cpu_seconds = _wait(pid, job["timeout"])
+        protocol.write(
+            json.dumps(
+                {"return_code": return_code, "timed_out": timed_out, "cpu_seconds": cpu_seconds}
+            )
+            + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import json
+import os
+import shutil
+import sys
+import typing as typ
+
+from .process import run_subprocess
+
+
+# Installer selection: "uv", "pip" or "auto" (uv when it is on PATH, otherwise pip)
+DEFAULT_INSTALLER = os.environ.get("JIJ_MCP_INSTALLER", "auto")
+# Optional directory of pre-downloaded wheels used in addition to (or instead of) PyPI
+DEFAULT_WHEELHOUSE = os.environ.get("JIJ_MCP_WHEELHOUSE") or None
+# uv cache directory. Keep it on the same filesystem as the venv pool so that
+# environments are populated through hardlinks instead of copies.
+DEFAULT_UV_CACHE_DIR = os.environ.get("JIJ_MCP_UV_CACHE_DIR") or None
+# When set, never touch the network: install from the uv cache / wheelhouse only
+DEFAULT_OFFLINE = os.environ.get("JIJ_MCP_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+class EnvironmentBuildError(RuntimeError):
+    """Raised when a pooled environment cannot be created or populated."""
+
+
+async def _run(command: list[str], failure_message: str) -> str:
+    try:
+        process = await run_subprocess(command)
+    except FileNotFoundError as e:
+        raise EnvironmentBuildError(f"{failure_message}: {e}") from e
+    if process.returncode != 0:
+        raise EnvironmentBuildError(
+            f"{failure_message} ({' '.join(command)}):\n{process.stderr}\nStdout was:\n{process.stdout}"
+        )
+    return process.stdout + process.stderr
+
+
+class DependencyResolutionError(RuntimeError):
+    """Raised when a requirement list cannot be resolved to pinned versions."""
+
+
+async def _run_resolver(command: list[str], stdin: typ.Optional[bytes] = None) -> str:
+    """Runs a resolver command and returns its stdout, which holds the result."""
+    try:
+        process = await run_subprocess(command, stdin=stdin)
+    except FileNotFoundError as e:
+        raise DependencyResolutionError(f"Dependency resolution failed: {e}") from e
+    if process.returncode != 0:
+        raise DependencyResolutionError(
+            f"Dependency resolution failed ({' '.join(command)}):\n{process.stderr}"
+        )
+    return process.stdout
+
+
+class Installer:
+    """Creates virtual environments and installs packages into them."""
+
+    name = "base"
+
+    async def create_venv(self, venv_dir: str) -> None:
+        raise NotImplementedError
+
+    async def install(self, venv_dir: str, python_executable: str, packages: list[str]) -> str:
+        """Installs `packages` into the venv and returns the installer output."""
+        raise NotImplementedError
+
+    async def resolve(self, packages: list[str]) -> list[str]:
+        """
+        Resolves `packages` for the server's interpreter version without installing them.
+
+        Returns:
+            list[str]: Every package of the resolution pinned as `name==version`.
+
+        Raises:
+            DependencyResolutionError: If the requirements cannot be resolved.
+        """
+        raise NotImplementedError
+
+
+class PipInstaller(Installer):
+    """The standard library `venv` module plus `pip install`."""
+
+    name = "pip"
+
+    def __init__(
+        self,
+        wheelhouse: typ.Optional[str] = DEFAULT_WHEELHOUSE,
+        offline: bool = DEFAULT_OFFLINE,
+    ):
+        self.wheelhouse = wheelhouse
+        self.offline = offline
+
+    async def create_venv(self, venv_dir: str) -> None:
+        await _run([sys.executable, "-m", "venv", venv_dir], "Venv creation failed")
+
+    async def install(self, venv_dir: str, python_executable: str, packages: list[str]) -> str:
+        command = [python_executable, "-m", "pip", "install"]
+        if self.wheelhouse:
+            command += ["--find-links", self.wheelhouse]
+        if self.offline:
+            command.append("--no-index")
+        return await _run(command + packages, "Package installation failed")
+
+    async def resolve(self, packages: list[str]) -> list[str]:
+        command = [
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            "--dry-run",
+            "--ignore-installed",
+            "--quiet",
+            "--report",
+            "-",
+        ]
+        if self.wheelhouse:
+            command += ["--find-links", self.wheelhouse]
+        if self.offline:
+            command.append("--no-index")
+        try:
+            report = json.loads(await _run_resolver(command + packages))
+        except ValueError as e:
+            raise DependencyResolutionError(f"Unreadable pip report: {e}") from e
+        return sorted(
+            f"{item['metadata']['name']}=={item['metadata']['version']}"
+            for item in report.get("install", [])
+        )
+
+
+class UvInstaller(Installer):
+    """
+    `uv venv` plus `uv pip install`.
+    Packages are linked from uv's cache, so once the cache holds a package set,
+    building another environment with it needs neither downloads nor the network.
+    """
+
+    name = "uv"
+
+    def __init__(
+        self,
+        uv_executable: str = "uv",
+        cache_dir: typ.Optional[str] = DEFAULT_UV_CACHE_DIR,
+        wheelhouse: typ.Optional[str] = DEFAULT_WHEELHOUSE,
+        offline: bool = DEFAULT_OFFLINE,
+    ):
+        self.uv_executable = uv_executable
+        self.cache_dir = cache_dir
+        self.wheelhouse = wheelhouse
+        self.offline = offline
+
+    def _common_options(self) -> list[str]:
+        options = []
+        if self.cache_dir:
+            options += ["--cache-dir", self.cache_dir]
+        if self.offline:
+            options.append("--offline")
+        return options
+
+    async def create_venv(self, venv_dir: str) -> None:
+        await _run(
+            [self.uv_executable, "venv", "--python", sys.executable, "--quiet"]
+            + self._common_options()
+            + [venv_dir],
+            "Venv creation failed",
+        )
+
+    async def install(self, venv_dir: str, python_executable: str, packages: list[str]) -> str:
+        command = [
+            self.uv_executable,
+            "pip",
+            "install",
+            "--python",
+            python_executable,
+            "--link-mode",
+            "hardlink",
+        ] + self._common_options()
+        if self.wheelhouse:
+            command += ["--find-links", self.wheelhouse]
+        return await _run(command + packages, "Package installation failed")
+
+    async def resolve(self, packages: list[str]) -> list[str]:
+        command = [
+            self.uv_executable,
+            "pip",
+            "compile",
+            "-",
+            "--python",
+            sys.executable,
+            "--no-header",
+            "--no-annotate",
+            "--quiet",
+        ] + self._common_options()
+        if self.wheelhouse:
+            command += ["--find-links", self.wheelhouse]
+        output = await _run_resolver(command, stdin="\n".join(packages).encode("utf-8"))
+        return sorted(
+            line.strip()
+            for line in output.splitlines()
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+
+
+def get_installer(name: typ.Optional[str] = None) -> Installer:
+    """
+    Returns the installer selected by `name` or `JIJ_MCP_INSTALLER`.
+    "auto" picks uv when it is available and falls back to pip.
+    """
+    name = name or DEFAULT_INSTALLER
+    if name == "auto":
+        name = "uv" if shutil.which("uv") else "pip"
+    if name == "uv":
+        return UvInstaller(uv_executable=shutil.which("uv") or "uv")
+    if name == "pip":
+        return PipInstaller()
+    raise ValueError(f"Unknown installer: {name}")
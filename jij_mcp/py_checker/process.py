@@ -0,0 +1,61 @@
+import asyncio
+import os
+import subprocess
+import typing as typ
+
+
+# Upper bound on heavy checks (environment builds, Pyright runs, code execution)
+# running at the same time. Cheap tools are never queued behind it.
+DEFAULT_MAX_CONCURRENT_CHECKS = int(
+    os.environ.get("JIJ_MCP_MAX_CONCURRENT_CHECKS", "4")
+)
+
+# Upper bound on dependency resolver (uv/pip) processes running at the same time.
+# Resolution runs before a check takes `check_semaphore`, to look up cached results.
+DEFAULT_MAX_CONCURRENT_RESOLVES = int(
+    os.environ.get("JIJ_MCP_MAX_CONCURRENT_RESOLVES", "2")
+)
+
+check_semaphore = asyncio.Semaphore(DEFAULT_MAX_CONCURRENT_CHECKS)
+resolve_semaphore = asyncio.Semaphore(DEFAULT_MAX_CONCURRENT_RESOLVES)
+
+
+async def run_subprocess(
+    command: list[str],
+    timeout: typ.Optional[float] = None,
+    cwd: typ.Optional[str] = None,
+    env: typ.Optional[dict[str, str]] = None,
+    stdin: typ.Optional[bytes] = None,
+) -> subprocess.CompletedProcess:
+    """
+    Runs a command without blocking the event loop and returns its decoded output.
+    The process is killed if it outlives `timeout` or if the calling task is cancelled.
+
+    Raises:
+        FileNotFoundError: If the executable does not exist.
+        subprocess.TimeoutExpired: If the command did not finish within `timeout` seconds.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(stdin), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    return subprocess.CompletedProcess(
+        command,
+        process.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
@@ -1,141 +1,187 @@
+import asyncio
 import subprocess
 import tempfile
 import os
-import sys
-import re
+import json
+import typing as typ
+
+from .diagnostics import FILE_PLACEHOLDER, format_check_result, make_diagnostic
+from .fork_pool import execute_code_in_environment, fork_server_pool
+from .process import check_semaphore, run_subprocess
+from .pyright_lsp import (
+    LanguageServerError,
+    check_code_with_language_server,
+    language_server_pool,
+)
+from .resolver import lock_cache
+from .result_cache import check_cache_key, check_result_cache
+from .sandbox import ExecutionLimits
+from .stubs import StubBundleError, server_executables, stub_bundles
+from .venv_pool import (
+    EnvironmentBuildError,
+    environment_key,
+    venv_executables,
+    venv_pool,
+)
+
+# Requirement that pins each supported Qiskit major version
+QISKIT_REQUIREMENTS = {"v1": "qiskit==1.4.2", "v2": "qiskit>=2.0.0"}
+# Import names covered by the stub bundle of each Qiskit version
+QISKIT_STUB_PACKAGES = ["qiskit"]
+
+# "lsp" keeps a Pyright language server alive per environment; "cli" spawns pyright per check.
+DEFAULT_PYRIGHT_BACKEND = os.environ.get("JIJ_MCP_PYRIGHT_BACKEND", "lsp")
+
+# Pyright version of each environment used by this process, part of the result cache key
+_pyright_versions: dict[str, str] = {}
+
+# Language servers and execution workers must not outlive their environment
+venv_pool.on_evict.append(
+    lambda venv_dir: language_server_pool.discard(venv_executables(venv_dir)["python"])
+)
+venv_pool.on_evict.append(
+    lambda venv_dir: fork_server_pool.discard(venv_executables(venv_dir)["python"])
+)
 
 
 # This is the core Pyright checking logic adapted from our previous conversation.
 # It will be called by the main function to check code using a specific Pyright executable.
-def _run_pyright_on_file(
-    code_file_to_check: str, pyright_executable_in_venv: str
-) -> dict:
+async def _run_pyright_on_files(
+    code_files_to_check: list[str],
+    pyright_executable_in_venv: str,
+    python_executable_in_venv: typ.Optional[str] = None,
+    project_dir: typ.Optional[str] = None,
+) -> dict[str, dict]:
     """
-    Runs Pyright on a specified file using a specific Pyright executable.
-    Parses the output to extract errors and determine success.
+    Runs Pyright once on several files using a specific Pyright executable.
+    If a Python executable is given, imports are resolved against its environment
+    instead of whichever interpreter happens to be first on PATH.
+    If a project directory is given, its pyrightconfig.json is used.
+    Pyright's JSON report is split back into one check result per file.
     File paths in the output are replaced with a placeholder.
+
+    Returns:
+        dict[str, dict]: The check result of each file, keyed by its path.
     """
-    check_result = {"success": False, "output": "", "errors": []}
-    # Placeholder to display instead of temporary file paths
-    # To use a fixed filename in feedback to AI
-    file_placeholder = "[checked_code.py]"
 
-    try:
-        process = subprocess.run(
-            [pyright_executable_in_venv, code_file_to_check],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-        )
-        raw_output = process.stdout + process.stderr
-
-        # Success/failure determination (based on Pyright's summary line)
-        num_errors = -1
-        summary_patterns = [
-            re.compile(
-                r"(\d+)\s*error[s]?,\s*(\d+)\s*warning[s]?,\s*(\d+)\s*information[s]?",
-                re.IGNORECASE,
-            ),
-            re.compile(r"found\s*(\d+)\s*error[s]?", re.IGNORECASE),
-            re.compile(r"no\s*error[s]?\s*found", re.IGNORECASE),
-        ]
-
-        for pattern in summary_patterns:
-            match = pattern.search(raw_output)
-            if match:
-                if pattern.pattern == summary_patterns[0].pattern:
-                    num_errors = int(match.group(1))
-                    break
-                elif pattern.pattern == summary_patterns[1].pattern:
-                    num_errors = int(match.group(1))
-                    break
-                elif pattern.pattern == summary_patterns[2].pattern:
-                    num_errors = 0
-                    break
-
-        if num_errors == 0:
-            check_result["success"] = True
-        elif num_errors > 0:
-            check_result["success"] = False
-        else:
-            if process.returncode == 0 and not "error" in raw_output.lower():
-                check_result["success"] = True
-            elif process.returncode != 0:
-                check_result["success"] = False
-            else:
-                check_result["success"] = False
-
-        # Clean Pyright output by replacing the temporary file path
-        cleaned_output_lines = []
-        for line in raw_output.splitlines():
-            cleaned_line = line.replace(code_file_to_check, file_placeholder)
-            cleaned_output_lines.append(cleaned_line)
-        check_result["output"] = "\n".join(cleaned_output_lines).strip()
-
-        # Extract pure error messages
-        parsed_errors = []
-        for line in raw_output.splitlines():  # Parse from raw_output
-            marker = " - error: "
-            marker_index = line.lower().find(marker)
-            if marker_index != -1:
-                message_body = line[marker_index + len(marker) :].strip()
-                message_body = re.sub(
-                    r"\s*\([a-zA-Z0-9_-]+\)$",
-                    "",
-                    message_body,  # Remove trailing (ruleName)
-                ).strip()
-                parsed_errors.append(message_body)
-            elif (
-                ": error: " in line.lower() and code_file_to_check in line
-            ):  # Handle other formats if they contain the specific file
-                try:
-                    _prefix_part, msg_body = line.split(" error: ", 1)
-                    msg_body = re.sub(
-                        r"\s*\([a-zA-Z0-9_-]+\)$", "", msg_body.strip()
-                    ).strip()
-                    parsed_errors.append(msg_body)
-                except ValueError:
-                    pass  # Could not split, ignore this line for error parsing
-        check_result["errors"] = parsed_errors
+    def failure(message: str) -> dict[str, dict]:
+        return {
+            path: {"success": False, "output": message, "errors": [message], "diagnostics": []}
+            for path in code_files_to_check
+        }
 
+    command = [pyright_executable_in_venv, "--outputjson"]
+    if python_executable_in_venv:
+        command += ["--pythonpath", python_executable_in_venv]
+    if project_dir:
+        command += ["--project", project_dir]
+    command += code_files_to_check
+    try:
+        process = await run_subprocess(command)
     except FileNotFoundError:
-        check_result["output"] = (
-            f"Error: Pyright executable '{pyright_executable_in_venv}' not found."
-        )
-        check_result["errors"].append(
-            f"Pyright executable '{pyright_executable_in_venv}' not found."
-        )
-        check_result["success"] = False
+        return failure(f"Pyright executable '{pyright_executable_in_venv}' not found.")
     except Exception as e:
-        check_result["output"] = (
-            f"An unexpected error occurred during Pyright check: {str(e)}"
+        return failure(f"An unexpected error occurred during Pyright check: {str(e)}")
+
+    try:
+        report = json.loads(process.stdout)
+    except ValueError:
+        # Pyright did not get as far as checking, e.g. a broken installation
+        output = (process.stdout + process.stderr).strip()
+        for path in code_files_to_check:
+            output = output.replace(path, FILE_PLACEHOLDER)
+        return failure(output or f"Pyright exited with code {process.returncode}.")
+
+    diagnostics_by_file: dict[str, list[dict]] = {
+        os.path.realpath(path): [] for path in code_files_to_check
+    }
+    for d in report.get("generalDiagnostics", []):
+        file_diagnostics = diagnostics_by_file.get(os.path.realpath(d.get("file", "")))
+        if file_diagnostics is None:
+            continue
+        start = d.get("range", {}).get("start", {"line": 0, "character": 0})
+        file_diagnostics.append(
+            make_diagnostic(
+                d["severity"],
+                start["line"] + 1,
+                start["character"] + 1,
+                d["message"],
+                d.get("rule"),
+            )
         )
-        check_result["errors"].append(f"An unexpected error: {str(e)}")
-        check_result["success"] = False
-    return check_result
+    return {
+        path: format_check_result(diagnostics_by_file[os.path.realpath(path)])
+        for path in code_files_to_check
+    }
+
+
+async def _run_pyright_on_file(
+    code_file_to_check: str,
+    pyright_executable_in_venv: str,
+    python_executable_in_venv: typ.Optional[str] = None,
+    project_dir: typ.Optional[str] = None,
+) -> dict:
+    """Runs Pyright on a single file. See `_run_pyright_on_files`."""
+    results = await _run_pyright_on_files(
+        [code_file_to_check], pyright_executable_in_venv, python_executable_in_venv, project_dir
+    )
+    return results[code_file_to_check]
 
 
-def run_code_in_temporary_venv(
+async def _check_code(
     ai_code_string: str,
-    dependencies: list[str],
-    execute_code_after_check: bool = True,  # Default to True to try execution
+    ai_code_file: str,
+    executables: dict[str, str],
+    pyright_backend: str,
+    log: list[str],
+    stub_path: typ.Optional[str] = None,
 ) -> dict:
     """
-    Creates a temporary virtual environment, installs dependencies and Pyright,
-    statically checks the AI-generated code with Pyright, and optionally executes the code.
+    Checks the code with the selected Pyright backend.
+    The language server backend falls back to the CLI if the server cannot be used.
+    With a `stub_path`, the directory of `ai_code_file` must hold a pyrightconfig.json
+    with the same stub path for the CLI.
+    """
+    if pyright_backend == "lsp":
+        try:
+            # The language server client is thread based; keep its waits off the event loop
+            return await asyncio.to_thread(
+                check_code_with_language_server,
+                ai_code_string,
+                executables["pyright_langserver"],
+                executables["python"],
+                stub_path=stub_path,
+            )
+        except (LanguageServerError, OSError) as e:
+            log.append(f"Pyright language server unavailable, using the CLI: {e}")
+    return await _run_pyright_on_file(
+        ai_code_file,
+        executables["pyright"],
+        executables["python"],
+        os.path.dirname(ai_code_file) if stub_path else None,
+    )
 
-    Args:
-        ai_code_string: The Python code string to check and execute.
-        dependencies: A list of Python package dependencies (e.g., ["requests", "numpy>=1.20"]).
-        execute_code_after_check: If True, executes the code after a successful Pyright check.
 
-    Returns:
-        dict: A dictionary containing results from each step.
-    """
-    results = {
+async def _pyright_version(environment: str, pyright_executable: str) -> str:
+    """Returns the Pyright version of an environment, asking its pyright once per process."""
+    if environment not in _pyright_versions:
+        try:
+            process = await run_subprocess([pyright_executable, "--version"], timeout=60)
+            version = process.stdout.strip().split()[-1] if process.returncode == 0 else ""
+        except (OSError, IndexError, subprocess.TimeoutExpired):
+            version = ""
+        _pyright_versions[environment] = version or "unknown"
+    return _pyright_versions[environment]
+
+
+def _initial_results() -> dict:
+    return {
         "venv_path": None,
         "venv_created": False,
+        "venv_reused": False,
         "dependencies_installed": False,
+        "locked_dependencies": None,
+        "cache_hit": False,
         "pyright_check_result": None,
         "code_execution_result": {
             "executed": False,
@@ -147,79 +193,124 @@ def run_code_in_temporary_venv(
         "log": [],  # Overall log of operations
     }
 
-    # Create a temporary directory that will be automatically cleaned up
-    with tempfile.TemporaryDirectory(prefix="ai_code_venv_") as venv_dir:
-        results["venv_path"] = venv_dir
-        results["log"].append(f"Temporary venv directory created: {venv_dir}")
 
-        # 1. Create the virtual environment
-        try:
-            subprocess.run(
-                [sys.executable, "-m", "venv", venv_dir],
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-            )
-            results["venv_created"] = True
-            results["log"].append("Virtual environment created successfully.")
-        except subprocess.CalledProcessError as e:
-            results["log"].append(f"Venv creation failed: {e.stderr}")
-            return results  # Critical failure, stop here
-
-        # Determine paths to executables within the venv
-        if sys.platform == "win32":
-            pip_exe = os.path.join(venv_dir, "Scripts", "pip.exe")
-            python_exe = os.path.join(venv_dir, "Scripts", "python.exe")
-            pyright_exe = os.path.join(venv_dir, "Scripts", "pyright.exe")
-        else:
-            pip_exe = os.path.join(venv_dir, "bin", "pip")
-            python_exe = os.path.join(venv_dir, "bin", "python")
-            pyright_exe = os.path.join(venv_dir, "bin", "pyright")
-
-        # 2. Install dependencies and Pyright
-        # Pyright CLI is available via pip as 'pyright'
-        packages_to_install = dependencies + ["pyright"]
-        if not packages_to_install:  # Ensure there's at least 'pyright'
-            packages_to_install = ["pyright"]
-        elif "pyright" not in packages_to_install:
-            packages_to_install.append("pyright")
+async def run_code_in_temporary_venv(
+    ai_code_string: str,
+    dependencies: list[str],
+    execute_code_after_check: bool = True,  # Default to True to try execution
+    pyright_backend: typ.Optional[typ.Literal["lsp", "cli"]] = None,
+    execution_limits: typ.Optional[ExecutionLimits] = None,
+) -> dict:
+    """
+    Takes a pooled virtual environment with the dependencies and Pyright installed
+    (building it on first use), statically checks the AI-generated code with Pyright,
+    and optionally executes the code. Only the code file is temporary; the environment
+    is kept in the pool for later checks with the same dependency set.
+    The dependencies are first resolved into a cached lock of pinned versions, which
+    identifies the environment, so equivalent dependency lists share one environment.
+    Pyright results are cached by code, environment, Pyright version and backend, and a check
+    without execution that hits the cache returns without touching the environment.
 
-        try:
-            install_command = [pip_exe, "install"] + packages_to_install
-            results["log"].append(f"Installing packages: {' '.join(install_command)}")
-            install_proc = subprocess.run(
-                install_command,
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-            )
-            results["dependencies_installed"] = True
-            results["log"].append(
-                f"Packages installed successfully:\n{install_proc.stdout}"
-            )
-        except subprocess.CalledProcessError as e:
-            results["log"].append(
-                f"Package installation failed for {pip_exe} install {' '.join(packages_to_install)}:\n{e.stderr}\nStdout was:\n{e.stdout}"
-            )
-            return results  # Critical failure
+    Args:
+        ai_code_string: The Python code string to check and execute.
+        dependencies: A list of Python package dependencies (e.g., ["requests", "numpy>=1.20"]).
+        execute_code_after_check: If True, executes the code after a successful Pyright check.
+        pyright_backend: "lsp" to check with the environment's long-lived Pyright language
+            server, "cli" to spawn the pyright CLI. Defaults to `JIJ_MCP_PYRIGHT_BACKEND`.
+        execution_limits: Resource limits for the execution, clamped to the server-wide
+            maximums. Unset limits use those maximums.
+
+    Returns:
+        dict: A dictionary containing results from each step. `locked_dependencies` lists
+        the pinned packages of the environment; `cache_hit` is True when
+        `pyright_check_result` was served from the result cache.
+    """
+    results = _initial_results()
+    pyright_backend = pyright_backend or DEFAULT_PYRIGHT_BACKEND
+    dependencies = await lock_cache.resolve(dependencies, results["log"])
+    results["locked_dependencies"] = dependencies
+    environment = environment_key(dependencies)
 
-        # 3. Write AI code to a temporary file within the venv directory for Pyright check
-        # Using NamedTemporaryFile within the venv_dir ensures it's cleaned up if the dir is.
-        # However, we need to pass its name to subprocess, so delete=False and manual removal is safer.
-        ai_code_file_for_check = tempfile.NamedTemporaryFile(
-            mode="w+t", suffix=".py", delete=False, encoding="utf-8", dir=venv_dir
+    # 0. Serve a cached Pyright result. The key needs the environment's Pyright version,
+    # which is known once the environment has been used by this process.
+    cache_looked_up = False
+    pyright_version = _pyright_versions.get(environment)
+    if not execute_code_after_check and pyright_version is not None:
+        cache_looked_up = True
+        cached_result = check_result_cache.get(
+            check_cache_key(ai_code_string, environment, pyright_version, pyright_backend)
         )
-        try:
-            ai_code_file_for_check.write(ai_code_string)
-            ai_code_file_for_check.close()  # Close it so Pyright can access it properly
-            results["log"].append(f"AI code written to: {ai_code_file_for_check.name}")
+        if cached_result is not None:
+            results["cache_hit"] = True
+            results["pyright_check_result"] = cached_result
+            results["log"].append("Pyright result served from the cache.")
+            return results
+
+    async with check_semaphore:
+        await _run_code_in_pooled_venv(
+            ai_code_string,
+            dependencies,
+            execute_code_after_check,
+            pyright_backend,
+            execution_limits,
+            cache_looked_up,
+            results,
+        )
+    return results
+
 
-            # 4. Perform Pyright static check
-            pyright_result = _run_pyright_on_file(
-                ai_code_file_for_check.name, pyright_exe
+async def _run_code_in_pooled_venv(
+    ai_code_string: str,
+    dependencies: list[str],
+    execute_code_after_check: bool,
+    pyright_backend: str,
+    execution_limits: typ.Optional[ExecutionLimits],
+    cache_looked_up: bool,
+    results: dict,
+) -> None:
+    """The environment-bound part of `run_code_in_temporary_venv`; fills `results`."""
+    # 1-2. Take a ready environment from the pool (creating and installing it if needed)
+    try:
+        venv_dir, reused = await venv_pool.acquire(dependencies, results["log"])
+    except EnvironmentBuildError as e:
+        results["log"].append(str(e))
+        return  # Critical failure, stop here
+    results["venv_path"] = venv_dir
+    results["venv_created"] = True
+    results["venv_reused"] = reused
+    results["dependencies_installed"] = True
+
+    executables = venv_executables(venv_dir)
+    python_exe = executables["python"]
+    environment = os.path.basename(venv_dir)
+
+    # 3. Write AI code to a temporary directory for the Pyright check.
+    # The directory is removed afterwards; the pooled venv is left untouched.
+    try:
+        with tempfile.TemporaryDirectory(prefix="ai_code_") as code_dir:
+            ai_code_file = os.path.join(code_dir, "checked_code.py")
+            with open(ai_code_file, "w", encoding="utf-8") as f:
+                f.write(ai_code_string)
+            results["log"].append(f"AI code written to: {ai_code_file}")
+
+            # 4. Perform Pyright static check, unless the result is cached
+            pyright_version = await _pyright_version(environment, executables["pyright"])
+            cache_key = check_cache_key(
+                ai_code_string, environment, pyright_version, pyright_backend
             )
+            pyright_result = None if cache_looked_up else check_result_cache.get(cache_key)
+            if pyright_result is not None:
+                results["cache_hit"] = True
+                results["log"].append("Pyright result served from the cache.")
+            else:
+                pyright_result = await _check_code(
+                    ai_code_string,
+                    ai_code_file,
+                    executables,
+                    pyright_backend,
+                    results["log"],
+                )
+                check_result_cache.put(cache_key, pyright_result)
             results["pyright_check_result"] = pyright_result
             results["log"].append(
                 f"Pyright check completed. Success: {pyright_result['success']}"
@@ -246,51 +337,215 @@ def run_code_in_temporary_venv(
                     ] = "Skipped due to Pyright errors."
                 else:
                     results["log"].append(
-                        f"Executing AI code with: {python_exe} {ai_code_file_for_check.name}"
+                        f"Executing AI code with: {python_exe} {ai_code_file}"
                     )
                     results["code_execution_result"]["executed"] = True
                     try:
-                        exec_proc = subprocess.run(
-                            [python_exe, ai_code_file_for_check.name],
-                            capture_output=True,
-                            text=True,
-                            encoding="utf-8",
-                            timeout=30,  # Added timeout
-                        )
-                        results["code_execution_result"]["success"] = (
-                            exec_proc.returncode == 0
+                        execution = await execute_code_in_environment(
+                            python_exe,
+                            ai_code_file,
+                            code_dir,
+                            execution_limits,
+                            results["log"],
                         )
-                        results["code_execution_result"]["stdout"] = exec_proc.stdout
-                        results["code_execution_result"]["stderr"] = exec_proc.stderr
-                        results["code_execution_result"][
-                            "return_code"
-                        ] = exec_proc.returncode
-                        results["log"].append(
-                            f"Code execution finished. Return code: {exec_proc.returncode}"
-                        )
-                    except subprocess.TimeoutExpired:
-                        results["log"].append("Code execution timed out.")
-                        results["code_execution_result"]["success"] = False
-                        results["code_execution_result"][
-                            "stderr"
-                        ] = "Execution timed out after 30 seconds."
+                        results["code_execution_result"].update(execution)
+                        if execution["timed_out"]:
+                            results["log"].append("Code execution timed out.")
+                        else:
+                            results["log"].append(
+                                f"Code execution finished. Return code: {execution['return_code']}"
+                            )
+                        if execution["limit_exceeded"]:
+                            results["log"].append(
+                                f"Execution limit exceeded: {execution['limit_exceeded']}"
+                            )
                     except Exception as e:
                         results["log"].append(
                             f"Code execution threw an exception: {str(e)}"
                         )
                         results["code_execution_result"]["success"] = False
                         results["code_execution_result"]["stderr"] = str(e)
-        finally:
-            # Clean up the temporary AI code file
-            if os.path.exists(ai_code_file_for_check.name):
-                os.remove(ai_code_file_for_check.name)
+        results["log"].append(f"Cleaned up AI code directory: {code_dir}")
+    finally:
+        venv_pool.release(venv_dir)
+
+
+async def check_codes_in_venv(ai_code_strings: list[str], dependencies: list[str]) -> dict:
+    """
+    Statically checks several code snippets against the same dependency set with a single
+    Pyright run in a pooled environment. Each snippet is written to its own file in one
+    temporary project directory and the diagnostics are split back out per snippet.
+    Snippets with a cached result of a CLI check are not checked again.
+
+    Args:
+        ai_code_strings: The Python code strings to check.
+        dependencies: A list of Python package dependencies shared by all snippets.
+
+    Returns:
+        dict: The environment information, one `pyright_check_result` (with its `cache_hit`
+        flag) per snippet in input order under `results`, and the log.
+    """
+    results = {
+        "venv_path": None,
+        "venv_created": False,
+        "venv_reused": False,
+        "dependencies_installed": False,
+        "locked_dependencies": None,
+        "results": [
+            {"index": index, "cache_hit": False, "pyright_check_result": None}
+            for index in range(len(ai_code_strings))
+        ],
+        "log": [],
+    }
+    dependencies = await lock_cache.resolve(dependencies, results["log"])
+    results["locked_dependencies"] = dependencies
+    environment = environment_key(dependencies)
+
+    def serve_from_cache(pyright_version: str) -> list[int]:
+        """Fills in cached results and returns the indices that still need a check."""
+        pending = []
+        for entry, ai_code_string in zip(results["results"], ai_code_strings):
+            cached_result = check_result_cache.get(
+                check_cache_key(ai_code_string, environment, pyright_version, "cli")
+            )
+            if cached_result is None:
+                pending.append(entry["index"])
+            else:
+                entry["cache_hit"] = True
+                entry["pyright_check_result"] = cached_result
+        return pending
+
+    pending = list(range(len(ai_code_strings)))
+    if environment in _pyright_versions:
+        pending = serve_from_cache(_pyright_versions[environment])
+    cache_looked_up = environment in _pyright_versions
+    if not pending:
+        results["log"].append("All Pyright results served from the cache.")
+        return results
+
+    async with check_semaphore:
+        try:
+            venv_dir, reused = await venv_pool.acquire(dependencies, results["log"])
+        except EnvironmentBuildError as e:
+            results["log"].append(str(e))
+            return results
+        results["venv_path"] = venv_dir
+        results["venv_created"] = True
+        results["venv_reused"] = reused
+        results["dependencies_installed"] = True
+
+        executables = venv_executables(venv_dir)
+        try:
+            pyright_version = await _pyright_version(environment, executables["pyright"])
+            if not cache_looked_up:
+                pending = serve_from_cache(pyright_version)
+            if len(pending) < len(ai_code_strings):
                 results["log"].append(
-                    f"Cleaned up AI code file: {ai_code_file_for_check.name}"
+                    f"{len(ai_code_strings) - len(pending)} Pyright results served from the cache."
+                )
+            if pending:
+                with tempfile.TemporaryDirectory(prefix="ai_code_batch_") as code_dir:
+                    code_files = {}
+                    for index in pending:
+                        code_file = os.path.join(code_dir, f"snippet_{index}.py")
+                        with open(code_file, "w", encoding="utf-8") as f:
+                            f.write(ai_code_strings[index])
+                        code_files[index] = code_file
+                    results["log"].append(
+                        f"{len(code_files)} snippets written to: {code_dir}"
+                    )
+
+                    check_results = await _run_pyright_on_files(
+                        list(code_files.values()),
+                        executables["pyright"],
+                        executables["python"],
+                    )
+                    for index, code_file in code_files.items():
+                        check_result_cache.put(
+                            check_cache_key(
+                                ai_code_strings[index], environment, pyright_version, "cli"
+                            ),
+                            check_results[code_file],
+                        )
+                        results["results"][index]["pyright_check_result"] = check_results[code_file]
+            results["log"].append(
+                f"Pyright batch check completed. Snippets without errors: "
+                f"{sum(r['pyright_check_result']['success'] for r in results['results'])}/{len(ai_code_strings)}"
+            )
+        finally:
+            venv_pool.release(venv_dir)
+
+    return results
+
+
+async def check_code_with_stubs(
+    ai_code_string: str,
+    qiskit_version: str,
+    pyright_backend: typ.Optional[typ.Literal["lsp", "cli"]] = None,
+) -> dict:
+    """
+    Statically checks code against the stub bundle of a Qiskit version with the server's
+    own Pyright. No environment is created for the check: the bundle is generated once per
+    version (in a pooled environment) and reused, so removed APIs such as `qiskit.execute`
+    are reported without installing Qiskit. Code cannot be executed in this mode.
+    Imports are resolved with an empty interpreter, never the server's own environment:
+    modules missing from the bundle, and packages other than qiskit, are reported as
+    unresolved imports.
+
+    Args:
+        ai_code_string: The Python code string to check.
+        qiskit_version: A key of `QISKIT_REQUIREMENTS`.
+        pyright_backend: "lsp" or "cli". Defaults to `JIJ_MCP_PYRIGHT_BACKEND`.
+
+    Returns:
+        dict: The same fields as `run_code_in_temporary_venv`, plus the `stub_bundle` used.
+    """
+    results = _initial_results()
+    results["stub_bundle"] = None
+    pyright_backend = pyright_backend or DEFAULT_PYRIGHT_BACKEND
+    bundle_name = f"qiskit-{qiskit_version}"
+
+    async with check_semaphore:
+        try:
+            bundle_dir = await stub_bundles.ensure(
+                bundle_name,
+                QISKIT_REQUIREMENTS[qiskit_version],
+                QISKIT_STUB_PACKAGES,
+                results["log"],
+            )
+            python_executable = await stub_bundles.isolated_python(results["log"])
+        except StubBundleError as e:
+            results["log"].append(str(e))
+            return results
+        results["stub_bundle"] = bundle_dir
+
+        executables = server_executables(python_executable)
+        environment = f"stubs-{stub_bundles.metadata(bundle_name)['id']}"
+        pyright_version = await _pyright_version(environment, executables["pyright"])
+        cache_key = check_cache_key(ai_code_string, environment, pyright_version, pyright_backend)
+        pyright_result = check_result_cache.get(cache_key)
+        if pyright_result is not None:
+            results["cache_hit"] = True
+            results["log"].append("Pyright result served from the cache.")
+        else:
+            with tempfile.TemporaryDirectory(prefix="ai_code_") as code_dir:
+                with open(os.path.join(code_dir, "pyrightconfig.json"), "w", encoding="utf-8") as f:
+                    json.dump({"stubPath": bundle_dir, "reportMissingModuleSource": "none"}, f)
+                ai_code_file = os.path.join(code_dir, "checked_code.py")
+                with open(ai_code_file, "w", encoding="utf-8") as f:
+                    f.write(ai_code_string)
+                pyright_result = await _check_code(
+                    ai_code_string,
+                    ai_code_file,
+                    executables,
+                    pyright_backend,
+                    results["log"],
+                    stub_path=bundle_dir,
                 )
+            check_result_cache.put(cache_key, pyright_result)
 
-    # The venv_dir (and its contents if created within it) is automatically removed here
-    # when the 'with tempfile.TemporaryDirectory() as venv_dir:' block exits.
+    results["pyright_check_result"] = pyright_result
     results["log"].append(
-        "Temporary venv directory and its contents (should be) removed."
+        f"Pyright check against the '{bundle_name}' stubs completed. Success: {pyright_result['success']}"
     )
     return results
@@ -0,0 +1,358 @@
+import atexit
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import typing as typ
+from collections import OrderedDict
+from pathlib import Path
+
+from .diagnostics import format_check_result, make_diagnostic
+
+
+# Maximum number of language servers kept alive at once (one per environment).
+DEFAULT_MAX_SERVERS = int(os.environ.get("JIJ_MCP_PYRIGHT_LSP_MAX_SERVERS", "4"))
+# Seconds to wait for the server to start or to publish diagnostics for a snippet.
+DEFAULT_LSP_TIMEOUT = float(os.environ.get("JIJ_MCP_PYRIGHT_LSP_TIMEOUT", "120"))
+
+# LSP DiagnosticSeverity values, named the way the Pyright CLI prints them
+_SEVERITY_NAMES = {1: "error", 2: "warning", 3: "information", 4: "hint"}
+
+
+class LanguageServerError(RuntimeError):
+    """Raised when the Pyright language server fails or does not answer in time."""
+
+
+class PyrightLanguageServer:
+    """
+    A Pyright language server process (LSP over stdio) bound to one Python environment.
+
+    The snippet under check is kept as a single in-memory document that is updated with
+    `textDocument/didChange`, so Pyright keeps the analysis of library code (e.g. qiskit)
+    between checks and only re-checks the snippet itself.
+
+    With a `stub_path`, packages are resolved from the stubs in that directory first.
+    """
+
+    def __init__(
+        self,
+        langserver_executable: str,
+        python_executable: str,
+        stub_path: typ.Optional[str] = None,
+    ):
+        self.langserver_executable = langserver_executable
+        self.python_executable = python_executable
+        self.stub_path = stub_path
+        self._process: typ.Optional[subprocess.Popen] = None
+        self._workspace_dir: typ.Optional[str] = None
+        self._document_uri: typ.Optional[str] = None
+        self._document_version = 0
+        self._request_ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._responses: dict[int, dict] = {}
+        self._diagnostics: dict[str, tuple[typ.Optional[int], list[dict]]] = {}
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    # JSON-RPC transport --------------------------------------------------
+    def _send(self, message: dict) -> None:
+        body = json.dumps(message).encode("utf-8")
+        header = f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+        with self._write_lock:
+            self._process.stdin.write(header + body)
+            self._process.stdin.flush()
+
+    def _notify(self, method: str, params: typ.Any) -> None:
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _request(self, method: str, params: typ.Any, timeout: float) -> typ.Any:
+        request_id = next(self._request_ids)
+        self._send(
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        )
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: request_id in self._responses or not self.alive, timeout
+            ):
+                raise LanguageServerError(f"Timed out waiting for '{method}'")
+            response = self._responses.pop(request_id, None)
+        if response is None:
+            raise LanguageServerError("Pyright language server exited")
+        if "error" in response:
+            raise LanguageServerError(f"'{method}' failed: {response['error']}")
+        return response.get("result")
+
+    def _read_message(self) -> typ.Optional[dict]:
+        stdout = self._process.stdout
+        content_length = None
+        while True:
+            line = stdout.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode("ascii").partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value.strip())
+        if content_length is None:
+            return None
+        return json.loads(stdout.read(content_length).decode("utf-8"))
+
+    def _reader_loop(self) -> None:
+        while True:
+            try:
+                message = self._read_message()
+            except (OSError, ValueError):
+                message = None
+            if message is None:
+                with self._condition:
+                    self._condition.notify_all()
+                return
+            if "method" in message and "id" in message:
+                self._answer_server_request(message)
+            elif "method" in message:
+                if message["method"] == "textDocument/publishDiagnostics":
+                    params = message["params"]
+                    with self._condition:
+                        self._diagnostics[params["uri"]] = (
+                            params.get("version"),
+                            params.get("diagnostics", []),
+                        )
+                        self._condition.notify_all()
+            else:
+                with self._condition:
+                    self._responses[message["id"]] = message
+                    self._condition.notify_all()
+
+    def _answer_server_request(self, message: dict) -> None:
+        result: typ.Any = None
+        if message["method"] == "workspace/configuration":
+            result = [self._settings_for(item.get("section")) for item in message["params"]["items"]]
+        try:
+            self._send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+        except OSError:
+            pass
+
+    def _settings_for(self, section: typ.Optional[str]) -> typ.Any:
+        settings = {
+            "python": {
+                "pythonPath": self.python_executable,
+                "analysis": {"diagnosticMode": "openFilesOnly"},
+            },
+        }
+        if self.stub_path:
+            settings["python"]["analysis"].update(
+                {
+                    "stubPath": self.stub_path,
+                    # Stub bundles come without the package sources
+                    "diagnosticSeverityOverrides": {"reportMissingModuleSource": "none"},
+                }
+            )
+        if section is None:
+            return settings
+        value: typ.Any = settings
+        for part in section.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+
+    # Lifecycle ------------------------------------------------------------
+    def start(self, timeout: float = DEFAULT_LSP_TIMEOUT) -> None:
+        self._workspace_dir = tempfile.mkdtemp(prefix="pyright_lsp_")
+        self._process = subprocess.Popen(
+            [self.langserver_executable, "--stdio"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self._workspace_dir,
+        )
+        threading.Thread(target=self._reader_loop, daemon=True).start()
+        root_uri = Path(self._workspace_dir).as_uri()
+        self._request(
+            "initialize",
+            {
+                "processId": os.getpid(),
+                "rootUri": root_uri,
+                "workspaceFolders": [{"uri": root_uri, "name": "workspace"}],
+                "capabilities": {
+                    "workspace": {"configuration": True},
+                    "textDocument": {"publishDiagnostics": {"versionSupport": True}},
+                },
+            },
+            timeout,
+        )
+        self._notify("initialized", {})
+        self._notify("workspace/didChangeConfiguration", {"settings": self._settings_for(None)})
+        self._document_uri = (Path(self._workspace_dir) / "checked_code.py").as_uri()
+
+    def ensure_started(self, timeout: float = DEFAULT_LSP_TIMEOUT) -> None:
+        with self._start_lock:
+            if self._process is None:
+                self.start(timeout)
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            if self.alive:
+                self._request("shutdown", None, 5)
+                self._notify("exit", None)
+                self._process.wait(timeout=5)
+        except (LanguageServerError, OSError, subprocess.TimeoutExpired):
+            pass
+        finally:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process = None
+            if self._workspace_dir:
+                shutil.rmtree(self._workspace_dir, ignore_errors=True)
+
+    # Checking -------------------------------------------------------------
+    def check(self, code: str, timeout: float = DEFAULT_LSP_TIMEOUT) -> list[dict]:
+        """
+        Replaces the in-memory document with `code` and waits for its diagnostics.
+
+        Returns:
+            list[dict]: The LSP diagnostics published for this version of the document.
+        """
+        with self._check_lock:
+            self._document_version += 1
+            version = self._document_version
+            if version == 1:
+                self._notify(
+                    "textDocument/didOpen",
+                    {
+                        "textDocument": {
+                            "uri": self._document_uri,
+                            "languageId": "python",
+                            "version": version,
+                            "text": code,
+                        }
+                    },
+                )
+            else:
+                self._notify(
+                    "textDocument/didChange",
+                    {
+                        "textDocument": {"uri": self._document_uri, "version": version},
+                        "contentChanges": [{"text": code}],
+                    },
+                )
+
+            def published() -> bool:
+                entry = self._diagnostics.get(self._document_uri)
+                return (entry is not None and entry[0] == version) or not self.alive
+
+            with self._condition:
+                if not self._condition.wait_for(published, timeout):
+                    raise LanguageServerError("Timed out waiting for diagnostics")
+                if not self.alive:
+                    raise LanguageServerError("Pyright language server exited")
+                return self._diagnostics[self._document_uri][1]
+
+
+def diagnostics_to_check_result(diagnostics: list[dict]) -> dict:
+    """Formats LSP diagnostics like the output of `_run_pyright_on_files`."""
+    return format_check_result(
+        [
+            make_diagnostic(
+                _SEVERITY_NAMES.get(d.get("severity", 1), "hint"),
+                d["range"]["start"]["line"] + 1,
+                d["range"]["start"]["character"] + 1,
+                d["message"],
+                d.get("code"),
+            )
+            for d in diagnostics
+        ]
+    )
+
+
+class LanguageServerPool:
+    """
+    Keeps one Pyright language server per environment (and stub path),
+    closing the least recently used ones.
+    """
+
+    def __init__(self, max_servers: int = DEFAULT_MAX_SERVERS):
+        self.max_servers = max_servers
+        self._lock = threading.Lock()
+        self._servers: OrderedDict[
+            tuple[str, typ.Optional[str]], PyrightLanguageServer
+        ] = OrderedDict()
+
+    def get(
+        self,
+        langserver_executable: str,
+        python_executable: str,
+        stub_path: typ.Optional[str] = None,
+    ) -> PyrightLanguageServer:
+        key = (python_executable, stub_path)
+        with self._lock:
+            server = self._servers.get(key)
+            if server is not None and server.alive:
+                self._servers.move_to_end(key)
+                return server
+            if server is not None:
+                server.close()
+            server = PyrightLanguageServer(langserver_executable, python_executable, stub_path)
+            self._servers[key] = server
+            evicted = []
+            while len(self._servers) > self.max_servers:
+                evicted.append(self._servers.popitem(last=False)[1])
+        for old_server in evicted:
+            old_server.close()
+        return server
+
+    def discard(self, python_executable: str, stub_path: typ.Optional[str] = None) -> None:
+        with self._lock:
+            server = self._servers.pop((python_executable, stub_path), None)
+        if server is not None:
+            server.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        for server in servers:
+            server.close()
+
+
+language_server_pool = LanguageServerPool()
+atexit.register(language_server_pool.close_all)
+
+
+def check_code_with_language_server(
+    code: str,
+    langserver_executable: str,
+    python_executable: str,
+    timeout: float = DEFAULT_LSP_TIMEOUT,
+    stub_path: typ.Optional[str] = None,
+) -> dict:
+    """
+    Checks `code` with the long-lived language server of the given environment,
+    starting the server on first use. With a `stub_path`, a separate server that
+    resolves packages from that stub directory first is used.
+
+    Returns:
+        dict: A check result with the same shape as `_run_pyright_on_file`.
+    """
+    server = language_server_pool.get(langserver_executable, python_executable, stub_path)
+    try:
+        started = time.monotonic()
+        server.ensure_started(timeout)
+        timeout = max(1.0, timeout - (time.monotonic() - started))
+        return diagnostics_to_check_result(server.check(code, timeout))
+    except (LanguageServerError, OSError):
+        language_server_pool.discard(python_executable, stub_path)
+        raise
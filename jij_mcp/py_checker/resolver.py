@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+import typing as typ
+
+from .installer import DEFAULT_OFFLINE, DependencyResolutionError, Installer
+from .process import resolve_semaphore
+from .venv_pool import normalize_dependencies, requirement_name, venv_pool
+
+
+# Location of the cached locks
+DEFAULT_LOCK_DIR = os.environ.get(
+    "JIJ_MCP_LOCK_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "jij-mcp",
+        "locks",
+    ),
+)
+# Seconds a lock is used before loose specifiers such as "qiskit>=2.0.0" are resolved again
+DEFAULT_LOCK_TTL = float(os.environ.get("JIJ_MCP_LOCK_TTL", str(24 * 3600)))
+
+
+def lock_key(dependencies: list[str], installer_name: str) -> str:
+    """Returns the cache key of the lock of a normalized requirement list."""
+    payload = "\n".join(
+        [
+            f"python=={sys.version_info.major}.{sys.version_info.minor}",
+            f"installer={installer_name}",
+        ]
+        + dependencies
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class LockCache:
+    """
+    Resolves requirement lists into pinned locks (`name==version` for every package of the
+    resolution) and caches them in memory and on disk.
+
+    Requirement lists are normalized first, so equivalent lists are resolved once. The lock
+    is what an environment is built from, so its hash is the environment's identity and
+    callers that ask for the same packages in different ways share an environment.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_LOCK_DIR,
+        ttl_seconds: float = DEFAULT_LOCK_TTL,
+        installer: typ.Optional[Installer] = None,
+        offline: bool = DEFAULT_OFFLINE,
+    ):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.installer = installer or venv_pool.installer
+        self.offline = offline
+        self._locks: dict[str, dict] = {}
+        self._key_locks: dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _load(self, key: str) -> typ.Optional[dict]:
+        entry = self._locks.get(key)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._locks[key] = entry
+        return entry
+
+    def _store(self, key: str, entry: dict) -> None:
+        self._locks[key] = entry
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = self._path(key) + f".{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass  # The in-memory lock is still used
+
+    def _fresh(self, entry: dict) -> bool:
+        # Without network access a lock cannot be refreshed, so it never expires
+        return self.offline or time.time() - entry["resolved"] <= self.ttl_seconds
+
+    async def resolve(self, dependencies: list[str], log: list[str]) -> list[str]:
+        """
+        Returns the lock of `dependencies` (plus pyright, which every environment gets),
+        resolving it if it is not cached or has expired. Concurrent calls for the same
+        requirements share one resolution, and at most `JIJ_MCP_MAX_CONCURRENT_RESOLVES`
+        resolver processes run at a time. If resolution fails, an expired lock is used,
+        and without one the normalized requirements are returned unpinned.
+        The input list is not modified.
+        """
+        requirements = normalize_dependencies(dependencies)
+        if "pyright" not in map(requirement_name, requirements):
+            requirements = normalize_dependencies(requirements + ["pyright"])
+        key = lock_key(requirements, self.installer.name)
+
+        entry = self._load(key)
+        if entry is not None and self._fresh(entry):
+            self.hits += 1
+            return list(entry["lock"])
+        async with self._key_locks.setdefault(key, asyncio.Lock()):
+            entry = self._load(key)
+            if entry is not None and self._fresh(entry):
+                self.hits += 1
+                return list(entry["lock"])
+            self.misses += 1
+            try:
+                async with resolve_semaphore:
+                    lock = normalize_dependencies(await self.installer.resolve(requirements))
+            except DependencyResolutionError as e:
+                if entry is not None:
+                    log.append(f"Dependency resolution failed, using the expired lock: {e}")
+                    return list(entry["lock"])
+                log.append(f"Dependency resolution failed, installing unpinned requirements: {e}")
+                return requirements
+            self._store(
+                key,
+                {"requirements": requirements, "lock": lock, "resolved": time.time()},
+            )
+            log.append(f"Resolved {len(requirements)} requirements to {len(lock)} pinned packages.")
+            return list(lock)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+lock_cache = LockCache()
@@ -0,0 +1,77 @@
+import copy
+import hashlib
+import os
+import time
+import typing as typ
+from collections import OrderedDict
+
+
+# Seconds a cached Pyright result stays valid, and the maximum number of cached results
+DEFAULT_CACHE_TTL = float(os.environ.get("JIJ_MCP_CHECK_CACHE_TTL", "3600"))
+DEFAULT_CACHE_MAX_ENTRIES = int(os.environ.get("JIJ_MCP_CHECK_CACHE_MAX_ENTRIES", "1024"))
+
+
+def normalize_code(code: str) -> str:
+    """
+    Normalizes code so that resubmissions differing only in line endings or
+    trailing whitespace share a cache entry. Diagnostics positions are unaffected.
+    """
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).rstrip("\n") + "\n"
+
+
+def check_cache_key(code: str, environment: str, pyright_version: str, backend: str) -> str:
+    """
+    Returns the cache key of a check of `code` in `environment` with `pyright_version`.
+    The backend ("lsp" or "cli") is part of it, as the two report diagnostics differently.
+    """
+    payload = "\0".join([environment, pyright_version, backend, normalize_code(code)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CheckResultCache:
+    """An in-memory LRU cache of Pyright check results with a time-to-live."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> typ.Optional[dict]:
+        """Returns a copy of the cached result, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, result: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+check_result_cache = CheckResultCache()
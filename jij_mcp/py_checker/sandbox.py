@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import typing as typ
+
+try:
+    import resource
+except ImportError:  # Windows has no rusage
+    resource = None
+
+from pydantic import BaseModel, Field
+
+
+def _env_number(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+# Server-wide maximums. Per-call limits can lower them, never raise them.
+MAX_EXECUTION_LIMITS = {
+    "timeout_seconds": _env_number("JIJ_MCP_EXEC_MAX_TIMEOUT", "30"),
+    "memory_mb": int(_env_number("JIJ_MCP_EXEC_MAX_MEMORY_MB", "4096")),
+    "cpu_seconds": int(_env_number("JIJ_MCP_EXEC_MAX_CPU_SECONDS", "30")),
+    "max_processes": int(_env_number("JIJ_MCP_EXEC_MAX_PROCESSES", "256")),
+    "max_file_size_mb": int(_env_number("JIJ_MCP_EXEC_MAX_FILE_SIZE_MB", "64")),
+    "max_output_bytes": int(_env_number("JIJ_MCP_EXEC_MAX_OUTPUT_BYTES", str(64 * 1024))),
+}
+
+_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_launcher.py")
+
+
+class ExecutionLimits(BaseModel):
+    """Resource limits for executing code. Unset fields use the server-wide maximum."""
+
+    timeout_seconds: typ.Optional[float] = Field(
+        default=None, gt=0, description="Wall-clock time limit in seconds."
+    )
+    memory_mb: typ.Optional[int] = Field(
+        default=None, gt=0, description="Address space limit in MiB."
+    )
+    cpu_seconds: typ.Optional[int] = Field(
+        default=None, gt=0, description="CPU time limit in seconds."
+    )
+    max_processes: typ.Optional[int] = Field(
+        default=None, gt=0, description="Maximum number of processes and threads."
+    )
+    max_file_size_mb: typ.Optional[int] = Field(
+        default=None, gt=0, description="Maximum size of a written file in MiB."
+    )
+    max_output_bytes: typ.Optional[int] = Field(
+        default=None, gt=0, description="Maximum captured bytes of stdout and of stderr each."
+    )
+
+
+def resolve_execution_limits(limits: typ.Optional[ExecutionLimits]) -> ExecutionLimits:
+    """Fills unset limits with the server-wide maximums and clamps the others to them."""
+    requested = limits.model_dump() if limits is not None else {}
+    resolved = {}
+    for name, maximum in MAX_EXECUTION_LIMITS.items():
+        value = requested.get(name)
+        resolved[name] = maximum if value is None else min(value, maximum)
+    return ExecutionLimits(**resolved)
+
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int) -> tuple[bytes, int]:
+    """Reads a stream to the end, keeping at most `limit` bytes. Returns them and the total size."""
+    kept = bytearray()
+    total = 0
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return bytes(kept), total
+        total += len(chunk)
+        if len(kept) < limit:
+            kept += chunk[: limit - len(kept)]
+
+
+def _decode_capped(data: bytes, total: int) -> tuple[str, bool]:
+    text = data.decode("utf-8", errors="replace")
+    if total > len(data):
+        text += f"\n... [output truncated: {total - len(data)} more bytes]"
+        return text, True
+    return text, False
+
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    try:
+        if sys.platform == "win32":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def children_cpu_seconds() -> typ.Optional[float]:
+    """CPU time of the waited-for child processes so far, or None without rusage."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _limit_exceeded(
+    return_code: int,
+    stderr: str,
+    applied: ExecutionLimits,
+    cpu_seconds_used: typ.Optional[float],
+) -> typ.Optional[str]:
+    """Names the limit that most likely ended the process, if any."""
+    if sys.platform != "win32" and return_code < 0:
+        signal_number = -return_code
+        if signal_number == getattr(signal, "SIGXCPU", None):
+            return "cpu_seconds"
+        if signal_number == getattr(signal, "SIGXFSZ", None):
+            return "max_file_size_mb"
+        if signal_number == signal.SIGKILL:
+            # The hard CPU limit is enforced with SIGKILL, but so are the OOM killer and
+            # external kills: only blame the CPU limit if the child used that much CPU time
+            if cpu_seconds_used is not None and cpu_seconds_used >= applied.cpu_seconds:
+                return "cpu_seconds"
+            return None
+    if "MemoryError" in stderr:
+        return "memory_mb"
+    if "File too large" in stderr:  # Python ignores SIGXFSZ and raises EFBIG instead
+        return "max_file_size_mb"
+    return None
+
+
+def new_execution_result(applied: ExecutionLimits) -> dict:
+    return {
+        "success": False,
+        "stdout": None,
+        "stderr": None,
+        "return_code": None,
+        "limits": applied.model_dump(),
+        "timed_out": False,
+        "limit_exceeded": None,
+        "stdout_truncated": False,
+        "stderr_truncated": False,
+        "duration_seconds": None,
+    }
+
+
+def complete_execution_result(
+    result: dict,
+    applied: ExecutionLimits,
+    return_code: int,
+    timed_out: bool,
+    stdout: tuple[bytes, int],
+    stderr: tuple[bytes, int],
+    started: float,
+    cpu_seconds_used: typ.Optional[float] = None,
+) -> dict:
+    """
+    Fills an execution result from the outcome of a run. Outputs are (kept bytes, total size),
+    `cpu_seconds_used` is the CPU time of the child if it is known.
+    """
+    result["duration_seconds"] = round(time.monotonic() - started, 3)
+    result["return_code"] = return_code
+    result["timed_out"] = timed_out
+    result["stdout"], result["stdout_truncated"] = _decode_capped(*stdout)
+    result["stderr"], result["stderr_truncated"] = _decode_capped(*stderr)
+    if timed_out:
+        result["limit_exceeded"] = "timeout_seconds"
+        result["stderr"] += (
+            f"\nExecution timed out after {applied.timeout_seconds:g} seconds."
+        )
+    else:
+        result["success"] = return_code == 0
+        if not result["success"]:
+            result["limit_exceeded"] = _limit_exceeded(
+                return_code, result["stderr"], applied, cpu_seconds_used
+            )
+    return result
+
+
+def rlimits_of(applied: ExecutionLimits) -> dict:
+    """The part of the limits enforced with rlimits inside the child process."""
+    return applied.model_dump(exclude={"timeout_seconds", "max_output_bytes"})
+
+
+async def execute_code_with_limits(
+    python_executable: str,
+    code_file: str,
+    cwd: str,
+    limits: typ.Optional[ExecutionLimits] = None,
+) -> dict:
+    """
+    Executes a code file with rlimits on the child process (address space, CPU seconds,
+    number of processes, file size), a wall-clock timeout that kills the whole process
+    group, and stdout/stderr capped to a number of bytes with a truncation marker.
+
+    Returns:
+        dict: `success`, `stdout`, `stderr`, `return_code`, the applied `limits`,
+        `timed_out`, `limit_exceeded`, `stdout_truncated`, `stderr_truncated`
+        and `duration_seconds`.
+    """
+    applied = resolve_execution_limits(limits)
+    result = new_execution_result(applied)
+    started = time.monotonic()
+    # The delta over the run also counts other children reaped meanwhile, so it is an
+    # upper bound of the CPU time of this one
+    cpu_seconds_before = children_cpu_seconds()
+    process = await asyncio.create_subprocess_exec(
+        python_executable,
+        _LAUNCHER,
+        json.dumps(rlimits_of(applied)),
+        code_file,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=sys.platform != "win32",
+    )
+    readers = asyncio.gather(
+        _read_capped(process.stdout, applied.max_output_bytes),
+        _read_capped(process.stderr, applied.max_output_bytes),
+    )
+    timed_out = False
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            asyncio.shield(readers), applied.timeout_seconds
+        )
+        await process.wait()
+    except asyncio.TimeoutError:
+        timed_out = True
+        _kill_process_group(process)
+        stdout, stderr = await readers
+        await process.wait()
+    except asyncio.CancelledError:
+        _kill_process_group(process)
+        raise
+
+    cpu_seconds_after = children_cpu_seconds()
+    return complete_execution_result(
+        result,
+        applied,
+        process.returncode,
+        timed_out,
+        stdout,
+        stderr,
+        started,
+        None if cpu_seconds_before is None else cpu_seconds_after - cpu_seconds_before,
+    )
+
+
+def read_file_capped(path: str, limit: int) -> tuple[bytes, int]:
+    """Reads at most `limit` bytes of a file. Returns them and the file size."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(limit), os.fstat(f.fileno()).st_size
+    except OSError:
+        return b"", 0
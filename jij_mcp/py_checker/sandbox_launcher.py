@@ -0,0 +1,51 @@
+"""
+Applies resource limits to the current process and replaces it with the code to run.
+It is executed by the interpreter of a pooled environment, so it only uses the standard library.
+
+Usage: python sandbox_launcher.py LIMITS_JSON CODE_FILE
+"""
+
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+_MB = 1024 * 1024
+
+
+def _set_limit(name: str, soft: int, hard: int) -> None:
+    limit = getattr(resource, name, None)
+    if limit is None:
+        return
+    _current_soft, current_hard = resource.getrlimit(limit)
+    if current_hard != resource.RLIM_INFINITY:
+        # An unprivileged process cannot raise its hard limit
+        hard = min(hard, current_hard)
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (soft, hard))
+
+
+def apply_limits(limits: dict) -> None:
+    if resource is None:
+        return
+    if limits.get("memory_mb"):
+        size = limits["memory_mb"] * _MB
+        _set_limit("RLIMIT_AS", size, size)
+    if limits.get("cpu_seconds"):
+        # SIGXCPU at the soft limit, SIGKILL one second later
+        _set_limit("RLIMIT_CPU", limits["cpu_seconds"], limits["cpu_seconds"] + 1)
+    if limits.get("max_processes"):
+        _set_limit("RLIMIT_NPROC", limits["max_processes"], limits["max_processes"])
+    if limits.get("max_file_size_mb"):
+        size = limits["max_file_size_mb"] * _MB
+        _set_limit("RLIMIT_FSIZE", size, size)
+
+
+if __name__ == "__main__":
+    apply_limits(json.loads(sys.argv[1]))
+    code_file = sys.argv[2]
+    os.execv(sys.executable, [sys.executable, code_file])
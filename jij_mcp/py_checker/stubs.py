@@ -0,0 +1,234 @@
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing as typ
+
+from .process import run_subprocess
+from .resolver import lock_cache
+from .venv_pool import EnvironmentBuildError, venv_executables, venv_pool
+
+
+# Location of the stub bundles. A deployment can ship pre-generated bundles here.
+DEFAULT_STUB_DIR = os.environ.get(
+    "JIJ_MCP_STUB_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "jij-mcp",
+        "stubs",
+    ),
+)
+# Seconds `pyright --createstub` may take for one package
+_CREATESTUB_TIMEOUT = 1800
+
+_METADATA_FILE = "jij_mcp_stubs.json"
+
+
+class StubBundleError(RuntimeError):
+    """Raised when a stub bundle cannot be generated."""
+
+
+def _reexport_imports(stub_source: str) -> str:
+    """
+    Rewrites the imports of a generated stub as explicit re-exports (`import a as a`).
+    In a stub, a plain import is private, but at runtime every imported name is an
+    attribute of the module, e.g. `qiskit.circuit.QuantumCircuit`.
+    """
+    tree = ast.parse(stub_source)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.asname is None and alias.name != "*" and "." not in alias.name:
+                    alias.asname = alias.name
+    return ast.unparse(tree) + "\n"
+
+
+def _reexport_bundle(typings_dir: str) -> None:
+    for directory, _dirs, files in os.walk(typings_dir):
+        for file_name in files:
+            if not file_name.endswith(".pyi"):
+                continue
+            path = os.path.join(directory, file_name)
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            try:
+                source = _reexport_imports(source)
+            except SyntaxError:
+                continue  # Keep the stub as generated
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(source)
+
+
+def server_executables(python_executable: str) -> dict[str, str]:
+    """
+    Pyright executables of the server's own environment, used for stub-only checks,
+    with `python_executable` as the interpreter Pyright resolves imports with.
+    """
+    executables = venv_executables(sys.prefix)
+    executables["python"] = python_executable
+    for name, command in (("pyright", "pyright"), ("pyright_langserver", "pyright-langserver")):
+        if not os.path.exists(executables[name]):
+            executables[name] = shutil.which(command) or command
+    return executables
+
+
+class StubBundles:
+    """
+    Type stub bundles (`.pyi` files) of packages, generated once per requirement with
+    `pyright --createstub` in a pooled environment. Checking against a bundle needs
+    no environment of its own: the server's Pyright reads it through `stubPath`.
+    """
+
+    def __init__(self, root: str = DEFAULT_STUB_DIR):
+        self.root = root
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._python_lock = asyncio.Lock()
+
+    def bundle_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def metadata(self, name: str) -> typ.Optional[dict]:
+        """Returns the metadata of a ready bundle, or None if it has not been generated."""
+        try:
+            with open(os.path.join(self.bundle_dir(name), _METADATA_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    async def isolated_python(self, log: list[str]) -> str:
+        """
+        Returns the interpreter of an empty venv, created once next to the bundles. Checks
+        against a bundle resolve imports with it, so a module missing from the bundle is
+        reported as unresolved instead of being found in the server's own site-packages.
+
+        Raises:
+            StubBundleError: If the venv cannot be created.
+        """
+        venv_dir = os.path.join(self.root, f".python{sys.version_info[0]}.{sys.version_info[1]}")
+        python_executable = venv_executables(venv_dir)["python"]
+        if os.path.exists(python_executable):
+            return python_executable
+        async with self._python_lock:
+            if os.path.exists(python_executable):
+                return python_executable
+            log.append("Creating the isolated interpreter for stub checks.")
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                with tempfile.TemporaryDirectory(prefix=".python-", dir=self.root) as staging:
+                    staging_venv = os.path.join(staging, "venv")
+                    # Built from the base interpreter: only the standard library is importable
+                    process = await run_subprocess(
+                        [sys.executable, "-m", "venv", "--without-pip", staging_venv], timeout=300
+                    )
+                    if process.returncode != 0:
+                        raise StubBundleError(
+                            f"Failed to create the isolated interpreter:\n{process.stdout}{process.stderr}"
+                        )
+                    try:
+                        os.rename(staging_venv, venv_dir)
+                    except OSError:
+                        # Another process created it first
+                        if not os.path.exists(python_executable):
+                            raise
+            except subprocess.TimeoutExpired as e:
+                raise StubBundleError(f"Creating the isolated interpreter timed out: {e}") from e
+            except OSError as e:
+                raise StubBundleError(f"Failed to create the isolated interpreter: {e}") from e
+        return python_executable
+
+    async def _package_versions(self, python_executable: str, packages: list[str]) -> dict:
+        script = (
+            "import importlib.metadata as m, json, sys; "
+            "print(json.dumps({p: m.version(p) for p in sys.argv[1:]}))"
+        )
+        try:
+            process = await run_subprocess([python_executable, "-c", script, *packages], timeout=60)
+            return json.loads(process.stdout)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            return {}
+
+    async def ensure(
+        self, name: str, requirement: str, packages: list[str], log: list[str]
+    ) -> str:
+        """
+        Returns the directory of a bundle, generating it first if needed.
+
+        Args:
+            name: Name of the bundle directory, e.g. "qiskit-v1".
+            requirement: Requirement installed into the environment the stubs are taken from.
+            packages: Import names to generate stubs for.
+            log: Progress messages are appended to it.
+
+        Raises:
+            StubBundleError: If the environment cannot be built or Pyright fails.
+        """
+        bundle_dir = self.bundle_dir(name)
+        if self.metadata(name) is not None:
+            return bundle_dir
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            if self.metadata(name) is not None:
+                return bundle_dir
+            log.append(f"Generating the '{name}' stub bundle. This is only done once.")
+            try:
+                dependencies = await lock_cache.resolve([requirement], log)
+                venv_dir, _reused = await venv_pool.acquire(dependencies, log)
+            except EnvironmentBuildError as e:
+                raise StubBundleError(str(e)) from e
+            try:
+                executables = venv_executables(venv_dir)
+                os.makedirs(self.root, exist_ok=True)
+                with tempfile.TemporaryDirectory(prefix=f".{name}-", dir=self.root) as staging:
+                    for package in packages:
+                        process = await run_subprocess(
+                            [
+                                executables["pyright"],
+                                "--createstub",
+                                package,
+                                "--pythonpath",
+                                executables["python"],
+                            ],
+                            timeout=_CREATESTUB_TIMEOUT,
+                            cwd=staging,
+                        )
+                        if process.returncode != 0:
+                            raise StubBundleError(
+                                f"Failed to create stubs for '{package}':\n{process.stdout}{process.stderr}"
+                            )
+                    typings_dir = os.path.join(staging, "typings")
+                    await asyncio.to_thread(_reexport_bundle, typings_dir)
+
+                    versions = await self._package_versions(executables["python"], packages)
+                    metadata = {
+                        "requirement": requirement,
+                        "packages": versions,
+                        "id": hashlib.sha256(
+                            json.dumps([requirement, versions], sort_keys=True).encode("utf-8")
+                        ).hexdigest()[:24],
+                        "created": time.time(),
+                    }
+                    # The metadata file marks the bundle as ready
+                    with open(os.path.join(typings_dir, _METADATA_FILE), "w", encoding="utf-8") as f:
+                        json.dump(metadata, f)
+                    try:
+                        os.rename(typings_dir, bundle_dir)
+                    except OSError:
+                        # Another process published the bundle first
+                        if self.metadata(name) is None:
+                            raise
+            except subprocess.TimeoutExpired as e:
+                raise StubBundleError(f"Stub generation timed out: {e}") from e
+            except OSError as e:
+                raise StubBundleError(f"Failed to store the stub bundle: {e}") from e
+            finally:
+                venv_pool.release(venv_dir)
+            log.append(f"Stub bundle '{name}' stored in: {bundle_dir}")
+        return bundle_dir
+
+
+stub_bundles = StubBundles()
@@ -0,0 +1,355 @@
+import hashlib
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import typing as typ
+from contextlib import asynccontextmanager
+
+from .installer import EnvironmentBuildError, Installer, get_installer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Pool configuration. Every value can be overridden through the environment so that
+# the Docker image and local installations can size the pool to the host.
+DEFAULT_POOL_DIR = os.environ.get(
+    "JIJ_MCP_VENV_POOL_DIR",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "jij-mcp",
+        "venvs",
+    ),
+)
+DEFAULT_MAX_ENVIRONMENTS = int(os.environ.get("JIJ_MCP_VENV_POOL_MAX_ENVS", "8"))
+DEFAULT_MAX_BYTES = int(
+    os.environ.get("JIJ_MCP_VENV_POOL_MAX_BYTES", str(10 * 1024**3))
+)
+
+_METADATA_FILE = "jij_mcp_env.json"
+
+
+def _split_requirement(spec: str) -> tuple[str, str]:
+    """Splits a requirement specifier without whitespace into its normalized name and the rest."""
+    name_end = len(spec)
+    for i, char in enumerate(spec):
+        if char in "<>=!~;[@":
+            name_end = i
+            break
+    return re.sub(r"[-_.]+", "-", spec[:name_end]).lower(), spec[name_end:]
+
+
+def requirement_name(spec: str) -> str:
+    """Returns the normalized package name of a requirement specifier."""
+    return _split_requirement("".join(spec.split()))[0]
+
+
+def normalize_dependencies(dependencies: list[str]) -> list[str]:
+    """
+    Normalizes a list of requirement specifiers so that equivalent lists share an environment.
+    Whitespace is removed, package names are normalized (lowercase, runs of "-", "_" and "."
+    become "-"), duplicates are dropped and the result is sorted. The input list is not modified.
+    """
+    normalized = set()
+    for dependency in dependencies:
+        spec = "".join(dependency.split())
+        if not spec:
+            continue
+        name, rest = _split_requirement(spec)
+        normalized.add(name + rest)
+    return sorted(normalized)
+
+
+def environment_key(dependencies: list[str]) -> str:
+    """
+    Returns the content address of an environment: a hash of the normalized
+    dependency set and the interpreter version used to create the venv.
+    """
+    payload = "\n".join(
+        [f"python=={sys.version_info.major}.{sys.version_info.minor}"]
+        + normalize_dependencies(dependencies)
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def venv_executables(venv_dir: str) -> dict[str, str]:
+    """Returns the paths of python, pyright and pyright-langserver inside a venv."""
+    if sys.platform == "win32":
+        bin_dir = os.path.join(venv_dir, "Scripts")
+        suffix = ".exe"
+    else:
+        bin_dir = os.path.join(venv_dir, "bin")
+        suffix = ""
+    return {
+        "python": os.path.join(bin_dir, "python" + suffix),
+        "pyright": os.path.join(bin_dir, "pyright" + suffix),
+        "pyright_langserver": os.path.join(bin_dir, "pyright-langserver" + suffix),
+    }
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class VenvPool:
+    """
+    A persistent pool of virtual environments addressed by their dependency set.
+
+    Environments live under `root/<key>` where `key` is `environment_key(dependencies)`.
+    An environment only counts as ready once its metadata file has been written, so a
+    half-built environment is never used. Builds of the same key are serialized, also
+    across server processes sharing the pool directory. Least recently used environments
+    are evicted when the pool exceeds `max_environments` or `max_bytes`.
+
+    An acquired environment holds a shared lock on its pin file (`.<key>.pin`), so that
+    no server process sharing the pool evicts it; eviction takes the build lock and the
+    pin lock exclusively, without waiting, and skips environments whose locks are held.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_POOL_DIR,
+        max_environments: int = DEFAULT_MAX_ENVIRONMENTS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        installer: typ.Optional[Installer] = None,
+    ):
+        self.root = root
+        self.installer = installer or get_installer()
+        self.max_environments = max_environments
+        self.max_bytes = max_bytes
+        self._key_locks: dict[str, asyncio.Lock] = {}
+        self._in_use: dict[str, int] = {}
+        # Open pin files of the acquired environments, by key
+        self._pins: dict[str, list[typ.IO]] = {}
+        # Called with the venv directory of every evicted environment
+        self.on_evict: list[typ.Callable[[str], None]] = []
+
+    @asynccontextmanager
+    async def _build_lock(self, key: str) -> typ.AsyncIterator[None]:
+        """Serializes builds of one key within this process and, where supported, across processes."""
+        async with self._key_locks.setdefault(key, asyncio.Lock()):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, f".{key}.lock"), "w") as lock_file:
+                # Another server process may hold the lock for a whole build
+                await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _pin(self, key: str) -> None:
+        """Pins an environment against eviction by any process sharing the pool (see `evict`)."""
+        if fcntl is None:
+            return
+        pin_file = open(os.path.join(self.root, f".{key}.pin"), "w")
+        # Never waits: an evicting process only holds the pin lock while it holds the
+        # build lock, which the caller holds
+        fcntl.flock(pin_file, fcntl.LOCK_SH)
+        self._pins.setdefault(key, []).append(pin_file)
+
+    def _lock_for_removal(self, key: str) -> typ.Optional[list[typ.IO]]:
+        """
+        Takes the build and pin locks of an environment exclusively without waiting.
+
+        Returns:
+            list: The open lock files, which release the locks when closed, or None if an
+            environment is being built or used by a process sharing the pool.
+        """
+        lock = self._key_locks.get(key)
+        if self._in_use.get(key) or (lock is not None and lock.locked()):
+            return None
+        if fcntl is None:
+            return []
+        lock_files: list[typ.IO] = []
+        try:
+            for name in (f".{key}.lock", f".{key}.pin"):
+                lock_files.append(open(os.path.join(self.root, name), "w"))
+                fcntl.flock(lock_files[-1], fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            for lock_file in lock_files:
+                lock_file.close()
+            return None
+        return lock_files
+
+    def _read_metadata(self, venv_dir: str) -> typ.Optional[dict]:
+        try:
+            with open(os.path.join(venv_dir, _METADATA_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_metadata(self, venv_dir: str, metadata: dict) -> None:
+        path = os.path.join(venv_dir, _METADATA_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, path)
+
+    def _touch(self, venv_dir: str, metadata: dict) -> None:
+        metadata["last_used"] = time.time()
+        try:
+            self._write_metadata(venv_dir, metadata)
+        except OSError:
+            pass  # LRU bookkeeping is best-effort
+
+    async def _build(self, key: str, dependencies: list[str], log: list[str]) -> dict:
+        # The metadata file is written last and marks the environment as ready.
+        # A venv records its own location in pyvenv.cfg and in console-script shebangs,
+        # so it is built at its final path rather than in a staging directory.
+        venv_dir = os.path.join(self.root, key)
+        try:
+            # 1. Create the virtual environment
+            await self.installer.create_venv(venv_dir)
+            log.append(
+                f"Virtual environment created successfully with {self.installer.name}."
+            )
+
+            # 2. Install dependencies and Pyright
+            # Pyright CLI is available via pip as 'pyright'
+            packages_to_install = normalize_dependencies(dependencies)
+            if "pyright" not in map(requirement_name, packages_to_install):
+                packages_to_install.append("pyright")
+            log.append(
+                f"Installing packages with {self.installer.name}: {' '.join(packages_to_install)}"
+            )
+            install_output = await self.installer.install(
+                venv_dir, venv_executables(venv_dir)["python"], packages_to_install
+            )
+            log.append(f"Packages installed successfully:\n{install_output}")
+
+            metadata = {
+                "key": key,
+                "dependencies": normalize_dependencies(dependencies),
+                "installer": self.installer.name,
+                "created": time.time(),
+                "last_used": time.time(),
+                "size_bytes": await asyncio.to_thread(_directory_size, venv_dir),
+            }
+            self._write_metadata(venv_dir, metadata)
+            return metadata
+        except BaseException:
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            raise
+
+    async def acquire(
+        self, dependencies: list[str], log: list[str]
+    ) -> tuple[str, bool]:
+        """
+        Returns a ready venv for `dependencies`, building it if needed.
+        The environment is pinned against eviction until `release` is called.
+
+        Returns:
+            tuple[str, bool]: The venv directory and whether it was reused from the pool.
+        """
+        key = environment_key(dependencies)
+        venv_dir = os.path.join(self.root, key)
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            async with self._build_lock(key):
+                metadata = self._read_metadata(venv_dir)
+                reused = metadata is not None
+                if reused:
+                    log.append(f"Reusing pooled environment: {venv_dir}")
+                    self._touch(venv_dir, metadata)
+                else:
+                    if os.path.exists(venv_dir):
+                        # Leftover without metadata, e.g. from an interrupted build
+                        await asyncio.to_thread(shutil.rmtree, venv_dir, True)
+                    log.append(f"Building pooled environment: {venv_dir}")
+                    await self._build(key, dependencies, log)
+                self._pin(key)
+        except BaseException:
+            self.release(venv_dir)
+            raise
+        if not reused:
+            await self.evict(log)
+        return venv_dir, reused
+
+    def release(self, venv_dir: str) -> None:
+        """Unpins an environment previously returned by `acquire`."""
+        key = os.path.basename(venv_dir)
+        pins = self._pins.get(key)
+        if pins:
+            pins.pop().close()  # Releases the shared lock
+            if not pins:
+                del self._pins[key]
+        count = self._in_use.get(key, 0) - 1
+        if count > 0:
+            self._in_use[key] = count
+        else:
+            self._in_use.pop(key, None)
+
+    def entries(self) -> list[dict]:
+        """Returns the metadata of every ready environment in the pool."""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            metadata = self._read_metadata(os.path.join(self.root, name))
+            if metadata is not None:
+                entries.append(metadata)
+        return entries
+
+    async def evict(self, log: typ.Optional[list[str]] = None) -> list[str]:
+        """
+        Removes least recently used environments until the pool fits its quota.
+        Environments that are being built or are in use, by this or another process
+        sharing the pool, are never removed.
+
+        The environments to remove are chosen and locked on the event loop; only the
+        deletion of their directories runs in a thread, under their locks.
+
+        Returns:
+            list[str]: The keys of the removed environments.
+        """
+        entries = sorted(self.entries(), key=lambda m: m.get("last_used", 0))
+        total_bytes = sum(m.get("size_bytes", 0) for m in entries)
+        count = len(entries)
+        removed: list[tuple[str, list[typ.IO]]] = []
+        for metadata in entries:
+            if count <= self.max_environments and total_bytes <= self.max_bytes:
+                break
+            key = metadata["key"]
+            lock_files = self._lock_for_removal(key)
+            if lock_files is None:
+                continue
+            for callback in self.on_evict:
+                callback(os.path.join(self.root, key))
+            count -= 1
+            total_bytes -= metadata.get("size_bytes", 0)
+            removed.append((key, lock_files))
+
+        def remove_directories() -> None:
+            for key, _lock_files in removed:
+                shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+        try:
+            await asyncio.to_thread(remove_directories)
+        finally:
+            for _key, lock_files in removed:
+                for lock_file in lock_files:
+                    lock_file.close()
+        if log is not None:
+            log.extend(f"Evicted pooled environment: {key}" for key, _lock_files in removed)
+        return [key for key, _lock_files in removed]
+
+
+venv_pool = VenvPool()
@@ -0,0 +1,58 @@
+"""
+Pre-builds the pooled environments used by the Qiskit static checks.
+
+Building an environment fills the installer's cache (uv's cache directory when the uv
+installer is used), so environments for the same packages can later be rebuilt with
+JIJ_MCP_OFFLINE=1, without network access. The Qiskit stub bundles used by the "stubs"
+check mode are generated as well. Run it from the jij_mcp directory:
+
+    python -m py_checker.warm [--with qiskit-aer ...] [--skip-stubs]
+"""
+
+import argparse
+import asyncio
+
+from .process import run_subprocess
+from .resolver import lock_cache
+from .pyright_check import QISKIT_REQUIREMENTS, QISKIT_STUB_PACKAGES
+from .stubs import stub_bundles
+from .venv_pool import venv_executables, venv_pool
+
+
+async def warm(extra_dependencies: list[str], stubs: bool = True) -> None:
+    for qiskit_version, requirement in QISKIT_REQUIREMENTS.items():
+        log: list[str] = []
+        dependencies = await lock_cache.resolve([requirement] + extra_dependencies, log)
+        venv_dir, reused = await venv_pool.acquire(dependencies, log)
+        try:
+            # The pyright package downloads its Node.js sources on first use
+            await run_subprocess([venv_executables(venv_dir)["pyright"], "--version"])
+        finally:
+            venv_pool.release(venv_dir)
+        state = "already present" if reused else "built"
+        print(f"Qiskit {qiskit_version} environment {state}: {venv_dir}")
+        if stubs:
+            bundle_dir = await stub_bundles.ensure(
+                f"qiskit-{qiskit_version}", requirement, QISKIT_STUB_PACKAGES, log
+            )
+            print(f"Qiskit {qiskit_version} stub bundle: {bundle_dir}")
+    if stubs:
+        print(f"Isolated interpreter for stub checks: {await stub_bundles.isolated_python([])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--with",
+        dest="extra_dependencies",
+        action="append",
+        default=[],
+        help="Additional requirement to install into every environment (repeatable).",
+    )
+    parser.add_argument(
+        "--skip-stubs",
+        action="store_true",
+        help="Do not generate the Qiskit stub bundles.",
+    )
+    args = parser.parse_args()
+    asyncio.run(warm(args.extra_dependencies, stubs=not args.skip_stubs))
@@ -1,3 +1,5 @@
+import __future__
+import ast
 import re
 import typing
 
@@ -5,9 +7,35 @@ import typing
 class PythonREPL:
 
     @classmethod
-    def run(cls, code: str) -> dict[str, typing.Any]:
+    def run(
+        cls,
+        code: str,
+        namespace: typing.Optional[dict[str, typing.Any]] = None,
+        on_statement: typing.Optional[typing.Callable[[int, int, int], None]] = None,
+    ) -> dict[str, typing.Any]:
+        """
+        Executes `code` in `namespace` (a fresh one by default), so definitions made by
+        the code do not leak into this module or into later runs.
+        If `on_statement` is given, top-level statements are executed one by one and it is
+        called as `on_statement(index, line_number, statement_count)` before each of them.
+        """
+        if namespace is None:
+            namespace = {"__name__": "__main__"}
         try:
-            exec(code)
+            if on_statement is None:
+                exec(compile(code, "<string>", "exec"), namespace)
+            else:
+                statements = ast.parse(code, "<string>").body
+                flags = 0
+                for index, statement in enumerate(statements):
+                    on_statement(index, statement.lineno, len(statements))
+                    if isinstance(statement, ast.ImportFrom) and statement.module == "__future__":
+                        for alias in statement.names:
+                            feature = getattr(__future__, alias.name, None)
+                            if feature is not None:
+                                flags |= feature.compiler_flag
+                    module = ast.Module(body=[statement], type_ignores=[])
+                    exec(compile(module, "<string>", "exec", flags=flags, dont_inherit=True), namespace)
             return {"status": "success"}
         except Exception as e:
             import traceback
@@ -15,7 +43,11 @@ class PythonREPL:
             error_details = traceback.format_exc()
             error_position = extract_error_position_codes(code, error_details)
 
-            return {"status": "error", "error": error_position}
+            return {
+                "status": "error",
+                "error": error_position,
+                "exception_type": type(e).__name__,
+            }
 
 
 def extract_error_position_codes(code: str, error_details: str):
@@ -36,6 +68,20 @@ def extract_error_position_codes(code: str, error_details: str):
     else:
         line_number = int(string_error_match.group(1))
 
+    error_position = line_context(code, line_number)
+    if line_number > 0 and line_number <= len(lines):
+        error_position["error_type"] = (
+            re.search(r"(\w+Error:.*?)$", error_details, re.MULTILINE).group(1)
+            if re.search(r"(\w+Error:.*?)$", error_details, re.MULTILINE)
+            else "Unknown error"
+        )
+    return error_position
+
+
+def line_context(code: str, line_number: int) -> dict[str, typing.Any]:
+    """Returns a line of the code with the adjacent lines, in the format of an error position."""
+    lines = code.split("\n")
+
     # Adjust for 0-based indexing
     if line_number > 0 and line_number <= len(lines):
         # Get the problematic line and adjacent lines for context
@@ -51,11 +97,7 @@ def extract_error_position_codes(code: str, error_details: str):
             "line_number": line_number,
             "error_line": lines[line_number - 1],
             "context": "\n".join(error_context),
-            "error_type": (
-                re.search(r"(\w+Error:.*?)$", error_details, re.MULTILINE).group(1)
-                if re.search(r"(\w+Error:.*?)$", error_details, re.MULTILINE)
-                else "Unknown error"
-            ),
+            "error_type": "Unknown error",
         }
 
     return {